@@ -0,0 +1,102 @@
+# app/answer_cache.py
+"""
+Semantischer Antwort-Cache für /v1/ask (Tabelle `answer_cache`).
+
+Eine gespeicherte Antwort wird wiederverwendet, wenn das Query-Embedding einer
+neuen Frage innerhalb der Kosinus-Schwelle einer gecachten Frage liegt (pro
+Scope, z.B. Standort). Ingest löscht Einträge, deren Quellen-Dokumente sich
+geändert haben (siehe invalidate_docs).
+"""
+import json
+from typing import Dict, Iterable, List, Optional
+from pgvector import Vector
+from .config import settings
+from .db import connection
+
+class AnswerCache:
+    def __init__(self):
+        self.enabled = settings.answer_cache_enabled
+        self.threshold = settings.answer_cache_threshold
+        self.ttl = settings.answer_cache_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    async def lookup(self, q_vec: List[float], scope: Optional[str]) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        sql = """
+        SELECT answer, sources, 1 - (embedding <=> %s) AS similarity
+        FROM answer_cache
+        WHERE scope = %s AND created_at > now() - make_interval(secs => %s)
+        ORDER BY embedding <=> %s
+        LIMIT 1
+        """
+        vec = Vector(q_vec)
+        try:
+            async with connection() as conn, conn.cursor() as cur:
+                await cur.execute(sql, (vec, scope or "", self.ttl, vec))
+                row = await cur.fetchone()
+        except Exception as e:
+            print(f"Warnung: answer_cache Lookup fehlgeschlagen: {e}")
+            return None
+        if row is None or row["similarity"] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {"answer": row["answer"], "sources": row["sources"]}
+
+    async def store(self, question: str, q_vec: List[float], scope: Optional[str], answer: str, sources: List[Dict]) -> None:
+        # Antworten ohne Quellen nicht cachen: sie ließen sich durch Ingest nie invalidieren
+        if not self.enabled or not sources:
+            return
+        doc_ids = sorted({s["doc_id"] for s in sources})
+        sql = """
+        INSERT INTO answer_cache (scope, query, embedding, answer, sources, doc_ids)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        try:
+            async with connection() as conn:
+                await conn.execute(
+                    sql, (scope or "", question, Vector(q_vec), answer, json.dumps(sources), doc_ids)
+                )
+            self.stores += 1
+        except Exception as e:
+            print(f"Warnung: answer_cache Schreiben fehlgeschlagen: {e}")
+
+    async def purge_expired(self) -> None:
+        async with connection() as conn:
+            await conn.execute(
+                "DELETE FROM answer_cache WHERE created_at < now() - make_interval(secs => %s)",
+                (self.ttl,),
+            )
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+        }
+
+async def invalidate_docs(conn, doc_ids: Iterable[str]) -> int:
+    """Löscht gecachte Antworten, die sich auf eines der Dokumente stützen.
+
+    Läuft auf der übergebenen Verbindung, damit die Invalidierung in derselben
+    Transaktion wie der Ingest-Schreibvorgang committet wird.
+    """
+    ids = sorted(set(doc_ids))
+    if not ids:
+        return 0
+    cur = await conn.execute("DELETE FROM answer_cache WHERE doc_ids && %s", (ids,))
+    return cur.rowcount
+
+# Globale Instanz
+answer_cache: Optional[AnswerCache] = None
+
+def get_answer_cache() -> AnswerCache:
+    """Singleton-Pattern für den Antwort-Cache"""
+    global answer_cache
+    if answer_cache is None:
+        answer_cache = AnswerCache()
+    return answer_cache
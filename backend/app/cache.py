@@ -0,0 +1,89 @@
+# app/cache.py
+"""
+Kleiner In-Memory-LRU-Cache mit TTL und Zählern (Hits, Misses, Evictions).
+Optional zusätzlich nach Gewicht (z. B. Bytes) begrenzt: max_weight + weigh().
+
+Nicht thread-safe – gedacht für die Nutzung innerhalb eines asyncio-Loops.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+class LRUCache(Generic[V]):
+    def __init__(
+        self,
+        max_size: int,
+        ttl: Optional[float] = None,
+        max_weight: Optional[int] = None,
+        weigh: Optional[Callable[[V], int]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda _v: 1)
+        self.weight = 0
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        stored_at, value = item
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        w = self.weigh(value)
+        if self.max_weight is not None and w > self.max_weight:
+            # passt nie hinein → nicht cachen statt alles andere zu verdrängen
+            self.pop(key)
+            return
+        self._remove(key)
+        self._data[key] = (time.monotonic(), value)
+        self.weight += w
+        while len(self._data) > self.max_size or (
+            self.max_weight is not None and self.weight > self.max_weight
+        ):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> Optional[tuple]:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.weight -= self.weigh(item[1])
+        return item
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        item = self._remove(key)
+        return item[1] if item else None
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            **({"weight": self.weight, "max_weight": self.max_weight} if self.max_weight is not None else {}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
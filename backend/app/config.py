@@ -1,4 +1,5 @@
 # backend/app/config.py
+from pathlib import Path
 from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
@@ -6,6 +7,10 @@ from pydantic import Field
 class Settings(BaseSettings):
     # Postgres
     database_url: str
+    db_pool_min_size: int = Field(1, description="Min. Verbindungen im Async-Pool")
+    db_pool_max_size: int = Field(10, description="Max. Verbindungen im Async-Pool")
+    db_pool_timeout: float = Field(30.0, description="Max. Wartezeit auf eine Pool-Verbindung (Sekunden)")
+    db_pool_max_idle: float = Field(300.0, description="Sekunden, bis ungenutzte Verbindungen geschlossen werden")
 
     # watsonx.ai
     watsonx_api_key: str
@@ -24,10 +29,120 @@ class Settings(BaseSettings):
     # Speech to Text
     speech_to_text_api_key: Optional[str] = Field(None, description="IBM Speech to Text API key")
     speech_to_text_url: str = Field(default="https://api.eu-de.speech-to-text.watson.cloud.ibm.com", description="IBM Speech to Text service URL")
+    speech_to_text_model: str = Field("de-DE_BroadbandModel", description="Watson STT-Modell")
+    stt_max_workers: int = Field(8, description="Threads für synchrone Speech-to-Text-Aufrufe")
+    stt_stream_max_sessions: int = Field(8, description="Max. gleichzeitige WebSocket-Sitzungen (eigener Thread-Pool), weitere werden abgelehnt")
+    stt_stream_max_buffered_frames: int = Field(256, description="Audio-Frames pro Sitzung, die auf das Senden an Watson warten dürfen (danach Backpressure)")
+    stt_inactivity_timeout: int = Field(30, description="Sekunden Stille, nach denen Watson die Streaming-Erkennung beendet")
 
     # Text to Speech
     text_to_speech_api_key: Optional[str] = Field(None, description="IBM Text to Speech API key")
     text_to_speech_url: str = Field(default="https://api.eu-de.text-to-speech.watson.cloud.ibm.com", description="IBM Text to Speech service URL")
+    tts_max_workers: int = Field(8, description="Threads für synchrone Text-to-Speech-Aufrufe")
+    tts_stream_lookahead: int = Field(3, description="Sätze, die beim Streaming parallel synthetisiert werden (min. 1)")
+    tts_stream_ticket_dir: str = Field("/tmp/boardy_tts_streams", description="Kurzlebige Stream-Tickets (Text für <audio src>), von allen Workern geteilt")
+    tts_stream_ticket_ttl: int = Field(300, description="Gültigkeit eines Stream-Tickets in Sekunden")
+    tts_cache_enabled: bool = Field(True, description="Synthetisiertes Audio auf der Platte cachen")
+    tts_cache_dir: str = Field("/tmp/boardy_tts_cache", description="Verzeichnis des TTS-Audio-Caches (von allen Workern geteilt)")
+    tts_cache_max_mb: int = Field(512, description="Max. Größe des TTS-Audio-Caches (MB), LRU-Verdrängung")
+    tts_cache_max_age: int = Field(31536000, description="Cache-Control max-age für Audio-Antworten (Sekunden)")
+    tts_prewarm: bool = Field(False, description="Feste Onboarding-Phrasen beim Start vorab synthetisieren")
+    tts_prewarm_file: str = Field(str(Path(__file__).parent / "tts_prewarm.txt"), description="Phrasen für den Pre-Warm, eine pro Zeile")
+    tts_prewarm_voice: str = Field("de-DE_BirgitVoice", description="Stimme für den Pre-Warm")
+
+    # HTTP-Transport (gemeinsamer Client für watsonx & IAM)
+    http_max_connections: int = Field(20, description="Max. gleichzeitige Verbindungen im Pool")
+    http_max_keepalive_connections: int = Field(10, description="Max. offen gehaltene Keep-Alive-Verbindungen")
+    http_keepalive_expiry: float = Field(30.0, description="Sekunden, bis eine ungenutzte Verbindung geschlossen wird")
+    http2_enabled: bool = Field(False, description="HTTP/2 verwenden (benötigt das Paket 'h2')")
+    http_connect_timeout: float = Field(5.0, description="Connect-Timeout in Sekunden")
+    embeddings_timeout: float = Field(60.0, description="Read-Timeout für watsonx Embeddings")
+    llm_timeout: float = Field(60.0, description="Read-Timeout für watsonx Text-Generation")
+    iam_timeout: float = Field(30.0, description="Read-Timeout für IBM IAM")
+
+    # Instrumentierung
+    metrics_enabled: bool = Field(True, description="Latenz-Spans, /metrics und Server-Timing-Header")
+
+    # IAM-Credential-Broker
+    ibm_iam_url: str = Field("https://iam.cloud.ibm.com/identity/token", description="IAM-Token-Endpunkt (für Tests auf einen lokalen Fake umbiegbar)")
+    iam_refresh_fraction: float = Field(0.8, description="Anteil der Token-Laufzeit, nach dem im Hintergrund erneuert wird")
+    iam_expiry_margin: float = Field(60.0, description="Sekunden vor Ablauf, ab denen ein Token nicht mehr verwendet wird")
+    iam_retry_max_backoff: float = Field(60.0, description="Max. Wartezeit zwischen fehlgeschlagenen Refresh-Versuchen (Sekunden)")
+
+    # Query-Embedding-Cache
+    embedding_cache_size: int = Field(2048, description="Max. Einträge im In-Memory-LRU")
+    embedding_cache_ttl: float = Field(86400.0, description="TTL der In-Memory-Einträge (Sekunden)")
+    embedding_cache_pg_enabled: bool = Field(False, description="Zweite Cache-Stufe in Postgres aktivieren")
+    embedding_cache_pg_ttl: float = Field(7 * 86400.0, description="TTL der Postgres-Einträge (Sekunden)")
+
+    # Semantischer Antwort-Cache
+    answer_cache_enabled: bool = Field(True, description="Semantischen Antwort-Cache für /v1/ask verwenden")
+    answer_cache_threshold: float = Field(0.95, description="Min. Kosinus-Ähnlichkeit für einen Cache-Treffer")
+    answer_cache_ttl: float = Field(86400.0, description="Max. Alter gecachter Antworten (Sekunden)")
+
+    # Gleichzeitige identische /v1/ask-Anfragen zusammenfassen
+    ask_singleflight_enabled: bool = Field(True, description="Identische laufende /v1/ask-Anfragen teilen sich eine Ausführung")
+
+    # /v1/ask/batch
+    ask_batch_max_items: int = Field(100, description="Max. Fragen pro Batch-Request")
+    ask_batch_concurrency: int = Field(4, description="Gleichzeitige LLM-Generierungen pro Batch")
+
+    # Embedding-Scheduler für Ingest
+    ingest_embed_batch_size: int = Field(64, description="Max. Texte pro Embeddings-Request")
+    ingest_embed_batch_chars: int = Field(100_000, description="Max. Zeichen pro Embeddings-Request")
+    ingest_embed_concurrency: int = Field(4, description="Max. gleichzeitige Embeddings-Requests")
+    ingest_embed_rps: float = Field(8.0, description="Max. Embeddings-Requests pro Sekunde (0 = unbegrenzt)")
+    ingest_embed_max_retries: int = Field(5, description="Wiederholungen bei 429/5xx/Netzwerkfehlern")
+
+    # Ingest-Pipeline (python -m ingest.ingest)
+    ingest_pipeline_workers: int = Field(4, description="Prozesse für Parsen und Chunking")
+    ingest_pipeline_batch_chunks: int = Field(256, description="Chunks pro Embedding-/Upsert-Batch (ganze Dokumente)")
+    ingest_pipeline_queue_size: int = Field(4, description="Max. Einträge je Queue zwischen den Stufen")
+
+    # Hintergrund-Jobs für /api/ingest-uploaded-file
+    ingest_job_workers: int = Field(1, description="Gleichzeitige Ingest-Worker im Server-Prozess")
+    ingest_job_max_batch: int = Field(16, description="Max. wartende Uploads pro gemeinsamem Durchlauf")
+    ingest_job_history: int = Field(200, description="Abgeschlossene Jobs, die für /api/jobs abrufbar bleiben")
+    ingest_job_poll_interval: float = Field(2.0, description="Sekunden zwischen Abfragen nach Jobs anderer Prozesse")
+    ingest_job_stale_after: float = Field(1800.0, description="Sekunden ohne Fortschritt, nach denen ein laufender Job als verwaist gilt")
+
+    # ANN-Index auf documents.embedding
+    vector_index_method: str = Field("hnsw", description="'hnsw', 'ivfflat' oder 'none' (exakte Suche)")
+    vector_index_on_startup: bool = Field(False, description="Fehlenden Index beim Serverstart anlegen")
+    hnsw_m: int = Field(16, description="HNSW: Verbindungen pro Knoten")
+    hnsw_ef_construction: int = Field(64, description="HNSW: Kandidatenliste beim Aufbau")
+    hnsw_ef_search: int = Field(40, description="HNSW: Kandidatenliste pro Suche (Recall vs. Latenz)")
+    ivfflat_lists: int = Field(100, description="IVFFlat: Anzahl Listen")
+    ivfflat_probes: int = Field(10, description="IVFFlat: durchsuchte Listen pro Suche")
+
+    # Retrieval
+    retrieval_k: int = Field(6, description="Max. Kontext-Chunks im Prompt")
+    retrieval_mode: str = Field("hybrid", description="'vector' oder 'hybrid' (Volltext + Vektor, RRF)")
+    hybrid_candidates: int = Field(30, description="Kandidaten je Suchart vor der Fusion")
+    hybrid_vector_weight: float = Field(1.0, description="RRF-Gewicht der Vektor-Treffer")
+    hybrid_text_weight: float = Field(1.0, description="RRF-Gewicht der Volltext-Treffer")
+    hybrid_rrf_k: int = Field(60, description="RRF-Konstante k (größer = flachere Rangkurve)")
+    retrieval_backend: str = Field("postgres", description="'postgres' oder 'mmap' (In-Process-Index, nur Vektor-Suche)")
+    vector_store_dir: str = Field("/tmp/boardy_vector_store", description="Verzeichnis für den mmap-Export (von allen Workern geteilt)")
+    vector_store_dtype: str = Field("float32", description="'float32' oder 'float16'")
+    vector_store_check_interval: float = Field(10.0, description="Sekunden zwischen Prüfungen der corpus_version")
+    vector_store_keep_versions: int = Field(2, description="So viele Export-Versionen bleiben liegen (andere Worker laden ggf. noch eine ältere)")
+
+    # Kontext-Packing für den Prompt
+    context_max_tokens: int = Field(1500, description="Token-Budget für den Kontext im Prompt")
+    context_candidates: int = Field(12, description="Anzahl abgerufener Kandidaten vor MMR-Auswahl")
+    context_mmr_lambda: float = Field(0.7, description="MMR: 1 = nur Relevanz, 0 = nur Diversität")
+    context_tokenizer_path: Optional[str] = Field(None, description="Pfad zu tokenizer.json für exakte Tokenzählung")
+
+    # Cache für /api/ask-with-file (geparste Chunks + Embeddings je Dateiinhalt)
+    upload_cache_size: int = Field(32, description="Max. gecachte Dateien")
+    upload_cache_max_mb: int = Field(256, description="Max. Speicher des Upload-Caches (MB)")
+    upload_cache_ttl: float = Field(3600.0, description="TTL der gecachten Dateien (Sekunden)")
+    upload_parse_workers: int = Field(2, description="Prozesse für das Parsen hochgeladener Dateien")
+    upload_top_k: int = Field(12, description="Ähnlichste Datei-Chunks als Kandidaten fürs Kontext-Packing")
+
+    # Standorte mit eigenem (partiellem) ANN-Index, kommagetrennt
+    locations: str = Field("boeblingen,muenchen,ludwigsburg", description="Standort-IDs für gefiltertes Retrieval")
 
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,185 @@
+# app/context.py
+"""
+Token-bewusstes Packen des Prompt-Kontexts (geteilt von /v1/ask und /api/ask-with-file).
+
+1. Überlappende Nachbar-Chunks desselben Dokuments zusammenführen (Chunker-Overlap)
+   und identische Chunks entfernen.
+2. Diverse Chunks per Maximal Marginal Relevance (NumPy) auswählen.
+3. Bis zu einem exakten Token-Budget auffüllen.
+
+Tokenzählung: mit CONTEXT_TOKENIZER_PATH (tokenizer.json, Paket `tokenizers`) exakt,
+sonst eine Subword-Schätzung (~4 Zeichen pro Token, Satzzeichen eigene Tokens).
+"""
+import re, zlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .config import settings
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+MIN_MERGE_OVERLAP = 5   # Wörter; darunter ist Gleichheit eher Zufall
+MAX_MERGE_OVERLAP = 200
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    if not settings.context_tokenizer_path:
+        return None
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        print("Warnung: CONTEXT_TOKENIZER_PATH gesetzt, aber Paket 'tokenizers' fehlt – verwende Schätzung")
+        return None
+    return Tokenizer.from_file(settings.context_tokenizer_path)
+
+def count_tokens(text: str) -> int:
+    tok = _tokenizer()
+    if tok is not None:
+        return len(tok.encode(text, add_special_tokens=False).ids)
+    return sum(1 + (len(w) - 1) // 4 for w in _WORD_RE.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    words = text.split()
+    lo, hi = 0, len(words)
+    # binäre Suche nach dem längsten Wort-Präfix innerhalb des Budgets
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo])
+
+def _overlap(a: List[str], b: List[str]) -> int:
+    for n in range(min(len(a), len(b), MAX_MERGE_OVERLAP), MIN_MERGE_OVERLAP - 1, -1):
+        if a[-n:] == b[:n]:
+            return n
+    return 0
+
+def _as_array(v) -> np.ndarray:
+    # pgvector liefert je nach Version ein Vector-Objekt oder ein numpy-Array
+    if hasattr(v, "to_numpy"):
+        return v.to_numpy().astype(np.float32)
+    return np.asarray(v, dtype=np.float32)
+
+def _unit(v: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+def merge_overlapping(contexts: Sequence[Dict], max_tokens: Optional[int] = None) -> List[Dict]:
+    """
+    Führt aufeinanderfolgende Chunks (chunk_id, chunk_id+1) eines Dokuments zusammen,
+    solange das Ergebnis max_tokens nicht überschreitet.
+    """
+    seen, unique = set(), []
+    for c in contexts:
+        key = (c["doc_id"], c["content"])
+        if key not in seen:
+            seen.add(key)
+            unique.append({**c, "chunk_ids": list(c.get("chunk_ids") or [c["chunk_id"]])})
+
+    by_first = {(c["doc_id"], c["chunk_ids"][0]): c for c in unique}
+    absorbed = set()
+    for c in sorted(unique, key=lambda c: (c["doc_id"], c["chunk_ids"][0])):
+        if id(c) in absorbed:
+            continue
+        while True:
+            nxt = by_first.get((c["doc_id"], c["chunk_ids"][-1] + 1))
+            if nxt is None or id(nxt) in absorbed:
+                break
+            a, b = c["content"].split(), nxt["content"].split()
+            n = _overlap(a, b)
+            if not n:
+                break
+            content = " ".join(a + b[n:])
+            if max_tokens is not None and count_tokens(content) > max_tokens:
+                break
+            c["content"] = content
+            c["chunk_ids"] += nxt["chunk_ids"]
+            c["score"] = max(c.get("score") or 0.0, nxt.get("score") or 0.0)
+            if c.get("embedding") is not None and nxt.get("embedding") is not None:
+                c["embedding"] = _unit(_as_array(c["embedding"]) + _as_array(nxt["embedding"]))
+            absorbed.add(id(nxt))
+    # Reihenfolge (Relevanz) der Eingabe beibehalten
+    return [c for c in unique if id(c) not in absorbed]
+
+def _bow_matrix(texts: Sequence[str], dim: int = 1024) -> np.ndarray:
+    """Gehashte Bag-of-Words-Vektoren als Ersatz, wenn Embeddings fehlen."""
+    m = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, t in enumerate(texts):
+        for w in _WORD_RE.findall(t.lower()):
+            if len(w) > 2:
+                m[i, zlib.crc32(w.encode("utf-8")) % dim] += 1.0
+    return m
+
+def mmr_order(query_vec: np.ndarray, doc_vecs: np.ndarray, lambda_: float) -> List[int]:
+    """Reihenfolge nach Maximal Marginal Relevance (Relevanz vs. Redundanz)."""
+    def normalize(m):
+        norms = np.linalg.norm(m, axis=-1, keepdims=True)
+        return m / np.where(norms == 0, 1, norms)
+
+    docs = normalize(doc_vecs.astype(np.float32))
+    relevance = docs @ normalize(query_vec.astype(np.float32))
+    pairwise = docs @ docs.T
+    order: List[int] = []
+    remaining = list(range(len(docs)))
+    max_sim = np.full(len(docs), -np.inf, dtype=np.float32)
+    while remaining:
+        idx = np.asarray(remaining)
+        redundancy = np.where(np.isfinite(max_sim[idx]), max_sim[idx], 0.0)
+        scores = lambda_ * relevance[idx] - (1 - lambda_) * redundancy
+        best = int(idx[int(np.argmax(scores))])
+        order.append(best)
+        remaining.remove(best)
+        max_sim = np.maximum(max_sim, pairwise[best])
+    return order
+
+def context_line(c: Dict) -> str:
+    title = c["metadata"].get("filename") or c["doc_id"]
+    ids = c.get("chunk_ids") or [c["chunk_id"]]
+    ref = str(ids[0]) if len(ids) == 1 else f"{ids[0]}-{ids[-1]}"
+    return f"[{title}#{ref}] {c['content']}"
+
+def pack_context(
+    query: str,
+    contexts: Sequence[Dict],
+    query_vec: Optional[Sequence[float]] = None,
+    max_tokens: Optional[int] = None,
+    max_chunks: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Liefert die ausgewählten Kontexte in MMR-Reihenfolge; die formatierten
+    Zeilen (context_line) passen zusammen in max_tokens.
+    """
+    if not contexts:
+        return []
+    budget = max_tokens or settings.context_max_tokens
+    # zusammengeführte Chunks dürfen höchstens das halbe Budget belegen
+    candidates = merge_overlapping(contexts, max_tokens=budget // 2)
+
+    have_embeddings = query_vec is not None and all(c.get("embedding") is not None for c in candidates)
+    if have_embeddings:
+        doc_vecs = np.stack([_as_array(c["embedding"]) for c in candidates])
+        q = np.asarray(query_vec, dtype=np.float32)
+    else:
+        m = _bow_matrix([query] + [c["content"] for c in candidates])
+        q, doc_vecs = m[0], m[1:]
+    order = mmr_order(q, doc_vecs, settings.context_mmr_lambda)
+
+    packed, used, skipped = [], 0, None
+    sep = count_tokens("\n\n")
+    for i in order:
+        if max_chunks is not None and len(packed) >= max_chunks:
+            break
+        c = candidates[i]
+        cost = count_tokens(context_line(c)) + (sep if packed else 0)
+        if used + cost <= budget:
+            packed.append(c)
+            used += cost
+        elif skipped is None:
+            skipped = c
+    # Rest-Budget mit dem relevantesten übersprungenen Chunk (angeschnitten) füllen
+    if skipped is not None and (max_chunks is None or len(packed) < max_chunks):
+        room = budget - used - (sep if packed else 0) - count_tokens(context_line({**skipped, "content": ""}))
+        if room >= 20:
+            packed.append({**skipped, "content": truncate_to_tokens(skipped["content"], room)})
+    return packed
@@ -1,9 +1,78 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 import psycopg
 from psycopg.rows import dict_row
-from pgvector.psycopg import register_vector  # ← NEU
+from psycopg_pool import AsyncConnectionPool
+from pgvector.psycopg import register_vector_async
 from .config import settings
+from . import metrics
 
-def get_conn():
-    conn = psycopg.connect(settings.database_url, row_factory=dict_row)
-    register_vector(conn)  # ← WICHTIG: Adapter registrieren
-    return conn
+def vector_to_list(value: Any) -> List[float]:
+    """pgvector liefert je nach Version ein Vector-Objekt oder ein numpy-Array."""
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    return [float(x) for x in value]
+
+# ---- Async Connection-Pool (Server & Ingest) ----
+_pool: Optional[AsyncConnectionPool] = None
+
+async def _configure(conn: psycopg.AsyncConnection) -> None:
+    # pgvector-Adapter nur einmal pro physischer Verbindung registrieren
+    await register_vector_async(conn)
+    await conn.commit()
+
+async def open_pool(wait: bool = True) -> AsyncConnectionPool:
+    """Erstellt (einmalig) den Pool und öffnet ihn."""
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            settings.database_url,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            timeout=settings.db_pool_timeout,
+            max_idle=settings.db_pool_max_idle,
+            kwargs={"row_factory": dict_row},
+            configure=_configure,
+            check=AsyncConnectionPool.check_connection,  # Health-Check vor Ausgabe
+            name="boardy",
+            open=False,
+        )
+        await _pool.open(wait=wait)
+    return _pool
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[psycopg.AsyncConnection]:
+    """Leiht eine Verbindung aus dem Pool; Commit bei Erfolg, Rollback bei Fehler."""
+    pool = _pool or await open_pool()
+    t0 = time.perf_counter()
+    async with pool.connection() as conn:
+        metrics.record("db.acquire", time.perf_counter() - t0)
+        yield conn
+
+def pool_stats() -> Dict:
+    if _pool is None:
+        return {"open": False}
+    s = _pool.get_stats()
+    requests = s.get("requests_num", 0)
+    return {
+        "open": True,
+        "size": s.get("pool_size", 0),
+        "available": s.get("pool_available", 0),
+        "min_size": s.get("pool_min", 0),
+        "max_size": s.get("pool_max", 0),
+        "requests_waiting": s.get("requests_waiting", 0),
+        "requests": requests,
+        "requests_queued": s.get("requests_queued", 0),
+        "requests_errors": s.get("requests_errors", 0),
+        "wait_ms_total": s.get("requests_wait_ms", 0),
+        "wait_ms_avg": (s.get("requests_wait_ms", 0) / requests) if requests else 0.0,
+        "connections": s.get("connections_num", 0),
+        "connections_lost": s.get("connections_lost", 0),
+    }
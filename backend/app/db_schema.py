@@ -0,0 +1,158 @@
+# app/db_schema.py
+"""
+Idempotente DDL für Tabellen, die der Server selbst verwaltet.
+
+Wird beim Start des Servers und vor jedem Ingest ausgeführt.
+"""
+from .db import connection
+from .locations import normalize_location
+
+SCHEMA_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    # Standort-Filter: metadata.audience als eigene (indexierbare) Spalte
+    """
+    ALTER TABLE IF EXISTS documents
+        ADD COLUMN IF NOT EXISTS audience text GENERATED ALWAYS AS (metadata->>'audience') STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS documents_audience_idx ON documents (audience)",
+    # Hybrid-Retrieval: deutscher Volltext-Index, beim Ingest automatisch befüllt
+    """
+    ALTER TABLE IF EXISTS documents
+        ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS (to_tsvector('german', coalesce(content, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS documents_tsv_idx ON documents USING gin (tsv)",
+    # Zweite Cache-Stufe für Query-Embeddings (geteilt zwischen Replikas)
+    """
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        key        text PRIMARY KEY,
+        model_id   text NOT NULL,
+        embedding  vector NOT NULL,
+        created_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    # Semantischer Antwort-Cache (app/answer_cache.py)
+    """
+    CREATE TABLE IF NOT EXISTS answer_cache (
+        id         bigserial PRIMARY KEY,
+        scope      text NOT NULL DEFAULT '',
+        query      text NOT NULL,
+        embedding  vector NOT NULL,
+        answer     text NOT NULL,
+        sources    jsonb NOT NULL,
+        doc_ids    text[] NOT NULL,
+        created_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS answer_cache_scope_idx ON answer_cache (scope)",
+    "CREATE INDEX IF NOT EXISTS answer_cache_doc_ids_idx ON answer_cache USING gin (doc_ids)",
+    # Manifest für den inkrementellen Sync (ingest/sync.py)
+    """
+    CREATE TABLE IF NOT EXISTS ingest_manifest_files (
+        doc_id      text PRIMARY KEY,
+        path        text NOT NULL,
+        file_hash   text NOT NULL,
+        chunk_count int NOT NULL,
+        synced_at   timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingest_manifest_chunks (
+        doc_id       text NOT NULL REFERENCES ingest_manifest_files (doc_id) ON DELETE CASCADE,
+        chunk_id     int NOT NULL,
+        content_hash text NOT NULL,
+        PRIMARY KEY (doc_id, chunk_id)
+    )
+    """,
+    # Jobstatus für /api/ingest-uploaded-file (ingest/jobs.py), geteilt zwischen Workern
+    """
+    CREATE TABLE IF NOT EXISTS ingest_jobs (
+        id          text PRIMARY KEY,
+        filename    text NOT NULL,
+        path        text NOT NULL,
+        status      text NOT NULL,
+        stage       text,
+        chunks      int NOT NULL DEFAULT 0,
+        batch_size  int NOT NULL DEFAULT 0,
+        error       text,
+        created_at  double precision NOT NULL,
+        started_at  double precision,
+        finished_at double precision,
+        updated_at  double precision NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ingest_jobs_status_idx ON ingest_jobs (status, created_at)",
+    # Corpus-Version: wird bei jedem Ingest erhöht (Hot-Reload des mmap-Vector-Stores)
+    """
+    CREATE TABLE IF NOT EXISTS corpus_version (
+        id         boolean PRIMARY KEY DEFAULT true CHECK (id),
+        version    bigint NOT NULL DEFAULT 0,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    "INSERT INTO corpus_version (id) VALUES (true) ON CONFLICT DO NOTHING",
+    # Build-Protokoll des ANN-Index (app/vector_index.py)
+    """
+    CREATE TABLE IF NOT EXISTS vector_index_builds (
+        index_name    text NOT NULL,
+        method        text NOT NULL,
+        params        jsonb NOT NULL,
+        build_seconds double precision NOT NULL,
+        built_at      timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+]
+
+async def normalize_audiences(conn) -> int:
+    """
+    Bringt metadata.audience von Altbestand ("München", "münchen") auf die
+    normalisierte Form, die der Standort-Filter vergleicht, und Uploads auf
+    NULL (für alle Standorte sichtbar). Ein Sync hilft
+    hier nicht – die Dateien selbst sind unverändert. Liefert die Zahl
+    geänderter Zeilen.
+    """
+    cur = await conn.execute(
+        "SELECT DISTINCT metadata->>'audience' AS audience FROM documents WHERE metadata->>'audience' <> ''"
+    )
+    changes = [
+        (raw, norm) for raw, norm in ((r["audience"], normalize_location(r["audience"])) for r in await cur.fetchall())
+        if norm and norm != raw
+    ]
+    updated = 0
+    for raw, norm in changes:
+        cur = await conn.execute(
+            """
+            UPDATE documents SET metadata = jsonb_set(metadata::jsonb, '{audience}', to_jsonb(%s::text))
+            WHERE metadata->>'audience' = %s
+            """,
+            (norm, raw),
+        )
+        updated += cur.rowcount
+    # Uploads wurden früher mit audience "" geschrieben – standortlos ist NULL
+    cur = await conn.execute(
+        """
+        UPDATE documents SET metadata = jsonb_set(metadata::jsonb, '{audience}', 'null')
+        WHERE metadata->>'source' = 'upload' AND metadata->>'audience' = ''
+        """
+    )
+    updated += cur.rowcount
+    if updated:
+        # mmap-Vector-Store neu laden lassen
+        await conn.execute("UPDATE corpus_version SET version = version + 1, updated_at = now()")
+        print(f"Standorte normalisiert: {updated} Chunks ({', '.join(f'{r} → {n}' for r, n in changes) or 'Uploads'})")
+    return updated
+
+async def ensure_schema() -> None:
+    async with connection() as conn:
+        for stmt in SCHEMA_STATEMENTS:
+            # jede Anweisung in eigenem Savepoint: ein Fehler (z.B. fehlende
+            # documents-Tabelle) soll die übrigen Tabellen nicht verhindern
+            try:
+                async with conn.transaction():
+                    await conn.execute(stmt)
+            except Exception as e:
+                print(f"Warnung: Schema-Anweisung fehlgeschlagen: {e}")
+        try:
+            async with conn.transaction():
+                await normalize_audiences(conn)
+        except Exception as e:
+            print(f"Warnung: Normalisierung der Standorte fehlgeschlagen: {e}")
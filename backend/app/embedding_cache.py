@@ -0,0 +1,115 @@
+# app/embedding_cache.py
+"""
+Cache vor WatsonxAIEmbeddings.embed für Query-Embeddings.
+
+Stufe 1: begrenzter In-Memory-LRU mit TTL (pro Prozess).
+Stufe 2 (optional): Tabelle `embedding_cache` in Postgres, geteilt von allen Replikas.
+Schlüssel: normalisierter Text + EMBEDDINGS_MODEL_ID.
+"""
+import hashlib, re, unicodedata
+from typing import Dict, List, Optional
+from pgvector import Vector
+from .cache import LRUCache
+from .config import settings
+from .db import connection, vector_to_list
+from .embeddings import WatsonxAIEmbeddings
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+class CachedEmbeddings:
+    def __init__(self, provider: Optional[WatsonxAIEmbeddings] = None):
+        self.provider = provider or WatsonxAIEmbeddings()
+        self.model_id = self.provider.model_id
+        self.memory: LRUCache[List[float]] = LRUCache(
+            settings.embedding_cache_size, settings.embedding_cache_ttl
+        )
+        self.pg_enabled = settings.embedding_cache_pg_enabled
+        self.pg_hits = 0
+        self.pg_misses = 0
+        self.upstream_texts = 0
+
+    def key(self, text: str) -> str:
+        norm = normalize_query(text).casefold()
+        return hashlib.sha256(f"{self.model_id}\n{norm}".encode("utf-8")).hexdigest()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        for k in set(keys):
+            vec = self.memory.get(k)
+            if vec is not None:
+                found[k] = vec
+
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing and self.pg_enabled:
+            from_pg = await self._pg_lookup(missing)
+            self.pg_hits += len(from_pg)
+            self.pg_misses += len(missing) - len(from_pg)
+            for k, vec in from_pg.items():
+                self.memory.set(k, vec)
+                found[k] = vec
+            missing = [k for k in missing if k not in found]
+
+        if missing:
+            # jeden fehlenden Schlüssel genau einmal upstream einbetten
+            first_text = {}
+            for k, t in zip(keys, texts):
+                first_text.setdefault(k, normalize_query(t))
+            vectors = await self.provider.embed([first_text[k] for k in missing])
+            self.upstream_texts += len(missing)
+            fresh = dict(zip(missing, vectors))
+            for k, vec in fresh.items():
+                self.memory.set(k, vec)
+                found[k] = vec
+            if self.pg_enabled:
+                await self._pg_store(fresh)
+
+        return [found[k] for k in keys]
+
+    async def _pg_lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        sql = """
+        SELECT key, embedding FROM embedding_cache
+        WHERE key = ANY(%s) AND model_id = %s
+          AND created_at > now() - make_interval(secs => %s)
+        """
+        try:
+            async with connection() as conn, conn.cursor() as cur:
+                await cur.execute(sql, (keys, self.model_id, settings.embedding_cache_pg_ttl))
+                rows = await cur.fetchall()
+        except Exception as e:
+            # Cache-Fehler dürfen die Anfrage nie scheitern lassen
+            print(f"Warnung: embedding_cache Lookup fehlgeschlagen: {e}")
+            return {}
+        return {r["key"]: vector_to_list(r["embedding"]) for r in rows}
+
+    async def _pg_store(self, items: Dict[str, List[float]]) -> None:
+        sql = """
+        INSERT INTO embedding_cache (key, model_id, embedding)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (key) DO UPDATE SET embedding = EXCLUDED.embedding, created_at = now()
+        """
+        try:
+            async with connection() as conn, conn.cursor() as cur:
+                await cur.executemany(
+                    sql, [(k, self.model_id, Vector(v)) for k, v in items.items()]
+                )
+        except Exception as e:
+            print(f"Warnung: embedding_cache Schreiben fehlgeschlagen: {e}")
+
+    def stats(self) -> Dict:
+        out = {"memory": self.memory.stats(), "upstream_texts": self.upstream_texts}
+        if self.pg_enabled:
+            out["postgres"] = {"hits": self.pg_hits, "misses": self.pg_misses}
+        return out
+
+# Globale Instanz
+query_embedder: Optional[CachedEmbeddings] = None
+
+def get_query_embedder() -> CachedEmbeddings:
+    """Singleton-Pattern für den gecachten Query-Embedder"""
+    global query_embedder
+    if query_embedder is None:
+        query_embedder = CachedEmbeddings()
+    return query_embedder
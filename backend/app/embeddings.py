@@ -1,7 +1,9 @@
 # app/embeddings.py
 from typing import List
-import os, httpx, json
-from .ibm_auth import iam_token_manager
+import os, json
+from .ibm_auth import watsonx_token
+from .http_client import get_client, timeout_for, UpstreamError
+from . import metrics
 
 API_VERSION = os.environ.get("WATSONX_API_VERSION", "2024-05-01")
 
@@ -10,10 +12,9 @@ class WatsonxAIEmbeddings:
         self.base_url = os.environ["WATSONX_BASE_URL"].rstrip("/")
         self.model_id = os.environ["EMBEDDINGS_MODEL_ID"]
         self.project_id = os.environ.get("WATSONX_PROJECT_ID", "")
-        self.timeout = 60
 
     async def embed(self, texts: List[str]) -> List[List[float]]:
-        token = await iam_token_manager.get_token()
+        token = await watsonx_token()
         headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
@@ -29,41 +30,46 @@ class WatsonxAIEmbeddings:
 
         url = f"{self.base_url}/ml/v1/text/embeddings?version={API_VERSION}"
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            if r.status_code >= 400:
-                raise RuntimeError(f"Embeddings error {r.status_code}: {r.text}")
+        with metrics.span("embeddings.upstream"):
+            try:
+                r = await get_client().post(url, headers=headers, json=payload, timeout=timeout_for("embeddings"))
+            except Exception:
+                metrics.upstream("embeddings", "error")
+                raise
+        metrics.upstream("embeddings", r.status_code)
+        if r.status_code >= 400:
+            raise UpstreamError.from_response("Embeddings", r)
 
-            j = r.json()
+        j = r.json()
 
-            # ---- verschiedene mögliche Antwortformen robust behandeln ----
-            # Form 1: {"data":[{"embedding":[...]} , ...]}
-            if isinstance(j, dict) and "data" in j:
-                out = []
-                for item in j["data"]:
-                    emb = item.get("embedding") or item.get("values")
-                    if emb is None:
-                        raise RuntimeError(f"Embeddings response item missing 'embedding/values': {json.dumps(item)[:500]}")
-                    out.append(emb)
-                return out
+        # ---- verschiedene mögliche Antwortformen robust behandeln ----
+        # Form 1: {"data":[{"embedding":[...]} , ...]}
+        if isinstance(j, dict) and "data" in j:
+            out = []
+            for item in j["data"]:
+                emb = item.get("embedding") or item.get("values")
+                if emb is None:
+                    raise RuntimeError(f"Embeddings response item missing 'embedding/values': {json.dumps(item)[:500]}")
+                out.append(emb)
+            return out
 
-            # Form 2: {"results":[{"embedding":[...]} , ...]}
-            if isinstance(j, dict) and "results" in j:
-                out = []
-                for item in j["results"]:
-                    emb = item.get("embedding") or item.get("values")
-                    if emb is None and "data" in item and isinstance(item["data"], list):
-                        # manche Antworten verschachteln es unter item["data"][0]["embedding"]
-                        maybe = item["data"][0] if item["data"] else {}
-                        emb = maybe.get("embedding") or maybe.get("values")
-                    if emb is None:
-                        raise RuntimeError(f"Embeddings response item missing 'embedding/values': {json.dumps(item)[:500]}")
-                    out.append(emb)
-                return out
+        # Form 2: {"results":[{"embedding":[...]} , ...]}
+        if isinstance(j, dict) and "results" in j:
+            out = []
+            for item in j["results"]:
+                emb = item.get("embedding") or item.get("values")
+                if emb is None and "data" in item and isinstance(item["data"], list):
+                    # manche Antworten verschachteln es unter item["data"][0]["embedding"]
+                    maybe = item["data"][0] if item["data"] else {}
+                    emb = maybe.get("embedding") or maybe.get("values")
+                if emb is None:
+                    raise RuntimeError(f"Embeddings response item missing 'embedding/values': {json.dumps(item)[:500]}")
+                out.append(emb)
+            return out
 
-            # Form 3: {"embeddings":[[...], [...]]}
-            if isinstance(j, dict) and "embeddings" in j and isinstance(j["embeddings"], list):
-                return j["embeddings"]
+        # Form 3: {"embeddings":[[...], [...]]}
+        if isinstance(j, dict) and "embeddings" in j and isinstance(j["embeddings"], list):
+            return j["embeddings"]
 
-            # Wenn wir hier sind, kennen wir das Format nicht:
-            raise RuntimeError(f"Unexpected embeddings response format: {json.dumps(j)[:800]}")
+        # Wenn wir hier sind, kennen wir das Format nicht:
+        raise RuntimeError(f"Unexpected embeddings response format: {json.dumps(j)[:800]}")
@@ -0,0 +1,81 @@
+# app/http_client.py
+"""
+Gemeinsamer, langlebiger HTTP-Client für alle Upstream-Aufrufe (watsonx, IAM).
+
+Statt pro Aufruf einen neuen httpx.AsyncClient (inkl. TCP- und TLS-Handshake)
+zu öffnen, hält der Client Keep-Alive-Verbindungen in einem Pool. Im Server
+wird er über den FastAPI-Lifespan gestartet und geschlossen; in CLI-Kontexten
+(z.B. ingest) wird er beim ersten Zugriff lazy angelegt.
+"""
+import importlib.util
+from typing import Optional
+import httpx
+from .config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+class UpstreamError(RuntimeError):
+    """HTTP-Fehler eines Upstreams; trägt Status und ggf. Retry-After (Sekunden)."""
+
+    def __init__(self, message: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_response(cls, prefix: str, r: httpx.Response) -> "UpstreamError":
+        retry_after = None
+        try:
+            retry_after = float(r.headers.get("Retry-After", ""))
+        except ValueError:
+            pass
+        return cls(f"{prefix} error {r.status_code}: {r.text}", r.status_code, retry_after)
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code == 429 or self.status_code >= 500
+
+_READ_TIMEOUTS = {
+    "embeddings": lambda: settings.embeddings_timeout,
+    "llm": lambda: settings.llm_timeout,
+    "iam": lambda: settings.iam_timeout,
+}
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.http2_enabled
+    if http2 and not _http2_available():
+        print("Warnung: HTTP2_ENABLED gesetzt, aber Paket 'h2' fehlt – verwende HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=http2,
+        timeout=httpx.Timeout(60.0, connect=settings.http_connect_timeout),
+    )
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+def timeout_for(upstream: str) -> httpx.Timeout:
+    """Timeout pro Upstream ('embeddings', 'llm', 'iam')."""
+    read = _READ_TIMEOUTS[upstream]()
+    return httpx.Timeout(read, connect=settings.http_connect_timeout)
+
+async def startup() -> None:
+    get_client()
+
+async def shutdown() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
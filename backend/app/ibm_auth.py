@@ -1,32 +1,255 @@
 # app/ibm_auth.py
-import os, time, httpx
+"""
+Zentraler Credential-Broker für IBM-Cloud-IAM-Tokens.
 
-class IAMTokenManager:
-    def __init__(self):
-        self.api_key = os.environ.get("WATSONX_API_KEY")
-        if not self.api_key:
-            raise RuntimeError("WATSONX_API_KEY ist nicht gesetzt (ENV).")
+- Eine TokenSource pro API-Key: watsonx, Speech to Text und Text to Speech
+  können verschiedene Keys haben, gleiche Keys teilen sich ein Token.
+- Im Server erneuert ein Hintergrund-Task jedes Token, sobald
+  IAM_REFRESH_FRACTION seiner Laufzeit verstrichen ist – Requests finden im
+  Normalfall immer ein gültiges Token vor und zahlen keine IAM-Latenz.
+- Muss doch auf dem Request-Pfad geholt werden (erster Zugriff, Token nach
+  Fehlern abgelaufen), teilen sich alle Aufrufer einen IAM-Call (Single-Flight).
+- Die synchronen Watson-SDKs (STT/TTS) bekommen über BrokerAuthenticator
+  dasselbe Token statt eigener IAMAuthenticator-Instanzen.
 
-        self.iam_url = os.environ.get(
-            "IBM_IAM_URL", "https://iam.cloud.ibm.com/identity/token"
-        )
-        self._token = None
-        self._exp = 0
+Der Endpunkt kommt aus IBM_IAM_URL und lässt sich so auf einen lokalen Fake
+umbiegen (bench/stub_watsonx.py, bench/iam_broker.py).
+"""
+import asyncio, time
+from typing import Dict, List, Optional
+import httpx
+from ibm_cloud_sdk_core.authenticators import BearerTokenAuthenticator
+from .config import settings
+from .http_client import get_client, timeout_for, UpstreamError
+from .singleflight import SingleFlight
+from . import metrics
+
+_GRANT_TYPE = "urn:ibm:params:oauth:grant-type:apikey"
+_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+class TokenSource:
+    def __init__(self, name: str, api_key: str, iam_url: str, broker: "CredentialBroker"):
+        self.names: List[str] = [name]
+        self.api_key = api_key
+        self.iam_url = iam_url
+        self.broker = broker
+        self._token: Optional[str] = None
+        self._issued = 0.0
+        self._exp = 0.0
+        self._flight: SingleFlight[str] = SingleFlight()
+        # Metriken
+        self.refreshes = 0
+        self.failures = 0
+        self.request_path_waits = 0   # Aufrufer, die auf einen IAM-Call warten mussten
+        self.last_latency_ms: Optional[float] = None
+        self.max_latency_ms = 0.0
+        self._latency_total = 0.0
+        self.last_error: Optional[str] = None
+        self.last_refresh_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self.names[0]
+
+    def valid(self) -> bool:
+        return self._token is not None and time.time() < self._exp - settings.iam_expiry_margin
+
+    def refresh_due(self) -> float:
+        """Unix-Zeit, zu der der Hintergrund-Task erneuern soll."""
+        if self._token is None:
+            return 0.0
+        return self._issued + (self._exp - self._issued) * settings.iam_refresh_fraction
 
     async def get_token(self) -> str:
-        if self._token and time.time() < self._exp - 60:
+        if self.valid():
             return self._token
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        data = {
-            "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
-            "apikey": self.api_key,
-        }
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(self.iam_url, data=data, headers=headers)
-            r.raise_for_status()
-            payload = r.json()
-            self._token = payload["access_token"]
-            self._exp = time.time() + int(payload.get("expires_in", 3600))
+        self.request_path_waits += 1
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        return await self._flight.do(self.api_key, self._fetch)
+
+    async def _fetch(self) -> str:
+        t0 = time.perf_counter()
+        try:
+            data = {"grant_type": _GRANT_TYPE, "apikey": self.api_key}
+            with metrics.span("iam.refresh"):
+                r = await get_client().post(self.iam_url, data=data, headers=_HEADERS, timeout=timeout_for("iam"))
+            metrics.upstream("iam", r.status_code)
+            if r.status_code >= 400:
+                raise UpstreamError.from_response("IAM", r)
+            return self._accept(r.json(), t0)
+        except Exception as e:
+            self._failed(e, t0)
+            raise
+
+    def _fetch_blocking(self) -> str:
+        # nur ohne laufenden Broker-Loop (CLI, Skripte): direkter synchroner Call
+        t0 = time.perf_counter()
+        try:
+            data = {"grant_type": _GRANT_TYPE, "apikey": self.api_key}
+            r = httpx.post(self.iam_url, data=data, headers=_HEADERS, timeout=timeout_for("iam"))
+            metrics.upstream("iam", r.status_code)
+            if r.status_code >= 400:
+                raise UpstreamError.from_response("IAM", r)
+            return self._accept(r.json(), t0)
+        except Exception as e:
+            self._failed(e, t0)
+            raise
+
+    def _record_latency(self, t0: float) -> None:
+        ms = (time.perf_counter() - t0) * 1000
+        self.last_latency_ms = round(ms, 1)
+        self.max_latency_ms = max(self.max_latency_ms, ms)
+        self._latency_total += ms
+
+    def _accept(self, payload: Dict, t0: float) -> str:
+        self._record_latency(t0)
+        now = time.time()
+        self._token = payload["access_token"]
+        self._issued = now
+        self._exp = now + int(payload.get("expires_in", 3600))
+        self.refreshes += 1
+        self.last_refresh_at = now
+        self.last_error = None
+        return self._token
+
+    def _failed(self, e: Exception, t0: float) -> None:
+        if not isinstance(e, UpstreamError):
+            metrics.upstream("iam", "error")
+        self._record_latency(t0)
+        self.failures += 1
+        self.last_error = str(e)[:200]
+
+    def get_token_blocking(self) -> str:
+        """Für synchronen Code in Worker-Threads (Watson-SDKs)."""
+        if self.valid():
             return self._token
+        loop = self.broker.loop
+        if loop is not None and loop.is_running() and not _on_loop(loop):
+            # über den Event-Loop, damit auch die SDK-Threads am Single-Flight hängen
+            fut = asyncio.run_coroutine_threadsafe(self.get_token(), loop)
+            return fut.result(timeout=settings.iam_timeout + settings.http_connect_timeout)
+        self.request_path_waits += 1
+        return self._fetch_blocking()
+
+    async def run_refresher(self) -> None:
+        """Hintergrund-Task: erneuert vor Ablauf, bei Fehlern mit Backoff."""
+        backoff = min(1.0, settings.iam_retry_max_backoff)
+        while True:
+            await asyncio.sleep(max(0.0, self.refresh_due() - time.time()))
+            try:
+                await self.refresh()
+                backoff = min(1.0, settings.iam_retry_max_backoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # das alte Token gilt ggf. noch – weiter versuchen, bis es abläuft und danach
+                print(f"Warnung: IAM-Refresh für {'/'.join(self.names)} fehlgeschlagen: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, settings.iam_retry_max_backoff)
+
+    def stats(self) -> Dict:
+        calls = self.refreshes + self.failures
+        return {
+            "services": list(self.names),
+            "token_valid": self.valid(),
+            "expires_in_s": round(self._exp - time.time(), 1) if self._token else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "request_path_waits": self.request_path_waits,
+            "coalesced": self._flight.coalesced,
+            "last_latency_ms": self.last_latency_ms,
+            "avg_latency_ms": round(self._latency_total / calls, 1) if calls else None,
+            "max_latency_ms": round(self.max_latency_ms, 1),
+            "last_error": self.last_error,
+            "last_refresh_at": self.last_refresh_at,
+        }
+
+def _on_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+class BrokerAuthenticator(BearerTokenAuthenticator):
+    """Watson-SDK-Authenticator, der bei jedem Request das aktuelle Broker-Token einsetzt."""
+
+    def __init__(self, source: TokenSource):
+        self.source = source
+        super().__init__("")
+
+    def authenticate(self, req) -> None:
+        self.bearer_token = self.source.get_token_blocking()
+        super().authenticate(req)
+
+class CredentialBroker:
+    def __init__(self, iam_url: Optional[str] = None):
+        self.iam_url = iam_url or settings.ibm_iam_url
+        self._sources: Dict[str, TokenSource] = {}   # API-Key -> Quelle
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def source(self, api_key: str, name: str) -> TokenSource:
+        src = self._sources.get(api_key)
+        if src is None:
+            src = TokenSource(name, api_key, self.iam_url, self)
+            self._sources[api_key] = src
+            if self.loop is not None:
+                # kann aus einem Threadpool-Dependency kommen
+                self.loop.call_soon_threadsafe(self._spawn, src)
+        elif name not in src.names:
+            src.names.append(name)
+        return src
+
+    def authenticator(self, api_key: str, name: str) -> BrokerAuthenticator:
+        return BrokerAuthenticator(self.source(api_key, name))
+
+    def _spawn(self, src: TokenSource) -> None:
+        if src.api_key not in self._tasks:
+            self._tasks[src.api_key] = asyncio.create_task(src.run_refresher())
+
+    async def start(self) -> None:
+        """Registriert alle konfigurierten Keys und startet die Hintergrund-Refresher."""
+        self.loop = asyncio.get_running_loop()
+        for name, key in _configured_keys():
+            self.source(key, name)
+        for src in self._sources.values():
+            self._spawn(src)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        self.loop = None
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "iam_url": self.iam_url,
+            "background_refresh": bool(self._tasks),
+            "sources": [s.stats() for s in self._sources.values()],
+        }
+
+def _configured_keys():
+    yield "watsonx", settings.watsonx_api_key
+    for name, key in (
+        ("speech_to_text", settings.speech_to_text_api_key),
+        ("text_to_speech", settings.text_to_speech_api_key),
+    ):
+        # Platzhalter-Werte wie "your_speech_to_text_api_key_here" überspringen
+        if key and not key.startswith("your_"):
+            yield name, key
+
+_broker: Optional[CredentialBroker] = None
+
+def get_credential_broker() -> CredentialBroker:
+    global _broker
+    if _broker is None:
+        _broker = CredentialBroker()
+    return _broker
 
-iam_token_manager = IAMTokenManager()
+async def watsonx_token() -> str:
+    """Bearer-Token für watsonx.ai (LLM, Embeddings)."""
+    return await get_credential_broker().source(settings.watsonx_api_key, "watsonx").get_token()
@@ -1,7 +1,11 @@
 
 # app/llm.py
-import os, httpx
-from .ibm_auth import iam_token_manager
+import os, json, time
+import httpx
+from typing import AsyncIterator, Dict, Tuple
+from .ibm_auth import watsonx_token
+from .http_client import get_client, timeout_for, UpstreamError
+from . import metrics
 
 
 API_VERSION = os.environ.get("WATSONX_API_VERSION", "2024-05-01")
@@ -11,17 +15,14 @@ class WatsonxAILLM:
         self.base_url = os.environ["WATSONX_BASE_URL"].rstrip("/")
         self.model_id = os.environ["LLM_MODEL_ID"]
         self.project_id = os.environ.get("WATSONX_PROJECT_ID", "")
-        self.timeout = 60
 
-    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+    async def _request(self, system_prompt: str, user_prompt: str) -> Tuple[Dict, Dict]:
         # watsonx.ai Text-API erwartet einen Prompt-String
         prompt = f"{system_prompt}\n\n{user_prompt}"
 
         token = os.environ.get("WATSONX_IAM_TOKEN")
         if not token:
-            
-            from .ibm_auth import iam_token_manager
-            token = await iam_token_manager.get_token()
+            token = await watsonx_token()
 
         headers = {
             "Authorization": f"Bearer {token}",
@@ -40,14 +41,73 @@ class WatsonxAILLM:
         }
         if self.project_id:
             payload["project_id"] = self.project_id
+        return headers, payload
 
-        
+    async def generate(self, system_prompt: str, user_prompt: str) -> str:
+        headers, payload = await self._request(system_prompt, user_prompt)
         url = f"{self.base_url}/ml/v1/text/generation?version={API_VERSION}"
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            if r.status_code >= 400:
-                raise RuntimeError(f"LLM error {r.status_code}: {r.text}")
-            data = r.json()
-            # übliches Format: {"results":[{"generated_text":"..."}]}
-            return data["results"][0]["generated_text"]
\ No newline at end of file
+        with metrics.span("llm.generate"):
+            try:
+                r = await get_client().post(url, headers=headers, json=payload, timeout=timeout_for("llm"))
+            except Exception:
+                metrics.upstream("llm", "error")
+                raise
+        metrics.upstream("llm", r.status_code)
+        if r.status_code >= 400:
+            raise UpstreamError.from_response("LLM", r)
+        data = r.json()
+        # übliches Format: {"results":[{"generated_text":"...", "generated_token_count": n, "input_token_count": m}]}
+        result = data["results"][0]
+        metrics.llm_tokens(result.get("generated_token_count") or 0, result.get("input_token_count") or 0)
+        return result["generated_text"]
+
+    async def generate_stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """
+        Streamt generierte Text-Stücke über die watsonx Streaming-API (SSE).
+
+        Wird der Generator vorzeitig geschlossen (z.B. Client-Disconnect), wird
+        die Upstream-Verbindung sofort geschlossen und die Generierung abgebrochen.
+        """
+        headers, payload = await self._request(system_prompt, user_prompt)
+        headers["Accept"] = "text/event-stream"
+        url = f"{self.base_url}/ml/v1/text/generation_stream?version={API_VERSION}"
+
+        t0 = time.perf_counter()
+        first, responded = True, False
+        generated = input_tokens = 0
+        try:
+            async with get_client().stream(
+                "POST", url, headers=headers, json=payload, timeout=timeout_for("llm")
+            ) as r:
+                metrics.upstream("llm_stream", r.status_code)
+                responded = True
+                if r.status_code >= 400:
+                    await r.aread()
+                    raise UpstreamError.from_response("LLM", r)
+                async for line in r.aiter_lines():
+                    # SSE-Format: "id: 1", "event: message", "data: {...}", Leerzeile
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if not data or data == "[DONE]":
+                        continue
+                    event = json.loads(data)
+                    for res in event.get("results", []):
+                        # Token-Zähler sind kumulativ über den Stream
+                        generated = res.get("generated_token_count") or generated
+                        input_tokens = res.get("input_token_count") or input_tokens
+                        text = res.get("generated_text")
+                        if text:
+                            if first:
+                                metrics.record("llm.ttft", time.perf_counter() - t0)
+                                first = False
+                            yield text
+        except httpx.TransportError:
+            if not responded:
+                metrics.upstream("llm_stream", "error")
+            raise
+        finally:
+            # auch bei Abbruch: bis dahin erzeugte Tokens zählen
+            metrics.record("llm.stream", time.perf_counter() - t0)
+            metrics.llm_tokens(generated, input_tokens)
@@ -0,0 +1,22 @@
+# app/locations.py
+"""
+Standort-/Zielgruppen-Kennungen für gefiltertes Retrieval.
+
+Ingest schreibt metadata.audience aus dem Ordnernamen; /api/locations liefert
+IDs wie "boeblingen". Beide Seiten werden hier auf dieselbe Form gebracht.
+"""
+from typing import List, Optional
+from .config import settings
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+def normalize_location(value: Optional[str]) -> Optional[str]:
+    """'IBM Böblingen ' -> 'boeblingen'-artige Kennung; leere Werte -> None."""
+    if not value or not value.strip():
+        return None
+    v = value.strip().lower().translate(_UMLAUTS)
+    return v.replace(" ", "-")
+
+def indexed_locations() -> List[str]:
+    """Standorte, für die ein eigener (partieller) ANN-Index angelegt wird."""
+    return [l for l in (normalize_location(x) for x in settings.locations.split(",")) if l]
@@ -0,0 +1,222 @@
+# app/metrics.py
+"""
+Schlanke Instrumentierung ohne Zusatzpaket.
+
+- span("stage"): misst einen Abschnitt (with-Block, auch in async-Code) und
+  schreibt ihn in das Histogramm boardy_stage_duration_seconds sowie in die
+  Server-Timing-Liste des laufenden Requests.
+- Zähler für Upstream-Statuscodes und generierte Tokens.
+- render(): Prometheus-Textformat (0.0.4) für GET /metrics.
+- ServerTimingMiddleware: setzt Server-Timing und misst die Request-Dauer pro Route.
+
+Mit METRICS_ENABLED=false liefert span() einen geteilten No-op und die Zähler
+kehren sofort zurück; die Middleware wird dann gar nicht erst eingehängt.
+
+Hinweis: bei gestreamten Antworten enthält Server-Timing nur die Abschnitte
+bis zum Senden der Header (Retrieval etc.), nicht die Generierung.
+"""
+import threading, time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .config import settings
+
+ENABLED = settings.metrics_enabled
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        if not ENABLED:
+            return
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_value(v)}")
+        return lines
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # Labels -> [Zähler pro Bucket (nicht kumuliert) + Überlauf, Summe, Anzahl]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, seconds: float, *labels) -> None:
+        if not ENABLED:
+            return
+        i = bisect_left(self.buckets, seconds)
+        with _lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += seconds
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, (counts, total, n) in sorted(self._series.items()):
+            cum = 0
+            for le, c in zip((*self.buckets, "+Inf"), counts):
+                cum += c
+                lab = _fmt_labels((*self.labelnames, "le"), (*labels, le))
+                lines.append(f"{self.name}_bucket{lab} {cum}")
+            lab = _fmt_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{lab} {total!r}")
+            lines.append(f"{self.name}_count{lab} {n}")
+        return lines
+
+def register_collector(fn: Callable[[], List[str]]) -> None:
+    """Zusätzliche Zeilen zur Abfragezeit (z.B. Gauges aus vorhandenen stats())."""
+    _collectors.append(fn)
+
+def gauge_lines(name: str, help: str, samples: Sequence[Tuple[Dict[str, str], float]]) -> List[str]:
+    """samples: [(Labels, Wert), ...] – für Gauges, die erst beim Abruf berechnet werden."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        lines.append(f"{name}{_fmt_labels(tuple(labels), tuple(labels.values()))} {_fmt_value(value)}")
+    return lines
+
+def render() -> str:
+    with _lock:
+        lines = [line for m in _registry for line in m.render()]
+    for fn in _collectors:
+        try:
+            lines.extend(fn())
+        except Exception as e:
+            print(f"Warnung: Metrik-Collector fehlgeschlagen: {e}")
+    return "\n".join(lines) + "\n"
+
+# ---- Metriken der App ----
+STAGE_SECONDS = Histogram("boardy_stage_duration_seconds", "Dauer einzelner Verarbeitungsschritte", ("stage",))
+HTTP_SECONDS = Histogram("boardy_http_request_duration_seconds", "Dauer der HTTP-Requests", ("method", "route", "status"))
+UPSTREAM_REQUESTS = Counter("boardy_upstream_requests_total", "Upstream-Aufrufe nach Statuscode", ("upstream", "status"))
+LLM_TOKENS = Counter("boardy_llm_tokens_total", "Vom LLM verarbeitete Tokens", ("kind",))
+
+def upstream(name: str, status) -> None:
+    """status: HTTP-Code oder 'error' (Verbindungsfehler, Timeout)."""
+    UPSTREAM_REQUESTS.inc(name, str(status))
+
+def status_of(e: BaseException) -> str:
+    # UpstreamError/HTTPException: status_code, Watson-SDK (ApiException): code
+    return str(getattr(e, "status_code", None) or getattr(e, "code", None) or "error")
+
+def llm_tokens(generated: int, input_tokens: int = 0) -> None:
+    LLM_TOKENS.inc("generated", amount=generated)
+    if input_tokens:
+        LLM_TOKENS.inc("input", amount=input_tokens)
+
+# ---- Spans & Server-Timing ----
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timings", default=None)
+
+class _Span:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        record(self.stage, time.perf_counter() - self.t0)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+_NOOP = _NoopSpan()
+
+def span(stage: str):
+    return _Span(stage) if ENABLED else _NOOP
+
+def record(stage: str, seconds: float) -> None:
+    if not ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    # gleiche Abschnitte (z.B. mehrere DB-Verbindungen) aufsummieren, Reihenfolge behalten
+    total: Dict[str, float] = {}
+    for stage, seconds in timings:
+        total[stage] = total.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in total.items())
+
+class ServerTimingMiddleware:
+    """Reine ASGI-Middleware (kein BaseHTTPMiddleware, damit Streaming unverändert bleibt)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing_header([*timings, ("total", time.perf_counter() - t0)])
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            # nur Routen-Templates als Label, sonst explodiert die Kardinalität
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe(time.perf_counter() - t0, scope["method"], path, str(status))
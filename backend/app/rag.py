@@ -1,7 +1,18 @@
-from typing import List, Dict
-from .embeddings import WatsonxAIEmbeddings
+import asyncio
+from contextlib import aclosing
+from psycopg import sql as pgsql
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from .embedding_cache import get_query_embedder, normalize_query
+from .answer_cache import get_answer_cache
 from .llm import WatsonxAILLM
-from .db import get_conn
+from .db import connection
+from .vector_index import apply_search_settings, location_predicate
+from .locations import normalize_location
+from .config import settings
+from .vector_store import get_vector_store
+from .context import context_line, pack_context
+from .singleflight import SingleFlight
+from . import metrics
 
 SYSTEM_PROMPT = (
     "Du bist ein Onboarding-Assistent der Firma. Antworte kurz, korrekt, auf Deutsch. "
@@ -11,13 +22,9 @@ SYSTEM_PROMPT = (
 
 def format_prompt(question: str, contexts: List[Dict]) -> str:
     """
-    Baut einen klaren Prompt mit den Top-K Kontext-Chunks.
+    Baut einen klaren Prompt mit den (per pack_context ausgewählten) Kontext-Chunks.
     """
-    lines = []
-    for c in contexts:
-        title = c["metadata"].get("filename") or c["doc_id"]
-        lines.append(f"[{title}#{c['chunk_id']}] {c['content']}")
-    ctx = "\n\n".join(lines[:8])  # maximal 8 Chunks
+    ctx = "\n\n".join(context_line(c) for c in contexts)
 
     return (
         f"FRAGE:\n{question}\n\n"
@@ -28,49 +35,344 @@ def format_prompt(question: str, contexts: List[Dict]) -> str:
         "- Abschlusszeile: 'Quellen: <Titel#Chunk, ...>'\n"
     )
 
-async def retrieve(query: str, k: int = 6) -> List[Dict]:
-    embedder = WatsonxAIEmbeddings()
-    q_vec = (await embedder.embed([query]))[0]
+async def retrieve(query: str, k: int = 6, location: Optional[str] = None) -> List[Dict]:
+    q_vec = (await get_query_embedder().embed([query]))[0]
+    return await retrieve_by_vector(q_vec, k, location=location, query=query)
 
+def _location_filter(location: Optional[str], prefix: str = "WHERE") -> pgsql.Composable:
+    # Standort als Literal (nicht als Parameter), damit der Planner den
+    # passenden partiellen ANN-Index (gleiches Prädikat, app/vector_index.py) wählen kann.
+    # audience IS NULL: Uploads ohne Standort-Ordner, für alle Standorte sichtbar
+    location = normalize_location(location)
+    if not location:
+        return pgsql.SQL("")
+    return pgsql.SQL(prefix + " {}").format(location_predicate(location))
+
+VECTOR_SQL = """
+SELECT id, doc_id, chunk_id, content, metadata{embedding}
+FROM documents
+{where}
+ORDER BY embedding <=> %(q)s::vector
+LIMIT %(k)s
+"""
+
+# Volltext- und Vektor-Kandidaten in einem Statement, fusioniert per Reciprocal Rank Fusion.
+# plainto_tsquery verknüpft mit AND; für Fragen in natürlicher Sprache ist OR sinnvoller.
+# Dazu die Lexeme aus to_tsvector('german') (wie die tsv-Spalte) per Cast zur OR-Query
+# verbinden – ohne zweiten Durchlauf durch den Stemmer, der sie verändern könnte.
+HYBRID_SQL = """
+WITH vec AS (
+    SELECT id, row_number() OVER (ORDER BY dist) AS rank
+    FROM (
+        SELECT id, embedding <=> %(q)s::vector AS dist
+        FROM documents
+        {where}
+        ORDER BY dist
+        LIMIT %(n)s
+    ) v
+),
+lex AS (
+    SELECT id, row_number() OVER (ORDER BY score DESC) AS rank
+    FROM (
+        SELECT d.id, ts_rank_cd(d.tsv, tq.query) AS score
+        FROM documents d,
+             (SELECT string_agg(quote_literal(l), ' | ')::tsquery
+              FROM unnest(tsvector_to_array(to_tsvector('german', %(text)s))) AS l) AS tq(query)
+        WHERE d.tsv @@ tq.query {and_location}
+        ORDER BY score DESC
+        LIMIT %(n)s
+    ) l
+),
+fused AS (
+    SELECT id, sum(score) AS score
+    FROM (
+        SELECT id, %(w_vec)s / (%(rrf_k)s + rank) AS score FROM vec
+        UNION ALL
+        SELECT id, %(w_text)s / (%(rrf_k)s + rank) AS score FROM lex
+    ) s
+    GROUP BY id
+)
+SELECT d.id, d.doc_id, d.chunk_id, d.content, d.metadata, f.score{embedding}
+FROM fused f JOIN documents d ON d.id = f.id
+ORDER BY f.score DESC
+LIMIT %(k)s
+"""
+
+def _vector_literal(q_vec: List[float]) -> str:
     # als pgvector-kompatiblen String formatieren
-    q_vec_str = "[" + ",".join(str(x) for x in q_vec) + "]"
+    return "[" + ",".join(str(x) for x in q_vec) + "]"
 
-    sql = """
-    SELECT id, doc_id, chunk_id, content, metadata
+# Top-k für viele Fragen in einem Statement: pro Standort ein LATERAL-Block
+# (Standort als Literal → partieller ANN-Index wie bei VECTOR_SQL), per UNION ALL verbunden
+BATCH_VECTOR_SQL = """
+SELECT q.ord, d.*
+FROM (
+    SELECT u.vec::vector AS vec, u.ord
+    FROM unnest({vecs}::text[], {ords}::int[]) AS u(vec, ord)
+) q
+CROSS JOIN LATERAL (
+    SELECT id, doc_id, chunk_id, content, metadata{embedding}, embedding <=> q.vec AS dist
     FROM documents
-    ORDER BY embedding <=> %s::vector
-    LIMIT %s
+    {where}
+    ORDER BY dist
+    LIMIT %(k)s
+) d
+"""
+
+async def retrieve_by_vector(
+    q_vec: List[float],
+    k: int = 6,
+    location: Optional[str] = None,
+    query: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    with_embeddings: bool = False,
+) -> List[Dict]:
+    """
+    Top-k Chunks zum Query-Vektor. Mit `query` und RETRIEVAL_MODE=hybrid werden
+    zusätzlich Volltext-Treffer (German tsvector) per RRF eingemischt.
+    with_embeddings: Chunk-Embeddings mitliefern (für die MMR-Auswahl beim Packen).
     """
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(sql, (q_vec_str, k))
-            rows = cur.fetchall()
-            return rows
+    if settings.retrieval_backend == "mmap":
+        with metrics.span("retrieve.mmap"):
+            return await get_vector_store().search(
+                q_vec, k, location=normalize_location(location), with_embeddings=with_embeddings
+            )
 
-async def answer(question: str) -> Dict:
-    contexts = await retrieve(question, k=6)
+    params = {"q": _vector_literal(q_vec), "k": k}
+    hybrid = bool(query) and settings.retrieval_mode == "hybrid"
 
-    if contexts:  # normaler RAG-Flow
-        prompt = format_prompt(question, contexts)
-    else:  # kein Kontext gefunden → fallback
-        prompt = (
-            f"FRAGE:\n{question}\n\n"
-            "Es konnte kein relevanter Kontext gefunden werden. "
-            "Antworte bitte trotzdem kurz, korrekt, auf Deutsch, "
-            "auf Basis deines eigenen Wissens. "
-            "Wenn du unsicher bist, sage dies klar und schlage einen Eskalationsweg vor.\n\n"
-            "ANTWORT:\n"
+    if hybrid:
+        n = max(k, settings.hybrid_candidates)
+        params.update(
+            text=query,
+            n=n,
+            w_vec=settings.hybrid_vector_weight,
+            w_text=settings.hybrid_text_weight,
+            rrf_k=settings.hybrid_rrf_k,
+        )
+        sql = pgsql.SQL(HYBRID_SQL).format(
+            where=_location_filter(location),
+            and_location=_location_filter(location, "AND"),
+            embedding=pgsql.SQL(", d.embedding" if with_embeddings else ""),
+        )
+    else:
+        n = k
+        sql = pgsql.SQL(VECTOR_SQL).format(
+            where=_location_filter(location),
+            embedding=pgsql.SQL(", embedding" if with_embeddings else ""),
         )
 
-    llm = WatsonxAILLM()
-    output = await llm.generate(SYSTEM_PROMPT, prompt)
+    async with connection() as conn:
+        await apply_search_settings(conn, n, ef_search=ef_search, probes=probes)
+        with metrics.span("retrieve.pgvector"):
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
+                return rows
+
+async def retrieve_batch(
+    q_vecs: List[List[float]],
+    locations: List[Optional[str]],
+    k: int,
+    with_embeddings: bool = False,
+) -> List[List[Dict]]:
+    """
+    Wie retrieve_by_vector für mehrere Query-Vektoren, aber mit einem einzigen
+    DB-Roundtrip (unnest + LATERAL). Nur Vektor-Suche, auch bei
+    RETRIEVAL_MODE=hybrid. Liefert die Treffer in Eingabereihenfolge.
+    """
+    if settings.retrieval_backend == "mmap":
+        store = get_vector_store()
+        with metrics.span("retrieve.mmap"):
+            return [
+                await store.search(v, k, location=normalize_location(l), with_embeddings=with_embeddings)
+                for v, l in zip(q_vecs, locations)
+            ]
+
+    groups: Dict[Optional[str], List[int]] = {}
+    for i, location in enumerate(locations):
+        groups.setdefault(normalize_location(location), []).append(i)
+    parts, params = [], {"k": k}
+    for g, (location, idx) in enumerate(groups.items()):
+        parts.append(pgsql.SQL("({})").format(pgsql.SQL(BATCH_VECTOR_SQL).format(
+            vecs=pgsql.Placeholder(f"vecs_{g}"),
+            ords=pgsql.Placeholder(f"ords_{g}"),
+            embedding=pgsql.SQL(", embedding" if with_embeddings else ""),
+            where=_location_filter(location),
+        )))
+        params[f"vecs_{g}"] = [_vector_literal(q_vecs[i]) for i in idx]
+        params[f"ords_{g}"] = idx
+    sql = pgsql.SQL(" UNION ALL ").join(parts) + pgsql.SQL(" ORDER BY ord, dist")
+
+    async with connection() as conn:
+        await apply_search_settings(conn, k)
+        with metrics.span("retrieve.pgvector_batch"):
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                rows = await cur.fetchall()
+
+    out: List[List[Dict]] = [[] for _ in q_vecs]
+    for row in rows:
+        i = row.pop("ord")
+        row.pop("dist")
+        out[i].append(row)
+    return out
 
-    sources = [
+def build_prompt(question: str, contexts: List[Dict]) -> str:
+    if contexts:  # normaler RAG-Flow
+        return format_prompt(question, contexts)
+    # kein Kontext gefunden → fallback
+    return (
+        f"FRAGE:\n{question}\n\n"
+        "Es konnte kein relevanter Kontext gefunden werden. "
+        "Antworte bitte trotzdem kurz, korrekt, auf Deutsch, "
+        "auf Basis deines eigenen Wissens. "
+        "Wenn du unsicher bist, sage dies klar und schlage einen Eskalationsweg vor.\n\n"
+        "ANTWORT:\n"
+    )
+
+def to_sources(contexts: List[Dict]) -> List[Dict]:
+    # zusammengeführte Kontexte liefern eine Quelle pro ursprünglichem Chunk
+    return [
         {
             "title": c["metadata"].get("filename") or c["doc_id"],
             "doc_id": c["doc_id"],
-            "chunk_id": c["chunk_id"],
+            "chunk_id": chunk_id,
         }
         for c in contexts
+        for chunk_id in (c.get("chunk_ids") or [c["chunk_id"]])
     ]
-    return {"answer": output, "sources": sources}
+
+async def retrieve_context(question: str, q_vec: List[float], location: Optional[str]) -> List[Dict]:
+    """Kandidaten abrufen und auf das Token-Budget packen (Dedupe, MMR)."""
+    candidates = await retrieve_by_vector(
+        q_vec,
+        k=max(settings.retrieval_k, settings.context_candidates),
+        location=location,
+        query=question,
+        with_embeddings=True,
+    )
+    with metrics.span("context.pack"):
+        return pack_context(question, candidates, q_vec, max_chunks=settings.retrieval_k)
+
+async def answer(question: str, location: Optional[str] = None) -> Dict:
+    with metrics.span("embed.query"):
+        q_vec = (await get_query_embedder().embed([question]))[0]
+    scope = normalize_location(location)  # Cache-Scope = Standort
+
+    cache = get_answer_cache()
+    with metrics.span("answer_cache.lookup"):
+        hit = await cache.lookup(q_vec, scope)
+    if hit is not None:
+        return {**hit, "cached": True}
+
+    contexts = await retrieve_context(question, q_vec, scope)
+    with metrics.span("prompt.build"):
+        prompt = build_prompt(question, contexts)
+
+    llm = WatsonxAILLM()
+    output = await llm.generate(SYSTEM_PROMPT, prompt)
+
+    sources = to_sources(contexts)
+    with metrics.span("answer_cache.store"):
+        await cache.store(question, q_vec, scope, output, sources)
+    return {"answer": output, "sources": sources, "cached": False}
+
+_ask_flight: SingleFlight[Dict] = SingleFlight()
+
+def ask_singleflight() -> SingleFlight[Dict]:
+    return _ask_flight
+
+async def answer_shared(question: str, location: Optional[str] = None) -> Dict:
+    """
+    answer() mit Single-Flight: gleichzeitige identische Fragen (normalisierter
+    Text + Standort) teilen sich eine Pipeline-Ausführung.
+    """
+    if not settings.ask_singleflight_enabled:
+        return await answer(question, location)
+    key = (normalize_query(question).casefold(), normalize_location(location))
+    return await _ask_flight.do(key, lambda: answer(question, location))
+
+async def answer_batch(
+    questions: List[str],
+    locations: List[Optional[str]],
+    concurrency: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Mehrere Fragen auf einmal (FAQ-Vorgenerierung, Evaluation):
+    ein Embedding-Call für alle (über den Query-Cache), ein Retrieval-Statement,
+    danach Generierung mit höchstens ASK_BATCH_CONCURRENCY gleichzeitigen
+    LLM-Calls. Ergebnisse in Eingabereihenfolge; Fehler einzelner Fragen
+    stehen im jeweiligen Eintrag (ok=False, error), der Rest läuft weiter.
+
+    Der semantische Antwort-Cache wird bewusst umgangen – Evaluation soll
+    frische Antworten sehen.
+    """
+    results: List[Optional[Dict]] = [None] * len(questions)
+    valid = []
+    for i, q in enumerate(questions):
+        if q and q.strip():
+            valid.append(i)
+        else:
+            results[i] = {"index": i, "ok": False, "error": "Leere Frage"}
+    if valid:
+        with metrics.span("embed.query"):
+            q_vecs = await get_query_embedder().embed([questions[i] for i in valid])
+        candidates = await retrieve_batch(
+            q_vecs,
+            [locations[i] for i in valid],
+            k=max(settings.retrieval_k, settings.context_candidates),
+            with_embeddings=True,
+        )
+
+        llm = WatsonxAILLM()
+        sem = asyncio.Semaphore(concurrency or settings.ask_batch_concurrency)
+
+        async def one(i: int, q_vec: List[float], rows: List[Dict]) -> Dict:
+            try:
+                with metrics.span("context.pack"):
+                    contexts = pack_context(questions[i], rows, q_vec, max_chunks=settings.retrieval_k)
+                async with sem:
+                    output = await llm.generate(SYSTEM_PROMPT, build_prompt(questions[i], contexts))
+                return {"index": i, "ok": True, "answer": output, "sources": to_sources(contexts)}
+            except Exception as e:
+                return {"index": i, "ok": False, "error": str(e), "status_code": getattr(e, "status_code", None)}
+
+        done = await asyncio.gather(*(one(i, v, c) for i, v, c in zip(valid, q_vecs, candidates)))
+        for r in done:
+            results[r["index"]] = r
+    return results
+
+async def answer_stream(question: str, location: Optional[str] = None) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Wie answer(), liefert aber Events: ("sources", [...]), dann ("token", "...")
+    pro Text-Stück und zum Schluss ("done", {"cached": bool}).
+    """
+    with metrics.span("embed.query"):
+        q_vec = (await get_query_embedder().embed([question]))[0]
+    scope = normalize_location(location)  # Cache-Scope = Standort
+
+    cache = get_answer_cache()
+    with metrics.span("answer_cache.lookup"):
+        hit = await cache.lookup(q_vec, scope)
+    if hit is not None:
+        yield "sources", hit["sources"]
+        yield "token", hit["answer"]
+        yield "done", {"cached": True}
+        return
+
+    contexts = await retrieve_context(question, q_vec, scope)
+    sources = to_sources(contexts)
+    yield "sources", sources
+
+    llm = WatsonxAILLM()
+    parts: List[str] = []
+    async with aclosing(llm.generate_stream(SYSTEM_PROMPT, build_prompt(question, contexts))) as stream:
+        async for text in stream:
+            parts.append(text)
+            yield "token", text
+
+    # nur vollständige Antworten cachen (bei Abbruch kommen wir hier nicht an)
+    await cache.store(question, q_vec, scope, "".join(parts), sources)
+    yield "done", {"cached": False}
@@ -1,8 +1,10 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from .tts_cache import AudioFormat
 
 class AskRequest(BaseModel):
     query: str
+    location: Optional[str] = None  # Standort-Filter, z.B. "boeblingen" (siehe /api/locations)
     user: Optional[dict] = None  # für spätere Personalisierung
 
 class Source(BaseModel):
@@ -13,6 +15,22 @@ class Source(BaseModel):
 class AskResponse(BaseModel):
     answer: str
     sources: List[Source]
+    cached: bool = False  # True, wenn die Antwort aus dem semantischen Cache stammt
+
+class AskBatchRequest(BaseModel):
+    questions: List[AskRequest]
+    location: Optional[str] = None  # Standard-Standort für Fragen ohne eigenen
+
+class AskBatchItem(BaseModel):
+    index: int  # Position in AskBatchRequest.questions
+    ok: bool
+    answer: Optional[str] = None
+    sources: List[Source] = []
+    error: Optional[str] = None  # nur bei ok=False
+    status_code: Optional[int] = None  # Upstream-Status, falls der Fehler von watsonx kam
+
+class AskBatchResponse(BaseModel):
+    results: List[AskBatchItem]
 
 class SpeechToTextRequest(BaseModel):
     audio_data: str  # Base64-encoded audio data
@@ -21,3 +39,4 @@ class SpeechToTextRequest(BaseModel):
 class TextToSpeechRequest(BaseModel):
     text: str
     voice: Optional[str] = "en-US_AllisonV3Voice"  # Default voice
+    accept: AudioFormat = "audio/wav"
@@ -0,0 +1,70 @@
+# app/singleflight.py
+"""
+Single-Flight: gleichzeitige Aufrufe mit demselben Schlüssel teilen sich eine
+laufende Ausführung und bekommen alle deren Ergebnis (bzw. Fehler).
+
+- Die Ausführung läuft als eigener Task, unabhängig vom Request, der sie
+  gestartet hat: bricht der erste Client ab, warten die übrigen weiter.
+- Erst wenn kein Wartender mehr übrig ist, wird die Ausführung abgebrochen.
+- Nach dem Ende wird der Schlüssel sofort freigegeben – nichts wird über die
+  Laufzeit hinaus wiederverwendet, es gibt also keine veralteten Ergebnisse.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight(Generic[T]):
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0    # tatsächlich gestartete Ausführungen
+        self.coalesced = 0   # Aufrufe, die sich an eine laufende Ausführung gehängt haben
+        self.abandoned = 0   # Ausführungen, die abgebrochen wurden, weil niemand mehr wartet
+        self.failed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            self.executed += 1
+            call.task.add_done_callback(lambda t, key=key, call=call: self._done(key, call, t))
+        else:
+            self.coalesced += 1
+        call.waiters += 1
+        try:
+            # shield: der Abbruch eines Wartenden bricht nicht die gemeinsame Ausführung ab
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Schlüssel sofort freigeben: ein neuer Aufruf darf sich nicht an die
+                # sterbende Ausführung hängen (_done läuft erst nach dem Abbruch)
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+                self.abandoned += 1
+
+    def _done(self, key: Hashable, call: _Call, task: asyncio.Task) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.executed + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "abandoned": self.abandoned,
+            "failed": self.failed,
+        }
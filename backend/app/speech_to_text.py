@@ -1,12 +1,71 @@
 import os
 import io
-from typing import Optional
+import queue
+import asyncio
+import time
+from contextlib import aclosing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
 from fastapi import HTTPException
 from ibm_watson import SpeechToTextV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-from ibm_watson.websocket import RecognizeCallback
+from ibm_watson.websocket import RecognizeCallback, AudioSource
 import json
 from .config import settings
+from .ibm_auth import get_credential_broker
+from . import metrics
+
+# eigener Pool: recognize ist synchron und darf den Event-Loop nicht blockieren
+_executor: Optional[ThreadPoolExecutor] = None
+# recognize_using_websocket blockiert einen Thread für die ganze Sitzung – getrennter
+# Pool, damit offene Mikrofone die übrigen STT-Requests nicht aushungern
+_stream_executor: Optional[ThreadPoolExecutor] = None
+_stream_sessions = 0
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.stt_max_workers, thread_name_prefix="stt")
+    return _executor
+
+def _get_stream_executor() -> ThreadPoolExecutor:
+    global _stream_executor
+    if _stream_executor is None:
+        _stream_executor = ThreadPoolExecutor(max_workers=settings.stt_stream_max_sessions, thread_name_prefix="stt-stream")
+    return _stream_executor
+
+def stream_sessions() -> int:
+    return _stream_sessions
+
+def watson_content_type(content_type: str) -> str:
+    """Browser-Content-Type → von Watson Speech to Text erwarteter Typ."""
+    # Parameter wie ';codecs=opus' für den Vergleich ignorieren
+    base = content_type.split(";")[0].strip().lower()
+    if base == 'audio/webm':
+        return 'audio/webm'
+    elif base == 'audio/wav':
+        # Für WAV verwende audio/l16 mit 16kHz Sample Rate
+        return 'audio/l16;rate=16000;channels=1'
+    elif base == 'audio/mp4':
+        return 'audio/mp4'
+    elif base == 'audio/ogg':
+        return 'audio/ogg;codecs=opus'
+    # Fallback: Versuche es mit dem ursprünglichen Format
+    return content_type
+
+@dataclass
+class Transcript:
+    transcript: str
+    confidence: float
+
+def _event(result: Dict) -> Dict:
+    alt = result["alternatives"][0]
+    return {
+        "type": "final" if result.get("final") else "interim",
+        "transcript": alt.get("transcript", "").strip(),
+        # Watson liefert eine Konfidenz nur für finale Ergebnisse
+        "confidence": alt.get("confidence"),
+    }
 
 class SpeechToTextService:
     def __init__(self):
@@ -19,8 +78,8 @@ class SpeechToTextService:
         if not self.api_key or self.api_key == "your_speech_to_text_api_key_here":
             raise ValueError("SPEECH_TO_TEXT_API_KEY environment variable is required for IBM Cloud deployment")
         
-        # Authenticator und Service initialisieren
-        authenticator = IAMAuthenticator(self.api_key)
+        # Token kommt vom zentralen Credential-Broker (Refresh im Hintergrund)
+        authenticator = get_credential_broker().authenticator(self.api_key, "speech_to_text")
         self.speech_to_text = SpeechToTextV1(authenticator=authenticator)
         self.speech_to_text.set_service_url(self.service_url)
     
@@ -28,43 +87,33 @@ class SpeechToTextService:
         """
         Transkribiert Audio-Daten zu Text mit Watson Speech to Text
         """
+        return (await self.transcribe(audio_data, content_type)).transcript
+
+    async def transcribe(self, audio_data: bytes, content_type: str = "audio/wav") -> Transcript:
+        """
+        Wie transcribe_audio, liefert zusätzlich die Konfidenz; der synchrone
+        SDK-Aufruf läuft im Thread-Pool.
+        """
         try:
             # Watson Speech to Text unterstützt verschiedene Formate
-            # Verwende das beste verfügbare Format basierend auf dem Input
-            
-            if content_type == 'audio/webm':
-                watson_content_type = 'audio/webm'
-            elif content_type == 'audio/wav':
-                # Für WAV verwende audio/l16 mit 16kHz Sample Rate
-                watson_content_type = 'audio/l16;rate=16000;channels=1'
-            elif content_type == 'audio/mp4':
-                watson_content_type = 'audio/mp4'
-            elif content_type == 'audio/ogg':
-                watson_content_type = 'audio/ogg;codecs=opus'
-            else:
-                # Fallback: Versuche es mit dem ursprünglichen Format
-                watson_content_type = content_type
-            
-            print(f"Verwende Watson Content-Type: {watson_content_type}")
-            
-            response = self.speech_to_text.recognize(
-                audio=audio_data,
-                content_type=watson_content_type,
-                model='de-DE_BroadbandModel'  # Deutsch-Modell
-            ).get_result()
+            watson_type = watson_content_type(content_type)
+
+            loop = asyncio.get_running_loop()
+            with metrics.span("stt.recognize"):
+                response = await loop.run_in_executor(_get_executor(), self._recognize_blocking, audio_data, watson_type)
             
-            # Text aus der Antwort extrahieren
-            if response.get('results') and len(response['results']) > 0:
-                transcript = response['results'][0]['alternatives'][0]['transcript']
-                confidence = response['results'][0]['alternatives'][0].get('confidence', 0)
+            # Text aus der Antwort extrahieren (alle finalen Ergebnisse, längere Aufnahmen haben mehrere)
+            results = [r for r in response.get('results') or [] if r.get('alternatives')]
+            if results:
+                alts = [r['alternatives'][0] for r in results]
+                transcript = " ".join(a['transcript'].strip() for a in alts).strip()
+                confidences = [a.get('confidence', 0.0) for a in alts]
+                confidence = sum(confidences) / len(confidences)
                 
                 # Akzeptiere Transkripte mit niedrigerer Konfidenz für bessere Benutzerfreundlichkeit
-                if confidence > 0.1:  # Mindest-Konfidenz von 10%
-                    return transcript.strip()
-                else:
-                    # Bei sehr niedriger Konfidenz trotzdem versuchen, aber mit Warnung
+                if confidence <= 0.1:  # Mindest-Konfidenz von 10%
                     print(f"Warnung: Sehr niedrige Konfidenz ({confidence:.2f}), aber Transkript wird trotzdem zurückgegeben")
-                    return transcript.strip()
+                return Transcript(transcript=transcript, confidence=confidence)
             else:
                 raise HTTPException(
                     status_code=400, 
@@ -93,6 +142,101 @@ class SpeechToTextService:
                     detail=f"Fehler bei der Spracherkennung: {str(e)}"
                 )
 
+    def _recognize_blocking(self, audio_data: bytes, watson_type: str) -> Dict:
+        try:
+            response = self.speech_to_text.recognize(
+                audio=audio_data,
+                content_type=watson_type,
+                model=settings.speech_to_text_model
+            )
+        except Exception as e:
+            metrics.upstream("stt", metrics.status_of(e))
+            raise
+        metrics.upstream("stt", response.get_status_code())
+        return response.get_result()
+
+    async def recognize_stream(self, frames: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Dict]:
+        """
+        Streaming-Erkennung über Watsons WebSocket-API: Audio-Frames werden
+        weitergereicht, während noch gesprochen wird; liefert Events
+        {"type": "interim"|"final"|"error", "transcript", "confidence"}.
+
+        Höchstens STT_STREAM_MAX_SESSIONS Sitzungen gleichzeitig (je ein Thread im
+        eigenen Pool); darüber hinaus HTTPException 503, bevor etwas gestartet wird.
+        """
+        global _stream_sessions
+        if _stream_sessions >= settings.stt_stream_max_sessions:
+            raise HTTPException(status_code=503, detail="Zu viele gleichzeitige Spracherkennungs-Sitzungen")
+        _stream_sessions += 1
+        try:
+            async with aclosing(self._recognize_stream(frames, content_type)) as events:
+                async for event in events:
+                    yield event
+        finally:
+            _stream_sessions -= 1
+
+    async def _recognize_stream(self, frames: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Dict]:
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        audio = AudioSource(queue.Queue(settings.stt_stream_max_buffered_frames), is_recording=True, is_buffer=True)
+
+        def emit(item) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, item)
+
+        class _Callback(RecognizeCallback):
+            def on_connected(self):
+                metrics.upstream("stt_stream", 101)
+
+            def on_data(self, data):
+                for result in data.get("results") or []:
+                    if result.get("alternatives"):
+                        emit(_event(result))
+
+            def on_error(self, error):
+                metrics.upstream("stt_stream", "error")
+                emit({"type": "error", "detail": str(error)})
+
+            def on_close(self):
+                emit(None)
+
+        def run() -> None:
+            try:
+                self.speech_to_text.recognize_using_websocket(
+                    audio=audio,
+                    content_type=watson_content_type(content_type),
+                    recognize_callback=_Callback(),
+                    model=settings.speech_to_text_model,
+                    interim_results=True,
+                    inactivity_timeout=settings.stt_inactivity_timeout,
+                )
+            finally:
+                emit(None)
+
+        async def pump() -> None:
+            try:
+                async for frame in frames:
+                    # Backpressure: nicht weiterlesen, solange Watson nicht hinterherkommt
+                    while audio.input.full():
+                        await asyncio.sleep(0.01)
+                    audio.input.put_nowait(frame)
+            finally:
+                audio.completed_recording()
+
+        t0 = time.perf_counter()
+        first = True
+        recognizer = loop.run_in_executor(_get_stream_executor(), run)
+        pump_task = asyncio.create_task(pump())
+        try:
+            while (event := await events.get()) is not None:
+                if first:
+                    metrics.record("stt.stream.first_result", time.perf_counter() - t0)
+                    first = False
+                yield event
+        finally:
+            pump_task.cancel()
+            audio.completed_recording()
+            await asyncio.gather(pump_task, recognizer, return_exceptions=True)
+
 # Globale Instanz des Services
 speech_to_text_service: Optional[SpeechToTextService] = None
 
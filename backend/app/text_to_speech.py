@@ -1,10 +1,65 @@
 import os
 import io
-from typing import Optional
+import re
+import json
+import time
+import struct
+import asyncio
+import secrets
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import HTTPException
 from ibm_watson import TextToSpeechV1
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from .config import settings
+from .ibm_auth import get_credential_broker
+from . import metrics
+
+# Rohes PCM lässt sich segmentweise aneinanderhängen (WAV-Dateien nicht)
+PCM_RATE = 22050
+PCM_ACCEPT = f"audio/l16;rate={PCM_RATE};endianness=little-endian"
+
+# eigener Pool: das ibm_watson-SDK ist synchron und darf den Event-Loop nicht blockieren
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.tts_max_workers, thread_name_prefix="tts")
+    return _executor
+
+def split_sentences(text: str, min_chars: int = 40, max_chars: int = 1000) -> List[str]:
+    """Satzweise Segmente; sehr kurze Sätze werden mit dem nächsten zusammengelegt."""
+    sentences = [s for s in re.split(r"(?<=[.!?…:;])\s+|\n+", text.strip()) if s.strip()]
+    segments: List[str] = []
+    buf = ""
+    for s in sentences:
+        # überlange Sätze an Kommas bzw. hart teilen
+        while len(s) > max_chars:
+            cut = s.rfind(", ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            segments.append((buf + " " + s[:cut]).strip())
+            buf, s = "", s[cut:].strip()
+        buf = (buf + " " + s).strip()
+        if len(buf) >= min_chars:
+            segments.append(buf)
+            buf = ""
+    if buf:
+        if segments and len(buf) < min_chars // 2:
+            segments[-1] += " " + buf
+        else:
+            segments.append(buf)
+    return segments
+
+def wav_stream_header(rate: int = PCM_RATE, channels: int = 1, bits: int = 16) -> bytes:
+    """WAV-Header mit unbekannter Länge (0xFFFFFFFF) für gestreamtes PCM."""
+    block_align = channels * bits // 8
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, rate, rate * block_align, block_align, bits)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
 
 class TextToSpeechService:
     def __init__(self):
@@ -17,12 +72,12 @@ class TextToSpeechService:
         if not self.api_key or self.api_key == "your_text_to_speech_api_key_here":
             raise ValueError("TEXT_TO_SPEECH_API_KEY environment variable is required for IBM Cloud deployment")
         
-        # Authenticator und Service initialisieren
-        authenticator = IAMAuthenticator(self.api_key)
+        # Token kommt vom zentralen Credential-Broker (Refresh im Hintergrund)
+        authenticator = get_credential_broker().authenticator(self.api_key, "text_to_speech")
         self.text_to_speech = TextToSpeechV1(authenticator=authenticator)
         self.text_to_speech.set_service_url(self.service_url)
     
-    async def synthesize_text(self, text: str, voice: str = "de-DE_BirgitVoice") -> bytes:
+    async def synthesize_text(self, text: str, voice: str = "de-DE_BirgitVoice", accept: str = "audio/wav") -> bytes:
         """
         Synthetisiert Text zu Audio mit Watson Text to Speech
         """
@@ -40,15 +95,10 @@ class TextToSpeechService:
                     detail="Text ist zu lang. Maximum 5000 Zeichen erlaubt."
                 )
             
-            # Watson Text to Speech API aufrufen
-            response = self.text_to_speech.synthesize(
-                text=text,
-                voice=voice,
-                accept='audio/wav'
-            ).get_result()
-            
-            # Audio-Daten als Bytes zurückgeben
-            return response.content
+            # Watson Text to Speech API im Thread-Pool aufrufen
+            loop = asyncio.get_running_loop()
+            with metrics.span("tts.synthesize"):
+                return await loop.run_in_executor(_get_executor(), self._synthesize_blocking, text, voice, accept)
             
         except HTTPException:
             # Re-raise HTTPExceptions unverändert
@@ -77,6 +127,48 @@ class TextToSpeechService:
                     detail=f"Fehler bei der Sprachsynthese: {str(e)}"
                 )
     
+    def _synthesize_blocking(self, text: str, voice: str, accept: str) -> bytes:
+        try:
+            response = self.text_to_speech.synthesize(
+                text=text,
+                voice=voice,
+                accept=accept
+            )
+        except Exception as e:
+            metrics.upstream("tts", metrics.status_of(e))
+            raise
+        metrics.upstream("tts", response.get_status_code())
+        # Audio-Daten als Bytes zurückgeben
+        return response.get_result().content
+
+    async def _segment_pcm(self, text: str, voice: str) -> bytes:
+        if settings.tts_cache_enabled:
+            from .tts_cache import get_tts_cache
+            _, path = await get_tts_cache().get_or_synthesize(text, voice, PCM_ACCEPT, service=self)
+            return await asyncio.to_thread(path.read_bytes)
+        return await self.synthesize_text(text, voice, accept=PCM_ACCEPT)
+
+    async def synthesize_stream(self, text: str, voice: str = "de-DE_BirgitVoice") -> AsyncIterator[bytes]:
+        """
+        Streamt WAV: Header sofort, danach PCM Satz für Satz in Reihenfolge.
+        Bis zu TTS_STREAM_LOOKAHEAD Sätze werden parallel synthetisiert, die
+        erste Audio-Ausgabe wartet also nur auf den ersten Satz.
+        """
+        if not text or not text.strip():
+            raise HTTPException(status_code=400, detail="Text darf nicht leer sein")
+        segments = split_sentences(text)
+        tasks: List[asyncio.Task] = []
+        try:
+            yield wav_stream_header()
+            for i, segment in enumerate(segments):
+                # Vorauslauf auffüllen, dann das nächste Segment in Reihenfolge ausgeben
+                while len(tasks) < min(len(segments), i + max(1, settings.tts_stream_lookahead)):
+                    tasks.append(asyncio.create_task(self._segment_pcm(segments[len(tasks)], voice)))
+                yield await tasks[i]
+        finally:
+            for t in tasks:
+                t.cancel()
+
     def get_available_voices(self) -> list:
         """
         Gibt verfügbare deutsche Stimmen zurück
@@ -100,6 +192,58 @@ class TextToSpeechService:
             print(f"Fehler beim Abrufen der Stimmen: {str(e)}")
             return []
 
+class StreamTickets:
+    """
+    Kurzlebige IDs für GET /api/text-to-speech/stream/{id}: <audio src> kann nur
+    GET, der Text gehört aber nicht in die URL (Header-Limit, Access-Logs).
+    Text und Stimme liegen als Datei in einem geteilten Verzeichnis, damit jeder
+    Worker das Ticket auflösen kann. Mehrfach abrufbar (Range-Requests) bis TTL.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[int] = None):
+        self.dir = Path(directory or settings.tts_stream_ticket_dir)
+        self.ttl = settings.tts_stream_ticket_ttl if ttl is None else ttl
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def create(self, text: str, voice: str) -> str:
+        ticket = secrets.token_hex(16)
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"text": text, "voice": voice}, f, ensure_ascii=False)
+        os.replace(tmp, self.dir / f"{ticket}.json")
+        self._prune()
+        return ticket
+
+    def get(self, ticket: str) -> Optional[Tuple[str, str]]:
+        if not re.fullmatch(r"[0-9a-f]{32}", ticket):
+            return None
+        p = self.dir / f"{ticket}.json"
+        try:
+            if time.time() - p.stat().st_mtime > self.ttl:
+                p.unlink(missing_ok=True)
+                return None
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        return data["text"], data["voice"]
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        for p in self.dir.glob("*.*"):
+            try:
+                if p.stat().st_mtime < cutoff:
+                    p.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+
+_stream_tickets: Optional[StreamTickets] = None
+
+def get_stream_tickets() -> StreamTickets:
+    global _stream_tickets
+    if _stream_tickets is None:
+        _stream_tickets = StreamTickets()
+    return _stream_tickets
+
 # Globale Instanz des Services
 text_to_speech_service: Optional[TextToSpeechService] = None
 
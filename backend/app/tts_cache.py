@@ -0,0 +1,168 @@
+# app/tts_cache.py
+"""
+Content-adressierter Audio-Cache auf der Platte für /api/text-to-speech.
+
+Schlüssel: sha256(Text, Stimme, Format) – zugleich der ETag der Antwort.
+Dateien liegen unter TTS_CACHE_DIR/<ab>/<schlüssel>.<ext>; die mtime dient als
+LRU-Zeitstempel, bei Überschreiten von TTS_CACHE_MAX_MB fliegen die ältesten
+Dateien raus. Mehrere Worker können sich das Verzeichnis teilen (atomares
+Schreiben per rename).
+"""
+import asyncio, hashlib, json, os, tempfile, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Literal, Optional, Tuple
+from .config import settings
+from .singleflight import SingleFlight
+
+# unterstützte Formate (Schlüssel von EXTENSIONS); andere lehnt /api/text-to-speech mit 422 ab
+AudioFormat = Literal[
+    "audio/wav",
+    "audio/ogg;codecs=opus",
+    "audio/mp3",
+    "audio/webm",
+    "audio/l16;rate=22050;endianness=little-endian",
+]
+
+EXTENSIONS: Dict[str, str] = {
+    "audio/wav": "wav",
+    "audio/ogg;codecs=opus": "ogg",
+    "audio/mp3": "mp3",
+    "audio/webm": "webm",
+    "audio/l16;rate=22050;endianness=little-endian": "pcm",
+}
+
+class TTSAudioCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.dir = Path(directory or settings.tts_cache_dir)
+        self.max_bytes = max_bytes or settings.tts_cache_max_mb * 1024 * 1024
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # Schlüssel -> Größe, älteste zuerst
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._flight: SingleFlight[Path] = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        files = []
+        for p in self.dir.glob("*/*.*"):
+            if p.suffix == ".tmp":
+                continue
+            st = p.stat()
+            files.append((st.st_mtime, p.stem, st.st_size))
+        for _, key, size in sorted(files):
+            self._index[key] = size
+            self._bytes += size
+
+    @staticmethod
+    def key(text: str, voice: str, accept: str) -> str:
+        raw = json.dumps([text, voice, accept], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, accept: str) -> Path:
+        return self.dir / key[:2] / f"{key}.{EXTENSIONS.get(accept, 'bin')}"
+
+    @staticmethod
+    def _touch(p: Path) -> int:
+        os.utime(p)  # LRU-Zeitstempel auffrischen (auch für andere Worker)
+        return p.stat().st_size
+
+    async def lookup(self, key: str, accept: str) -> Optional[Path]:
+        p = self.path(key, accept)
+        try:
+            size = await asyncio.to_thread(self._touch, p)
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+        if key in self._index:
+            self._index.move_to_end(key)
+        else:
+            # von einem anderen Worker geschrieben
+            self._index[key] = size
+            self._bytes += size
+        return p
+
+    def _forget(self, key: str) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _store(self, key: str, accept: str, audio: bytes) -> Path:
+        p = self.path(key, accept)
+        p.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=p.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, p)
+        self._forget(key)
+        self._index[key] = len(audio)
+        self._bytes += len(audio)
+        self._evict()
+        return p
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            for p in (self.dir / key[:2]).glob(f"{key}.*"):
+                p.unlink(missing_ok=True)
+
+    async def get_or_synthesize(self, text: str, voice: str, accept: str = "audio/wav", service=None) -> Tuple[str, Path]:
+        """Liefert (Schlüssel, Pfad); synthetisiert nur bei einem Cache-Miss."""
+        key = self.key(text, voice, accept)
+        p = await self.lookup(key, accept)
+        if p is not None:
+            self.hits += 1
+            return key, p
+        # gleiche Texte teilen sich eine Synthese; sie läuft als eigener Task, damit ein
+        # abgebrochener Aufrufer (z.B. Lookahead beim Streaming) die übrigen nicht mitreißt
+        return key, await self._flight.do(key, lambda: self._synthesize(key, text, voice, accept, service))
+
+    async def _synthesize(self, key: str, text: str, voice: str, accept: str, service) -> Path:
+        self.misses += 1
+        if service is None:
+            from .text_to_speech import get_text_to_speech_service
+            service = get_text_to_speech_service()
+        audio = await service.synthesize_text(text, voice, accept=accept)
+        return await asyncio.to_thread(self._store, key, accept, audio)
+
+    async def prewarm(self, phrases: Iterable[str], voice: str, accept: str = "audio/wav") -> int:
+        t0, n = time.perf_counter(), 0
+        for text in phrases:
+            try:
+                await self.get_or_synthesize(text, voice, accept)
+                n += 1
+            except Exception as e:
+                print(f"Warnung: TTS-Pre-Warm für '{text[:40]}' fehlgeschlagen: {e}")
+        print(f"TTS-Cache vorgewärmt: {n} Phrasen in {time.perf_counter() - t0:.1f}s")
+        return n
+
+    def stats(self) -> Dict:
+        return {
+            "files": len(self._index),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+def prewarm_phrases(path: Optional[str] = None) -> list:
+    """Eine Phrase pro Zeile; Leerzeilen und #-Kommentare werden ignoriert."""
+    p = Path(path or settings.tts_prewarm_file)
+    if not p.exists():
+        return []
+    lines = (l.strip() for l in p.read_text(encoding="utf-8").splitlines())
+    return [l for l in lines if l and not l.startswith("#")]
+
+_tts_cache: Optional[TTSAudioCache] = None
+
+def get_tts_cache() -> TTSAudioCache:
+    global _tts_cache
+    if _tts_cache is None:
+        _tts_cache = TTSAudioCache()
+    return _tts_cache
@@ -0,0 +1,132 @@
+# app/upload_cache.py
+"""
+Cache für /api/ask-with-file: geparste Chunks + Embeddings je Dateiinhalt.
+
+Schlüssel: sha256(Dateiinhalt) + EMBEDDINGS_MODEL_ID – dieselbe Datei wird nur
+einmal geparst und eingebettet, egal wie oft (oder unter welchem Namen) sie
+hochgeladen wird. LRU mit Begrenzung nach Anzahl und Speicher.
+
+Das Parsen (pypdf/docx, Chunking) läuft in einem Prozess-Pool, damit große
+PDFs den Event-Loop nicht blockieren.
+"""
+import asyncio, hashlib, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .cache import LRUCache
+from .config import settings
+from .singleflight import SingleFlight
+
+class UnsupportedFile(ValueError):
+    pass
+
+@dataclass
+class ParsedUpload:
+    chunks: List[str]
+    embeddings: np.ndarray  # (n, dim), L2-normiert
+
+    @property
+    def nbytes(self) -> int:
+        return self.embeddings.nbytes + sum(len(c) for c in self.chunks)
+
+def parse_upload(data: bytes, suffix: str) -> List[str]:
+    """Läuft im Worker-Prozess: Datei laden und in Chunks splitten."""
+    from ingest.loaders import load_documents
+    from ingest.chunker import split_into_chunks
+
+    # Temp-Datei nur für die Loader (erwarten einen Pfad), wird sofort wieder gelöscht
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / f"upload{suffix.lower()}"
+        path.write_bytes(data)
+        docs = list(load_documents([path]))
+    if not docs:
+        raise UnsupportedFile(suffix)
+    return split_into_chunks(docs[0]["text"])
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+class UploadCache:
+    def __init__(self):
+        self.cache: LRUCache[ParsedUpload] = LRUCache(
+            settings.upload_cache_size,
+            settings.upload_cache_ttl,
+            max_weight=settings.upload_cache_max_mb * 1024 * 1024,
+            weigh=lambda p: p.nbytes,
+        )
+        self._flight: SingleFlight[ParsedUpload] = SingleFlight()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.parsed = 0
+
+    def key(self, data: bytes) -> str:
+        return f"{settings.embeddings_model_id}:{hashlib.sha256(data).hexdigest()}"
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=settings.upload_parse_workers)
+        return self._pool
+
+    async def get(self, data: bytes, filename: str) -> ParsedUpload:
+        key = self.key(data)
+        hit = self.cache.get(key)
+        if hit is not None:
+            return hit
+        # gleichzeitige Uploads derselben Datei teilen sich eine Verarbeitung; sie
+        # läuft als eigener Task weiter, auch wenn der erste Client abbricht
+        return await self._flight.do(key, lambda: self._build_and_store(key, data, filename))
+
+    async def _build_and_store(self, key: str, data: bytes, filename: str) -> ParsedUpload:
+        parsed = await self._build(data, filename)
+        self.cache.set(key, parsed)
+        return parsed
+
+    async def _build(self, data: bytes, filename: str) -> ParsedUpload:
+        from ingest.ingest import embed_records
+
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(self._executor(), parse_upload, data, Path(filename).suffix)
+        self.parsed += 1
+        if not chunks:
+            return ParsedUpload(chunks=[], embeddings=np.zeros((0, 0), dtype=np.float32))
+        vectors = await embed_records([{"content": c} for c in chunks])
+        return ParsedUpload(chunks=chunks, embeddings=_normalize(np.asarray(vectors, dtype=np.float32)))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        return {**self.cache.stats(), "parsed": self.parsed, "pending": self._flight.stats()["in_flight"]}
+
+def rank_chunks(parsed: ParsedUpload, q_vec: Sequence[float], filename: str, top_k: int) -> List[Dict]:
+    """Datei-Chunks nach Kosinus-Ähnlichkeit zur Frage, als Kontext-Kandidaten."""
+    if not parsed.chunks:
+        return []
+    q = np.asarray(q_vec, dtype=np.float32)
+    q = q / (np.linalg.norm(q) or 1.0)
+    scores = parsed.embeddings @ q
+    order = np.argsort(-scores)[:top_k]
+    return [
+        {
+            "doc_id": "temp_doc",
+            "chunk_id": int(i) + 1,
+            "content": parsed.chunks[i],
+            "metadata": {"filename": filename, "source": "upload"},
+            "score": float(scores[i]),
+            "embedding": parsed.embeddings[i],
+        }
+        for i in order
+    ]
+
+_upload_cache: Optional[UploadCache] = None
+
+def get_upload_cache() -> UploadCache:
+    global _upload_cache
+    if _upload_cache is None:
+        _upload_cache = UploadCache()
+    return _upload_cache
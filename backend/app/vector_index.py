@@ -0,0 +1,198 @@
+# app/vector_index.py
+"""
+Verwaltung des ANN-Index auf documents.embedding (pgvector HNSW / IVFFlat).
+
+- ensure_index(): legt den Index mit konfigurierbaren Parametern an (CONCURRENTLY)
+- apply_search_settings(): setzt hnsw.ef_search / ivfflat.probes pro Transaktion
+- report(): Index-Größe, Build-Zeit und tatsächlich verwendeter Query-Plan
+
+CLI (aus backend/):
+    python -m app.vector_index create [--method hnsw|ivfflat] [--m 16] [--ef-construction 64] [--lists 100] [--rebuild]
+    python -m app.vector_index report [--location boeblingen]
+    python -m app.vector_index drop
+"""
+import json, time
+from typing import Dict, Optional
+from psycopg import sql
+from .config import settings
+from .db import connection
+from .locations import indexed_locations
+
+METHODS = ("hnsw", "ivfflat")
+
+def index_name(method: str, location: Optional[str] = None) -> str:
+    if location:
+        return f"documents_embedding_{method}_{location.replace('-', '_')}_idx"
+    return f"documents_embedding_{method}_idx"
+
+def location_predicate(location: str) -> sql.Composable:
+    """Standort-Filter; dieselbe Form im partiellen Index und in der Query (sonst nutzt der Planner ihn nicht)."""
+    return sql.SQL("(audience = {} OR audience IS NULL)").format(sql.Literal(location))
+
+def build_params(method: str, overrides: Optional[Dict] = None) -> Dict[str, int]:
+    if method == "hnsw":
+        params = {"m": settings.hnsw_m, "ef_construction": settings.hnsw_ef_construction}
+    else:
+        params = {"lists": settings.ivfflat_lists}
+    params.update({k: v for k, v in (overrides or {}).items() if k in params and v is not None})
+    return params
+
+async def _create(conn, name: str, method: str, params: Dict, location: Optional[str], rebuild: bool) -> Optional[float]:
+    with_opts = sql.SQL(", ").join(
+        sql.SQL("{} = {}").format(sql.Identifier(k), sql.Literal(v)) for k, v in params.items()
+    )
+    # partieller Index pro Standort: gefilterte Suche berührt nur dessen Chunks (+ standortlose)
+    where = sql.SQL(" WHERE {}").format(location_predicate(location)) if location else sql.SQL("")
+    cur = await conn.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", (name,))
+    row = await cur.fetchone()
+    # Standort-Indizes mit dem alten Prädikat (ohne IS NULL) passen nicht mehr zur Query
+    outdated = row is not None and location is not None and "IS NULL" not in row["indexdef"]
+    if rebuild or outdated:
+        await conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+    elif row is not None:
+        return None
+    t0 = time.perf_counter()
+    await conn.execute(
+        sql.SQL(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON documents USING {} (embedding vector_cosine_ops) WITH ({}){}"
+        ).format(sql.Identifier(name), sql.SQL(method), with_opts, where)
+    )
+    seconds = time.perf_counter() - t0
+    await conn.execute(
+        """
+        INSERT INTO vector_index_builds (index_name, method, params, build_seconds)
+        VALUES (%s, %s, %s, %s)
+        """,
+        (name, method, json.dumps({**params, "location": location}), seconds),
+    )
+    print(f"Index {name} {params} in {seconds:.1f}s erstellt")
+    return seconds
+
+async def ensure_index(method: Optional[str] = None, overrides: Optional[Dict] = None, rebuild: bool = False) -> Optional[float]:
+    """
+    Legt den globalen Index und die partiellen Standort-Indizes an, falls sie fehlen.
+    Liefert die gesamte Build-Zeit in Sekunden (None = alle existierten schon).
+    """
+    method = method or settings.vector_index_method
+    if method not in METHODS:
+        return None
+    params = build_params(method, overrides)
+    total = None
+    async with connection() as conn:
+        # CREATE INDEX CONCURRENTLY darf nicht in einer Transaktion laufen
+        await conn.set_autocommit(True)
+        try:
+            for location in [None, *indexed_locations()]:
+                seconds = await _create(conn, index_name(method, location), method, params, location, rebuild)
+                if seconds is not None:
+                    total = (total or 0.0) + seconds
+        finally:
+            await conn.set_autocommit(False)
+    return total
+
+async def drop_index(method: Optional[str] = None) -> None:
+    async with connection() as conn:
+        await conn.set_autocommit(True)
+        try:
+            for m in ([method] if method else METHODS):
+                for location in [None, *indexed_locations()]:
+                    await conn.execute(
+                        sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(index_name(m, location)))
+                    )
+        finally:
+            await conn.set_autocommit(False)
+
+async def apply_search_settings(conn, k: int, ef_search: Optional[int] = None, probes: Optional[int] = None) -> None:
+    """Setzt die Such-Knöpfe transaktionslokal (set_config(..., true) ≙ SET LOCAL)."""
+    method = settings.vector_index_method
+    if method == "hnsw":
+        ef = max(ef_search or settings.hnsw_ef_search, k)  # ef_search < k würde Treffer abschneiden
+        await conn.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef),))
+    elif method == "ivfflat":
+        await conn.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(probes or settings.ivfflat_probes),))
+
+async def report(k: int = 6, location: Optional[str] = None) -> Dict:
+    out: Dict = {"method": settings.vector_index_method, "location": location}
+    async with connection() as conn:
+        cur = await conn.execute(
+            """
+            SELECT count(*) AS rows, pg_total_relation_size('documents') AS table_bytes
+            FROM documents
+            """
+        )
+        out.update(await cur.fetchone())
+        cur = await conn.execute(
+            """
+            SELECT i.indexname, pg_relation_size(i.indexname::regclass) AS bytes, i.indexdef
+            FROM pg_indexes i
+            WHERE i.tablename = 'documents' AND i.indexdef ILIKE '%embedding%'
+            """
+        )
+        out["indexes"] = await cur.fetchall()
+        cur = await conn.execute(
+            """
+            SELECT DISTINCT ON (index_name) index_name, method, params, build_seconds, built_at
+            FROM vector_index_builds ORDER BY index_name, built_at DESC
+            """
+        )
+        out["builds"] = await cur.fetchall()
+
+        cur = await conn.execute("SELECT embedding FROM documents LIMIT 1")
+        sample = await cur.fetchone()
+        if sample is not None:
+            await apply_search_settings(conn, k)
+            where = sql.SQL("WHERE {}").format(location_predicate(location)) if location else sql.SQL("")
+            cur = await conn.execute(
+                sql.SQL(
+                    """
+                    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+                    SELECT id FROM documents {} ORDER BY embedding <=> %s LIMIT %s
+                    """
+                ).format(where),
+                (sample["embedding"], k),
+            )
+            plan = (await cur.fetchone())["QUERY PLAN"][0]
+            out["plan"] = plan
+            out["uses_index"] = "Index Scan" in json.dumps(plan["Plan"])
+    return out
+
+def _print_report(r: Dict) -> None:
+    print(f"Methode: {r['method']}  Standort: {r['location'] or '-'}  Zeilen: {r['rows']}  Tabelle: {r['table_bytes'] / 1e6:.1f} MB")
+    for i in r["indexes"]:
+        print(f"  {i['indexname']}: {i['bytes'] / 1e6:.1f} MB  ({i['indexdef']})")
+    for b in r["builds"]:
+        print(f"  Build {b['index_name']} {b['params']}: {b['build_seconds']:.1f}s am {b['built_at']:%Y-%m-%d %H:%M}")
+    if "plan" in r:
+        print(f"Query-Plan (Index verwendet: {r['uses_index']}, {r['plan']['Execution Time']:.2f}ms):")
+        print(json.dumps(r["plan"]["Plan"], indent=2, default=str))
+
+if __name__ == "__main__":
+    import argparse, asyncio
+    from .db import close_pool
+    from .db_schema import ensure_schema
+    from .locations import normalize_location
+
+    ap = argparse.ArgumentParser(prog="python -m app.vector_index")
+    ap.add_argument("command", choices=["create", "report", "drop"])
+    ap.add_argument("--method", choices=METHODS)
+    ap.add_argument("--m", type=int)
+    ap.add_argument("--ef-construction", type=int)
+    ap.add_argument("--lists", type=int)
+    ap.add_argument("--rebuild", action="store_true")
+    ap.add_argument("--location", help="Query-Plan für einen Standort-Filter anzeigen")
+    args = ap.parse_args()
+
+    async def _run():
+        try:
+            await ensure_schema()
+            if args.command == "create":
+                overrides = {"m": args.m, "ef_construction": args.ef_construction, "lists": args.lists}
+                await ensure_index(args.method, overrides, rebuild=args.rebuild)
+            elif args.command == "drop":
+                await drop_index(args.method)
+            else:
+                _print_report(await report(location=normalize_location(args.location)))
+        finally:
+            await close_pool()
+
+    asyncio.run(_run())
@@ -0,0 +1,199 @@
+# app/vector_store.py
+"""
+Optionales In-Process-Retrieval über eine memory-mapped NumPy-Matrix.
+
+Die Chunk-Embeddings werden (L2-normalisiert) als float32/float16 .npy exportiert
+und mit mmap_mode="r" geladen – mehrere uvicorn-Worker teilen sich so dieselben
+Seiten im Page-Cache. Top-k ist ein vektorisiertes Skalarprodukt. Ingest erhöht
+`corpus_version`; der Store prüft die Version periodisch und lädt bei Änderung
+im Hintergrund neu.
+
+Im Export liegen nur Vektoren, Standort-Codes und die Chunk-IDs (Zeile i der
+Matrix ↔ ids[i]), alles per mmap geteilt; Text und Metadaten der Top-k-Treffer
+kommen pro Suche aus Postgres.
+
+Aktivierung: RETRIEVAL_BACKEND=mmap (nur Vektor-Suche, kein Hybrid-Retrieval).
+"""
+import asyncio, json, os, re, shutil, tempfile, time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from .config import settings
+from .db import connection, vector_to_list
+
+async def get_corpus_version(conn) -> int:
+    cur = await conn.execute("SELECT version FROM corpus_version")
+    row = await cur.fetchone()
+    return row["version"] if row else 0
+
+async def bump_corpus_version(conn) -> None:
+    """Nach jedem Ingest-Schreibvorgang aufrufen (in derselben Transaktion)."""
+    await conn.execute("UPDATE corpus_version SET version = version + 1, updated_at = now()")
+
+async def fetch_rows(ids: List[str]) -> Dict[str, Dict]:
+    """Text und Metadaten der Treffer, nach Chunk-ID."""
+    async with connection() as conn:
+        cur = await conn.execute(
+            "SELECT id::text AS id, doc_id, chunk_id, content, metadata FROM documents WHERE id::text = ANY(%s)", (ids,)
+        )
+        return {r["id"]: r for r in await cur.fetchall()}
+
+class _Snapshot:
+    def __init__(self, directory: Path):
+        self.matrix = np.load(directory / "embeddings.npy", mmap_mode="r")
+        self.audience = np.load(directory / "audience.npy", mmap_mode="r")
+        self.ids = np.load(directory / "ids.npy", mmap_mode="r")
+        with open(directory / "meta.json", encoding="utf-8") as f:
+            self.audience_codes: Dict[str, int] = json.load(f)["audience_codes"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+def write_export(directory: Path, ids: List[str], audiences: List[Optional[str]], vectors: List[List[float]], dtype) -> None:
+    """Schreibt einen vollständigen Export nach `directory` (muss noch nicht existieren)."""
+    # NULL (Uploads, für alle Standorte sichtbar) bekommt den Code -1
+    codes = {a: i for i, a in enumerate(sorted({a for a in audiences if a is not None}))}
+    if vectors:
+        mat = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        mat = (mat / np.where(norms == 0, 1, norms)).astype(dtype)
+    else:
+        # leerer Korpus (vor dem ersten Ingest): gültiger, leerer Snapshot
+        mat = np.empty((0, 0), dtype=dtype)
+    directory.mkdir()
+    np.save(directory / "embeddings.npy", mat)
+    np.save(directory / "audience.npy", np.asarray([-1 if a is None else codes[a] for a in audiences], dtype=np.int16))
+    np.save(directory / "ids.npy", np.asarray(ids, dtype=f"S{max((len(i) for i in ids), default=1)}"))
+    with open(directory / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"audience_codes": codes, "chunks": len(ids)}, f, ensure_ascii=False)
+
+class MmapVectorStore:
+    def __init__(self, directory: Optional[str] = None):
+        self.root = Path(directory or settings.vector_store_dir)
+        self.dtype = np.float16 if settings.vector_store_dtype == "float16" else np.float32
+        self.version: Optional[int] = None
+        self._snapshot: Optional[_Snapshot] = None
+        self._last_check = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    def _dir(self, version: int) -> Path:
+        return self.root / f"v{version}-{np.dtype(self.dtype).name}"
+
+    async def _export(self, version: int) -> None:
+        """Exportiert alle Chunks in ein temporäres Verzeichnis und benennt es atomar um."""
+        ids, vectors, audiences = [], [], []
+        async with connection() as conn, conn.cursor(name="vector_store_export") as cur:
+            await cur.execute("SELECT id::text AS id, audience, embedding FROM documents")
+            async for r in cur:
+                ids.append(r["id"])
+                audiences.append(r["audience"])
+                vectors.append(vector_to_list(r["embedding"]))
+
+        def write():
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(dir=self.root, prefix=".export-"))
+            write_export(tmp / "data", ids, audiences, vectors, self.dtype)
+            try:
+                os.rename(tmp / "data", self._dir(version))
+            except OSError:
+                pass  # ein anderer Worker war schneller – dessen Export verwenden
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        await asyncio.to_thread(write)
+
+    async def refresh(self) -> None:
+        """Lädt den Snapshot zur aktuellen corpus_version (exportiert ihn bei Bedarf)."""
+        async with self._lock:
+            self._last_check = time.monotonic()
+            async with connection() as conn:
+                version = await get_corpus_version(conn)
+            if version == self.version:
+                return
+            directory = self._dir(version)
+            if not (directory / "meta.json").exists():
+                # ältere Exporte (rows.json mit vollem Text) ersetzen
+                await asyncio.to_thread(shutil.rmtree, directory, True)
+                await self._export(version)
+            self._snapshot = await asyncio.to_thread(_Snapshot, directory)
+            self.version = version
+            self.reloads += 1
+            print(f"Vector-Store: {len(self._snapshot)} Chunks (corpus_version {version}) geladen")
+            await asyncio.to_thread(self._prune, version)
+
+    def _prune(self, version: int) -> None:
+        """
+        Löscht nur Exporte, die mindestens VECTOR_STORE_KEEP_VERSIONS Versionen
+        zurückliegen – andere Worker/Prozesse laden oder mappen ggf. noch die
+        vorige Version.
+        """
+        keep = max(1, settings.vector_store_keep_versions)
+        for d in self.root.glob("v*-*"):
+            m = re.fullmatch(r"v(\d+)-\w+", d.name)
+            if m and int(m.group(1)) <= version - keep:
+                shutil.rmtree(d, ignore_errors=True)
+
+    def _maybe_refresh(self) -> None:
+        stale = time.monotonic() - self._last_check > settings.vector_store_check_interval
+        if stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._last_check = time.monotonic()
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def search(
+        self, q_vec: List[float], k: int, location: Optional[str] = None, with_embeddings: bool = False
+    ) -> List[Dict]:
+        if self._snapshot is None:
+            await self.refresh()
+        else:
+            # Versionsprüfung im Hintergrund; bis dahin wird der alte Snapshot verwendet
+            self._maybe_refresh()
+        snap = self._snapshot
+        if snap is None or not len(snap):
+            return []
+
+        q = np.asarray(q_vec, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        scores = snap.matrix @ q.astype(snap.matrix.dtype)
+        scores = scores.astype(np.float32, copy=False)
+        if location:
+            code = snap.audience_codes.get(location)
+            visible = snap.audience == -1
+            if code is not None:
+                visible |= snap.audience == code
+            scores = np.where(visible, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = [int(i) for i in top if np.isfinite(scores[i])]
+        if not hits:
+            return []
+        ids = [snap.ids[i].decode() for i in hits]
+        rows = await fetch_rows(ids)
+        out = []
+        for i, chunk_id in zip(hits, ids):
+            row = rows.get(chunk_id)
+            if row is None:
+                continue  # seit dem Export gelöscht; der nächste Reload holt den neuen Stand
+            if with_embeddings:
+                row = {**row, "embedding": np.asarray(snap.matrix[i], dtype=np.float32)}
+            out.append(row)
+        return out
+
+    def stats(self) -> Dict:
+        return {
+            "version": self.version,
+            "chunks": len(self._snapshot) if self._snapshot else 0,
+            "dtype": np.dtype(self.dtype).name,
+            "reloads": self.reloads,
+        }
+
+# Globale Instanz
+vector_store: Optional[MmapVectorStore] = None
+
+def get_vector_store() -> MmapVectorStore:
+    """Singleton-Pattern für den mmap-Vector-Store"""
+    global vector_store
+    if vector_store is None:
+        vector_store = MmapVectorStore()
+    return vector_store
@@ -0,0 +1,162 @@
+# bench/chunker.py
+"""
+Vergleicht den bisherigen Chunker (hier als legacy_split_into_chunks
+eingefroren) mit ingest.chunker auf synthetischen Dokumenten und prüft dabei,
+dass beide exakt dieselben Chunks liefern und die Offsets stimmen.
+
+Aufruf (aus backend/):  python -m bench.chunker [--repeat 3] [--sizes small,medium,large,huge]
+"""
+import argparse, random, re, statistics, time
+from typing import Callable, Dict, List
+from ingest.chunker import (
+    MAX_TOKENS, OVERLAP_TOKENS, TARGET_TOKENS, approx_tokens_by_chars, split_into_chunks, split_into_spans,
+)
+
+# ---- Referenz: Implementierung vor dem Umbau (unverändert übernommen) ----
+def _legacy_split_sentences(text: str) -> List[str]:
+    return re.split(r"(?<=[.!?])\s+", text)
+
+def _legacy_split_hard(s: str, max_tokens: int) -> List[str]:
+    max_chars = max_tokens * 4
+    out, i, n = [], 0, len(s)
+    while i < n:
+        out.append(s[i:i+max_chars])
+        i += max_chars
+    return out
+
+def legacy_split_into_chunks(text: str, target_tokens: int = TARGET_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> List[str]:
+    paras = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+    chunks: List[str] = []
+    buf: List[str] = []
+    buf_tokens = 0
+
+    for para in paras:
+        blocks = [para]
+        if approx_tokens_by_chars(para) > target_tokens:
+            blocks = _legacy_split_sentences(para)
+
+        for block in blocks:
+            if approx_tokens_by_chars(block) > MAX_TOKENS:
+                for piece in _legacy_split_hard(block, MAX_TOKENS - 10):
+                    if approx_tokens_by_chars(piece) > target_tokens:
+                        chunks.append(piece)
+                        continue
+                    tok = approx_tokens_by_chars(piece)
+                    if buf_tokens + tok > target_tokens and buf:
+                        chunks.append(" ".join(buf))
+                        if overlap_tokens > 0:
+                            words = " ".join(buf).split()
+                            ov_words = " ".join(words[-overlap_tokens:]) if len(words) > overlap_tokens else " ".join(words)
+                            buf = [ov_words] if ov_words else []
+                            buf_tokens = approx_tokens_by_chars(" ".join(buf)) if buf else 0
+                        else:
+                            buf, buf_tokens = [], 0
+                    buf.append(piece)
+                    buf_tokens += tok
+                continue
+
+            tok = approx_tokens_by_chars(block)
+            if buf_tokens + tok > target_tokens and buf:
+                chunks.append(" ".join(buf))
+                if overlap_tokens > 0:
+                    words = " ".join(buf).split()
+                    ov_words = " ".join(words[-overlap_tokens:]) if len(words) > overlap_tokens else " ".join(words)
+                    buf = [ov_words] if ov_words else []
+                    buf_tokens = approx_tokens_by_chars(" ".join(buf)) if buf else 0
+                else:
+                    buf, buf_tokens = [], 0
+            buf.append(block)
+            buf_tokens += tok
+
+    if buf:
+        chunks.append(" ".join(buf))
+
+    fixed: List[str] = []
+    for c in chunks:
+        if approx_tokens_by_chars(c) <= MAX_TOKENS:
+            fixed.append(c)
+        else:
+            fixed.extend(_legacy_split_hard(c, MAX_TOKENS - 10))
+    return fixed
+
+# ---- synthetische Dokumente ----
+WORDS = (
+    "Onboarding Mitarbeiter Standort Böblingen Parkplatz Ausweis Kantine IT-Support Laptop "
+    "Urlaubsantrag Gleitzeit Betriebsrat Sicherheitsunterweisung Zugangskarte Mentor Team "
+    "der die das und mit für im am zum bei nach vor über unter ein eine wird ist sind"
+).split()
+
+def synthetic_document(n_chars: int, seed: int = 0) -> str:
+    """Absätze aus Sätzen, dazwischen Listen, sehr lange Absätze und wortlose Blöcke."""
+    rnd = random.Random(seed)
+    out, size = [], 0
+    while size < n_chars:
+        kind = rnd.random()
+        if kind < 0.05:
+            # Tabellen-/Base64-artiger Block ohne Satzenden → harter Split
+            para = "".join(rnd.choice("abcdef0123456789|-") for _ in range(rnd.randint(1500, 6000)))
+        elif kind < 0.15:
+            # Stichpunktliste aus sehr kurzen Zeilen
+            para = "\n".join(f"- {rnd.choice(WORDS)}" for _ in range(rnd.randint(3, 40)))
+        else:
+            sentences = []
+            for _ in range(rnd.randint(1, 60 if kind > 0.9 else 8)):
+                words = [rnd.choice(WORDS) for _ in range(rnd.randint(3, 30))]
+                sentences.append(" ".join(words).capitalize() + rnd.choice(".!?"))
+            para = " ".join(sentences)
+        out.append(para)
+        size += len(para) + 2
+    return "\n\n".join(out)
+
+SIZES: Dict[str, int] = {
+    "small": 2_000,
+    "medium": 50_000,
+    "large": 1_000_000,
+    "huge": 10_000_000,
+}
+
+def _check_equivalent(text: str) -> None:
+    spans = split_into_spans(text)
+    legacy = legacy_split_into_chunks(text)
+    assert [c.text for c in spans] == legacy, "Chunks weichen von der bisherigen Implementierung ab"
+    for c in spans:
+        assert 0 <= c.start < c.end <= len(text), c
+        # Span deckt den Chunk ab: erstes und letztes Wort liegen im Quellbereich
+        words = c.text.split()
+        if words:
+            src = text[c.start:c.end]
+            assert src.lstrip().startswith(words[0]) and src.rstrip().endswith(words[-1]), c
+
+def _time(fn: Callable[[str], object], text: str, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.chunker")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--sizes", default="small,medium,large")
+    ap.add_argument("--seeds", type=int, default=20, help="Dokumente je Größe für die Äquivalenzprüfung (nur small/medium)")
+    args = ap.parse_args()
+
+    for seed in range(args.seeds):
+        for n in (SIZES["small"], SIZES["medium"]):
+            _check_equivalent(synthetic_document(n, seed))
+    print(f"Äquivalenz: {2 * args.seeds} Dokumente identisch")
+
+    for name in args.sizes.split(","):
+        text = synthetic_document(SIZES[name], seed=42)
+        _check_equivalent(text)
+        old = statistics.median(_time(legacy_split_into_chunks, text, args.repeat))
+        new = statistics.median(_time(split_into_chunks, text, args.repeat))
+        n_chunks = len(split_into_chunks(text))
+        print(
+            f"{name:<7} {len(text)/1e6:7.2f} MB {n_chunks:>7} chunks  "
+            f"legacy={old*1000:9.1f}ms  new={new*1000:9.1f}ms  ({len(text)/new/1e6:6.1f} MB/s)"
+        )
+
+if __name__ == "__main__":
+    main()
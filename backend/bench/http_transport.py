@@ -0,0 +1,74 @@
+# bench/http_transport.py
+"""
+Vergleicht pro Request einen neuen httpx.AsyncClient (altes Verhalten) mit dem
+gemeinsamen, gepoolten Client aus app.http_client.
+
+Aufruf (aus backend/):  python -m bench.http_transport [--requests 200] [--latency-ms 0]
+"""
+import argparse, asyncio, os, statistics, time
+from .stub_watsonx import StubServer, make_app
+
+def _summary(name: str, samples) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    return f"{name:<18} mean={statistics.mean(ms):7.2f}ms  p50={statistics.median(ms):7.2f}ms  p95={p95:7.2f}ms"
+
+async def _run(base_url: str, n: int):
+    import httpx
+    from app import http_client
+    from app.embeddings import WatsonxAIEmbeddings
+
+    url = f"{base_url}/ml/v1/text/embeddings"
+    payload = {"model_id": "stub", "inputs": ["Wo parke ich in Böblingen?"]}
+
+    # altes Verhalten: neuer Client (und damit neue Verbindung) pro Aufruf
+    fresh = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(timeout=60) as client:
+            r = await client.post(url, json=payload)
+            r.raise_for_status()
+        fresh.append(time.perf_counter() - t0)
+
+    # neues Verhalten: gemeinsamer Client mit Keep-Alive
+    await http_client.startup()
+    pooled = []
+    client = http_client.get_client()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        r = await client.post(url, json=payload, timeout=http_client.timeout_for("embeddings"))
+        r.raise_for_status()
+        pooled.append(time.perf_counter() - t0)
+
+    # kompletter Embeddings-Pfad inkl. IAM-Token über den gemeinsamen Client
+    embedder = WatsonxAIEmbeddings()
+    full = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        await embedder.embed(["Wo parke ich in Böblingen?"])
+        full.append(time.perf_counter() - t0)
+    await http_client.shutdown()
+
+    print(_summary("neuer Client", fresh))
+    print(_summary("gepoolter Client", pooled))
+    print(_summary("embed() gepoolt", full))
+    saved = statistics.mean(fresh) - statistics.mean(pooled)
+    print(f"Ersparnis pro Request: {saved * 1000:.2f}ms (ohne TLS; gegen IBM Cloud kommt der TLS-Handshake hinzu)")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    with StubServer(make_app(args.latency_ms)) as stub:
+        os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+        os.environ["WATSONX_API_KEY"] = "stub"
+        os.environ["WATSONX_BASE_URL"] = stub.url
+        os.environ["EMBEDDINGS_MODEL_ID"] = "stub-embeddings"
+        os.environ["LLM_MODEL_ID"] = "stub-llm"
+        os.environ["IBM_IAM_URL"] = f"{stub.url}/identity/token"
+        asyncio.run(_run(stub.url, args.requests))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# bench/iam_broker.py
+"""
+Prüft den Credential-Broker (app.ibm_auth) gegen den lokalen IAM-Fake aus
+bench/stub_watsonx.py mit kurzer Token-Laufzeit:
+
+1. lazy (ohne Hintergrund-Task): nach Ablauf warten alle gleichzeitigen
+   Aufrufer auf genau einen IAM-Call (Single-Flight) – und zahlen dessen Latenz.
+2. Broker gestartet: Dauerlast über mehrere Token-Laufzeiten, kein Aufrufer
+   wartet auf IAM.
+3. Fehlerinjektion: zwei fehlgeschlagene Refreshes werden gezählt, das alte
+   Token bleibt durchgehend gültig, der dritte Versuch gelingt.
+4. SDK-Authenticator: setzt aus einem Worker-Thread das Broker-Token.
+
+Aufruf (aus backend/):  python -m bench.iam_broker [--iam-ms 200] [--ttl 6]
+"""
+import argparse, asyncio, os, time
+from typing import List
+from bench.stub_watsonx import StubServer, make_app
+
+def _p(samples: List[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))] * 1000
+
+async def _timed(source) -> float:
+    t0 = time.perf_counter()
+    await source.get_token()
+    return time.perf_counter() - t0
+
+async def _run(stub_app, ttl: float, concurrency: int) -> None:
+    from app import http_client
+    from app.config import settings
+    from app.ibm_auth import CredentialBroker
+
+    # Laufzeit in Sekunden statt Stunden: Abstände passend verkleinern
+    settings.iam_refresh_fraction = 0.5
+    settings.iam_expiry_margin = ttl * 0.1
+    settings.iam_retry_max_backoff = ttl * 0.05
+
+    # 1) lazy: Token abgelaufen → ein IAM-Call für alle
+    broker = CredentialBroker()
+    src = broker.source(settings.watsonx_api_key, "watsonx")
+    await src.get_token()
+    await asyncio.sleep(ttl)
+    before = stub_app.state.token_requests
+    lat = await asyncio.gather(*(_timed(src) for _ in range(concurrency)))
+    calls = stub_app.state.token_requests - before
+    print(f"lazy:        {concurrency} Aufrufer nach Ablauf → {calls} IAM-Call(s), "
+          f"p50={_p(lat, .5):.1f}ms p99={_p(lat, .99):.1f}ms, coalesced={src._flight.coalesced}")
+    assert calls == 1, calls
+
+    # 2) Hintergrund-Refresh unter Dauerlast
+    broker = CredentialBroker()
+    await broker.start()
+    src = broker.source(settings.watsonx_api_key, "watsonx")
+    await src.get_token()  # erster Token (Start des Servers)
+    waits0, lat = src.request_path_waits, []
+    t_end = time.perf_counter() + 2 * ttl
+    while time.perf_counter() < t_end:
+        lat.extend(await asyncio.gather(*(_timed(src) for _ in range(concurrency // 10))))
+        await asyncio.sleep(0.01)
+    st = src.stats()
+    print(f"background:  {len(lat)} Aufrufe über {2 * ttl:.0f}s, refreshes={st['refreshes']} "
+          f"(IAM avg {st['avg_latency_ms']}ms), wartend={src.request_path_waits - waits0}, "
+          f"p99={_p(lat, .99):.2f}ms max={max(lat) * 1000:.2f}ms")
+    assert src.request_path_waits == waits0, "Request-Pfad musste auf IAM warten"
+
+    # 3) Fehler: zwei Refreshes scheitern, Token bleibt gültig
+    stub_app.state.token_failures = 2
+    fail0 = src.failures
+    while src.refreshes == st["refreshes"]:
+        assert src.valid(), "Token während der Fehlerphase abgelaufen"
+        await asyncio.sleep(0.05)
+    st = src.stats()
+    print(f"failures:    failures={st['failures'] - fail0}, danach refresh ok, token_valid={st['token_valid']} "
+          f"last_error={'-' if st['last_error'] is None else st['last_error'][:40]}")
+    assert st["failures"] - fail0 == 2 and st["token_valid"]
+
+    # 4) Watson-SDK-Authenticator aus einem Worker-Thread
+    auth = broker.authenticator(settings.watsonx_api_key, "speech_to_text")
+    req = {"headers": {}}
+    await asyncio.to_thread(auth.authenticate, req)
+    assert req["headers"]["Authorization"] == f"Bearer {src._token}"
+    print(f"sdk:         {req['headers']['Authorization']} (gleiche Quelle für {', '.join(src.names)})")
+
+    await broker.stop()
+    await http_client.shutdown()
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m bench.iam_broker")
+    ap.add_argument("--iam-ms", type=float, default=200.0, help="Latenz des IAM-Fakes")
+    ap.add_argument("--ttl", type=int, default=6, help="Token-Laufzeit in Sekunden")
+    ap.add_argument("--concurrency", type=int, default=200)
+    args = ap.parse_args()
+
+    stub_app = make_app(latency_ms=args.iam_ms, token_ttl=args.ttl)
+    with StubServer(stub_app) as stub:
+        os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+        os.environ["WATSONX_API_KEY"] = "stub"
+        os.environ["WATSONX_BASE_URL"] = stub.url
+        os.environ["EMBEDDINGS_MODEL_ID"] = "stub-embeddings"
+        os.environ["LLM_MODEL_ID"] = "stub-llm"
+        os.environ["IBM_IAM_URL"] = f"{stub.url}/identity/token"
+        asyncio.run(_run(stub_app, args.ttl, args.concurrency))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# bench/stream_ttft.py
+"""
+Misst Time-to-first-token von WatsonxAILLM.generate_stream gegenüber der Gesamtdauer
+von generate() gegen den lokalen Stub, und prüft den Abbruch eines Streams.
+
+Aufruf (aus backend/):  python -m bench.stream_ttft [--token-ms 20]
+"""
+import argparse, asyncio, os, time
+from contextlib import aclosing
+from .stub_watsonx import StubServer, make_app
+
+async def _run(stub_app):
+    from app import http_client
+    from app.llm import WatsonxAILLM
+
+    llm = WatsonxAILLM()
+    t0 = time.perf_counter()
+    await llm.generate("system", "frage")
+    full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ttft = None
+    async with aclosing(llm.generate_stream("system", "frage")) as stream:
+        async for _ in stream:
+            if ttft is None:
+                ttft = time.perf_counter() - t0
+    stream_total = time.perf_counter() - t0
+
+    # Abbruch nach dem ersten Token: der Stub muss den Stream als abgebrochen sehen
+    async with aclosing(llm.generate_stream("system", "frage")) as stream:
+        async for _ in stream:
+            break
+    await asyncio.sleep(0.2)
+    await http_client.shutdown()
+
+    print(f"generate()           gesamt={full * 1000:7.1f}ms")
+    print(f"generate_stream()    ttft={ttft * 1000:7.1f}ms  gesamt={stream_total * 1000:7.1f}ms")
+    print(f"Stub-Streams: gestartet={stub_app.state.streams_started}  abgebrochen={stub_app.state.streams_cancelled}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--token-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    stub_app = make_app(args.latency_ms, args.token_ms)
+    with StubServer(stub_app) as stub:
+        os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+        os.environ["WATSONX_API_KEY"] = "stub"
+        os.environ["WATSONX_BASE_URL"] = stub.url
+        os.environ["EMBEDDINGS_MODEL_ID"] = "stub-embeddings"
+        os.environ["LLM_MODEL_ID"] = "stub-llm"
+        os.environ["IBM_IAM_URL"] = f"{stub.url}/identity/token"
+        asyncio.run(_run(stub_app))
+
+if __name__ == "__main__":
+    main()
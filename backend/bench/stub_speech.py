@@ -0,0 +1,172 @@
+# bench/stub_speech.py
+"""
+Lokaler Fake für den Speech-to-Text-Service (gleiche Schnittstelle wie
+app.speech_to_text.SpeechToTextService), um die STT-Endpunkte ohne IBM Cloud
+zu testen oder zu messen:
+
+    from app.speech_to_text import get_speech_to_text_service
+    app.dependency_overrides[get_speech_to_text_service] = lambda: FakeSpeechToText()
+
+FakeWatsonWebSocket ersetzt eine Ebene tiefer nur den SDK-Aufruf
+recognize_using_websocket (SpeechToTextService.speech_to_text, siehe
+sdk_speech_service()) – damit laufen AudioSource, Callbacks, Thread-Pool und
+Sitzungslimit des echten Service mit.
+
+Für Lasttests über den echten Watson-SDK-Pfad (BrokerAuthenticator, Thread-Pool)
+gibt es zusätzlich make_speech_app(): HTTP-Stub für /v1/recognize und
+/v1/synthesize, gestartet per bench.stub_watsonx.StubServer und über
+SPEECH_TO_TEXT_URL / TEXT_TO_SPEECH_URL angebunden (siehe bench/loadtest.py).
+
+Aufruf (aus backend/):  python -m bench.stub_speech   → Selbsttest gegen server.app
+"""
+import asyncio, queue, time
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from bench.stub_watsonx import Behaviour
+
+# app.* erst bei Bedarf importieren: die Settings lesen die ENV schon beim Import,
+# bench.loadtest setzt sie aber erst, wenn die Stubs laufen
+
+WORDS = "wo finde ich den parkplatz in böblingen".split()
+
+class FakeSpeechToText:
+    """Ein Wort pro empfangenem Audio-Frame; final mit fester Konfidenz."""
+
+    def __init__(self, confidence: float = 0.87, latency_ms: float = 0.0):
+        self.confidence = confidence
+        self.delay = latency_ms / 1000.0
+        self.sessions = 0
+
+    async def transcribe(self, audio_data: bytes, content_type: str = "audio/wav"):
+        from app.speech_to_text import Transcript
+        await asyncio.sleep(self.delay)
+        n = max(1, min(len(WORDS), len(audio_data) // 1024))
+        return Transcript(transcript=" ".join(WORDS[:n]), confidence=self.confidence)
+
+    async def transcribe_audio(self, audio_data: bytes, content_type: str = "audio/wav") -> str:
+        return (await self.transcribe(audio_data, content_type)).transcript
+
+    async def recognize_stream(self, frames: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Dict]:
+        self.sessions += 1
+        heard: List[str] = []
+        async for _ in frames:
+            await asyncio.sleep(self.delay)
+            heard.append(WORDS[len(heard) % len(WORDS)])
+            yield {"type": "interim", "transcript": " ".join(heard), "confidence": None}
+        if heard:
+            yield {"type": "final", "transcript": " ".join(heard), "confidence": self.confidence}
+
+class FakeWatsonWebSocket:
+    """
+    Steht für SpeechToTextV1 bei recognize_using_websocket: blockiert wie das SDK
+    den aufrufenden Thread, liest die Frames aus der AudioSource-Queue und ruft
+    die RecognizeCallback-Methoden auf – ein Wort pro Frame als Zwischenergebnis.
+    """
+
+    def __init__(self, confidence: float = 0.87):
+        self.confidence = confidence
+        self.sessions = 0
+
+    def recognize_using_websocket(self, audio, content_type, recognize_callback, interim_results=False, **kwargs):
+        self.sessions += 1
+        recognize_callback.on_connected()
+        heard: List[str] = []
+        # wie RecognizeListener.send_audio: pollen, bis die Aufnahme beendet und die Queue leer ist
+        while audio.is_recording or not audio.input.empty():
+            try:
+                audio.input.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            heard.append(WORDS[len(heard) % len(WORDS)])
+            if interim_results:
+                alt = {"transcript": " ".join(heard) + " "}
+                recognize_callback.on_data({"results": [{"final": False, "alternatives": [alt]}]})
+        if heard:
+            alt = {"transcript": " ".join(heard) + " ", "confidence": self.confidence}
+            recognize_callback.on_data({"results": [{"final": True, "alternatives": [alt]}]})
+        recognize_callback.on_close()
+
+def sdk_speech_service(sdk: Optional[FakeWatsonWebSocket] = None):
+    """Echter SpeechToTextService ohne Credentials, nur der SDK-Client ist gefälscht."""
+    from app.speech_to_text import SpeechToTextService
+    service = SpeechToTextService.__new__(SpeechToTextService)
+    service.speech_to_text = sdk or FakeWatsonWebSocket()
+    return service
+
+def make_speech_app(
+    latency_ms: float = 0.0,
+    jitter: float = 0.0,
+    errors: Optional[Dict[int, float]] = None,
+    seed: Optional[int] = None,
+    audio_ms_per_char: float = 60.0,
+) -> FastAPI:
+    """Watson-kompatible HTTP-Endpunkte für Speech to Text und Text to Speech."""
+    app = FastAPI()
+    app.state.behaviour = b = Behaviour(latency_ms, jitter, errors, seed)
+
+    @app.post("/v1/recognize")
+    async def recognize(request: Request):
+        audio = await request.body()
+        await asyncio.sleep(b.delay())
+        if (err := b.error()) is not None:
+            return err
+        n = max(1, min(len(WORDS), len(audio) // 1024))
+        alt = {"transcript": " ".join(WORDS[:n]) + " ", "confidence": 0.87}
+        return {"result_index": 0, "results": [{"final": True, "alternatives": [alt]}]}
+
+    @app.post("/v1/synthesize")
+    async def synthesize(request: Request):
+        body = await request.json()
+        await asyncio.sleep(b.delay())
+        if (err := b.error()) is not None:
+            return err
+        # Stille in der Länge, die gesprochener Text etwa hätte (22,05 kHz, 16 bit mono)
+        samples = int(len(body.get("text", "")) * audio_ms_per_char / 1000 * 22050)
+        accept = request.headers.get("accept", "audio/wav")
+        from app.text_to_speech import wav_stream_header
+        pcm = b"\0" * (samples * 2)
+        audio = pcm if accept.startswith("audio/l16") else wav_stream_header() + pcm
+        return Response(audio, media_type=accept)
+
+    return app
+
+def _selftest() -> None:
+    from fastapi.testclient import TestClient
+    from app.speech_to_text import get_speech_to_text_service
+    import server
+
+    fake = FakeSpeechToText()
+    server.app.dependency_overrides[get_speech_to_text_service] = lambda: fake
+    client = TestClient(server.app)
+
+    r = client.post("/api/speech-to-text/binary", content=b"\0" * 4096, headers={"Content-Type": "audio/webm"})
+    print("binary:", r.status_code, r.json())
+
+    with client.websocket_connect("/api/speech-to-text/stream?content_type=audio/webm") as ws:
+        for _ in range(3):
+            ws.send_bytes(b"\0" * 1024)
+        ws.send_text("stop")
+        while (event := ws.receive_json())["type"] != "end":
+            print("stream:", event)
+
+    # echter Service (AudioSource, Callbacks, Thread-Pool), nur das SDK gefälscht
+    from app.config import settings
+    settings.stt_stream_max_sessions = 1
+    sdk = FakeWatsonWebSocket()
+    server.app.dependency_overrides[get_speech_to_text_service] = lambda: sdk_speech_service(sdk)
+    url = "/api/speech-to-text/stream?content_type=audio/webm"
+    with client.websocket_connect(url) as ws:
+        ws.send_bytes(b"\0" * 1024)
+        print("sdk stream:", ws.receive_json())
+        # Limit erreicht: zweite Sitzung wird abgelehnt
+        with client.websocket_connect(url) as extra:
+            print("sdk rejected:", extra.receive_json())
+        ws.send_bytes(b"\0" * 1024)
+        ws.send_text("stop")
+        while (event := ws.receive_json())["type"] != "end":
+            print("sdk stream:", event)
+    print("sdk sessions:", sdk.sessions)
+
+if __name__ == "__main__":
+    _selftest()
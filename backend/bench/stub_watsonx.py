@@ -0,0 +1,151 @@
+# bench/stub_watsonx.py
+"""
+Lokaler Stub für IBM IAM und die watsonx.ai Text-APIs (Embeddings, Generation).
+
+Wird von den Benchmarks in einem Hintergrund-Thread gestartet, damit ohne
+IBM Cloud gemessen werden kann. Latenz (Median + log-normale Streuung) und
+eingestreute Fehler sind über Behaviour konfigurierbar.
+"""
+import asyncio, hashlib, json, random, socket, threading, time
+from typing import Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBED_DIM = 768
+
+STREAM_TEXT = "Parken ist im Parkhaus P2 möglich. Den Ausweis bekommst du am Empfang. Quellen: stub.md#1"
+
+class Behaviour:
+    """Latenz- und Fehlerverteilung eines Stubs (auch von bench/stub_speech.py genutzt)."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter: float = 0.0, errors: Optional[Dict[int, float]] = None, seed: Optional[int] = None):
+        self.median = latency_ms / 1000.0
+        self.jitter = jitter                  # Sigma der Log-Normalverteilung, 0 = feste Latenz
+        self.errors = dict(errors or {})      # Status -> Wahrscheinlichkeit
+        self.rng = random.Random(seed)
+        self.injected = 0
+
+    def delay(self) -> float:
+        if self.jitter <= 0:
+            return self.median
+        return self.median * self.rng.lognormvariate(0.0, self.jitter)
+
+    def error(self) -> Optional[JSONResponse]:
+        r = self.rng.random()
+        for status, p in self.errors.items():
+            if r < p:
+                self.injected += 1
+                headers = {"Retry-After": "1"} if status == 429 else None
+                return JSONResponse({"errors": [{"code": "stub_error", "message": "injected"}]}, status_code=status, headers=headers)
+            r -= p
+        return None
+
+def parse_errors(spec: str) -> Dict[int, float]:
+    """'503:0.01,429:0.02' -> {503: 0.01, 429: 0.02}"""
+    out: Dict[int, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        status, _, p = part.partition(":")
+        out[int(status)] = float(p)
+    return out
+
+def make_app(
+    latency_ms: float = 0.0,
+    token_ms: float = 20.0,
+    token_ttl: int = 3600,
+    jitter: float = 0.0,
+    errors: Optional[Dict[int, float]] = None,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    app = FastAPI()
+    app.state.behaviour = b = Behaviour(latency_ms, jitter, errors, seed)
+    app.state.streams_started = 0
+    app.state.streams_cancelled = 0
+    app.state.token_requests = 0
+    app.state.token_failures = 0   # so viele der nächsten IAM-Calls mit 500 beantworten
+    token_delay = token_ms / 1000.0
+
+    def _vector(text: str):
+        h = hashlib.sha256(text.encode("utf-8")).digest()
+        return [((h[i % len(h)] / 255.0) - 0.5) for i in range(EMBED_DIM)]
+
+    @app.post("/identity/token")
+    async def token():
+        app.state.token_requests += 1
+        n = app.state.token_requests
+        await asyncio.sleep(b.delay())
+        if app.state.token_failures > 0:
+            app.state.token_failures -= 1
+            return JSONResponse({"errorMessage": "stub failure"}, status_code=500)
+        return {"access_token": f"stub-token-{n}", "expires_in": token_ttl}
+
+    @app.post("/ml/v1/text/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        await asyncio.sleep(b.delay())
+        if (err := b.error()) is not None:
+            return err
+        return {"results": [{"embedding": _vector(t)} for t in body["inputs"]]}
+
+    @app.post("/ml/v1/text/generation")
+    async def generation(request: Request):
+        await request.json()
+        # gleiche Gesamtdauer wie der Stream: Latenz + ein Intervall pro Token
+        await asyncio.sleep(b.delay() + token_delay * len(STREAM_TEXT.split(" ")))
+        if (err := b.error()) is not None:
+            return err
+        n = len(STREAM_TEXT.split(" "))
+        return {"results": [{"generated_text": STREAM_TEXT, "generated_token_count": n, "input_token_count": 42}]}
+
+    @app.post("/ml/v1/text/generation_stream")
+    async def generation_stream(request: Request):
+        await request.json()
+        if (err := b.error()) is not None:
+            return err
+        first_delay = b.delay()
+
+        async def events():
+            # ein SSE-Event pro "Token" (Wort), wie die watsonx Streaming-API
+            app.state.streams_started += 1
+            try:
+                await asyncio.sleep(first_delay)
+                for i, word in enumerate(STREAM_TEXT.split(" ")):
+                    text = word if i == 0 else " " + word
+                    data = {"results": [{"generated_text": text, "generated_token_count": i + 1}]}
+                    yield f"id: {i + 1}\nevent: message\ndata: {json.dumps(data)}\n\n"
+                    await asyncio.sleep(token_delay)
+            except asyncio.CancelledError:
+                app.state.streams_cancelled += 1
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class StubServer:
+    """Startet eine FastAPI-App per uvicorn in einem eigenen Thread."""
+
+    def __init__(self, app: FastAPI, port: Optional[int] = None):
+        self.port = port or _free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
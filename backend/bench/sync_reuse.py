@@ -0,0 +1,72 @@
+# bench/sync_reuse.py
+"""
+Prüft die Wiederverwendung von Embeddings beim inkrementellen Sync
+(ingest.sync.plan_chunks) mit dem echten Chunker, ohne Datenbank:
+
+1. unveränderte Datei: alle Chunks bleiben an Ort und Stelle
+2. neuer Absatz am Anfang: alle chunk_ids verschieben sich, eingebettet werden
+   aber nur Chunks mit neuem Text (der neue Absatz und der Chunk, dessen
+   Overlap-Präfix sich dadurch ändert) – der Rest übernimmt den Vektor per Hash
+3. Absatz in der Mitte geändert: nur die betroffenen Chunks
+
+Aufruf (aus backend/):  python -m bench.sync_reuse
+"""
+import os
+
+# ingest.sync liest beim Import die Settings; Werte werden hier nicht gebraucht
+for _name, _value in [("DATABASE_URL", "postgresql://localhost/unused"), ("WATSONX_API_KEY", "stub"),
+                      ("WATSONX_BASE_URL", "http://localhost"), ("EMBEDDINGS_MODEL_ID", "stub-embeddings"),
+                      ("LLM_MODEL_ID", "stub-llm")]:
+    os.environ.setdefault(_name, _value)
+
+import random
+from typing import Dict, List, Tuple
+from ingest.chunker import TARGET_TOKENS, split_into_spans, to_records
+from ingest.sync import plan_chunks
+from ingest.upsert import content_hash
+
+WORDS = "Mitarbeitende finden Parkplätze Kantine Badge Empfang Laptop Schulung Urlaub Antrag".split()
+
+def paragraph(rng: random.Random) -> str:
+    # etwa eine Chunk-Zielgröße, damit jeder Absatz einen eigenen Chunk ergibt
+    words = [rng.choice(WORDS) for _ in range(TARGET_TOKENS * 4 // 10)]
+    return " ".join(words) + "."
+
+def chunk(text: str) -> Tuple[List[Dict], List[str]]:
+    records = to_records("handbuch.md", split_into_spans(text), {"audience": "boeblingen"})
+    return records, [content_hash(r["content"]) for r in records]
+
+def sync_round(old_text: str, new_text: str) -> Tuple[int, int, int]:
+    old, old_hashes = chunk(old_text)
+    manifest = {(r["doc_id"], r["chunk_id"]): h for r, h in zip(old, old_hashes)}
+    known = {h: [float(i)] for i, h in enumerate(old_hashes)}  # stellvertretend für die gespeicherten Vektoren
+    new, new_hashes = chunk(new_text)
+    in_place, copied, to_embed = plan_chunks(new, new_hashes, manifest, known)
+    assert len(in_place) + len(copied) + len(to_embed) == len(new)
+    # übernommene Vektoren gehören zu genau diesem Text
+    for r, v in copied:
+        assert old_hashes[int(v[0])] == content_hash(r["content"])
+    return len(in_place), len(copied), len(to_embed)
+
+def main() -> None:
+    rng = random.Random(7)
+    paras = [paragraph(rng) for _ in range(12)]
+    base = "\n\n".join(paras)
+
+    result = sync_round(base, base)
+    print(f"unverändert:        in_place={result[0]} copied={result[1]} embed={result[2]}")
+    assert result[1] == result[2] == 0
+
+    shifted = "\n\n".join([paragraph(rng)] + paras)
+    result = sync_round(base, shifted)
+    print(f"Absatz vorne neu:   in_place={result[0]} copied={result[1]} embed={result[2]}")
+    assert result[2] <= 2 and result[1] >= len(paras) - 2, result
+
+    edited = paras[:6] + [paragraph(rng)] + paras[7:]
+    result = sync_round(base, "\n\n".join(edited))
+    print(f"Absatz mitte neu:   in_place={result[0]} copied={result[1]} embed={result[2]}")
+    assert result[2] <= 2, result
+    print("ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# bench/upsert.py
+"""
+Vergleicht den alten Schreibpfad (ein INSERT pro Chunk) mit bulk_upsert
+(binäres COPY + Merge). Schreibt in eine eigene Tabelle `bench_documents`.
+
+Aufruf (aus backend/, DATABASE_URL muss gesetzt sein):
+    python -m bench.upsert [--rows 5000] [--dim 768]
+"""
+import argparse, asyncio, json, random, time, uuid
+from pgvector import Vector
+from app.db import connection, close_pool
+from ingest.upsert import bulk_upsert
+
+TABLE = "bench_documents"
+
+def _records(n: int, dim: int):
+    rng = random.Random(42)
+    records, vectors = [], []
+    for i in range(n):
+        records.append({
+            "doc_id": f"doc_{i // 20}.md",
+            "chunk_id": i % 20 + 1,
+            "content": f"Synthetischer Chunk {i} " + "lorem ipsum " * 100,
+            "metadata": {"filename": f"doc_{i // 20}.md", "audience": "boeblingen"},
+        })
+        vectors.append([rng.random() for _ in range(dim)])
+    return records, vectors
+
+async def _reset(dim: int):
+    async with connection() as conn:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.execute(
+            f"""
+            CREATE TABLE {TABLE} (
+                id uuid PRIMARY KEY, doc_id text NOT NULL, chunk_id int NOT NULL,
+                content text NOT NULL, metadata jsonb, embedding vector({dim})
+            )
+            """
+        )
+
+async def _loop_insert(records, vectors):
+    async with connection() as conn, conn.cursor() as cur:
+        for rec, emb in zip(records, vectors):
+            await cur.execute(
+                f"""
+                INSERT INTO {TABLE} (id, doc_id, chunk_id, content, metadata, embedding)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (id) DO UPDATE SET
+                  content=EXCLUDED.content, metadata=EXCLUDED.metadata, embedding=EXCLUDED.embedding
+                """,
+                (str(uuid.uuid4()), rec["doc_id"], rec["chunk_id"], rec["content"],
+                 json.dumps(rec["metadata"]), Vector(emb)),
+            )
+
+async def _bulk(records, vectors):
+    async with connection() as conn:
+        await bulk_upsert(conn, records, vectors, table=TABLE)
+
+async def _count() -> int:
+    async with connection() as conn:
+        cur = await conn.execute(f"SELECT count(*) AS n FROM {TABLE}")
+        return (await cur.fetchone())["n"]
+
+async def _run(rows: int, dim: int):
+    records, vectors = _records(rows, dim)
+    try:
+        await _reset(dim)
+        t0 = time.perf_counter()
+        await _loop_insert(records, vectors)
+        loop_s = time.perf_counter() - t0
+        await _loop_insert(records, vectors)
+        loop_rows = await _count()
+
+        await _reset(dim)
+        t0 = time.perf_counter()
+        await _bulk(records, vectors)
+        bulk_s = time.perf_counter() - t0
+        await _bulk(records, vectors)
+        bulk_rows = await _count()
+
+        print(f"INSERT-Schleife : {rows / loop_s:9.0f} rows/s  ({loop_s:.2f}s)  nach 2x Ingest: {loop_rows} Zeilen")
+        print(f"COPY + Merge    : {rows / bulk_s:9.0f} rows/s  ({bulk_s:.2f}s)  nach 2x Ingest: {bulk_rows} Zeilen")
+        print(f"Speedup         : {loop_s / bulk_s:.1f}x")
+    finally:
+        async with connection() as conn:
+            await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await close_pool()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--dim", type=int, default=768)
+    args = ap.parse_args()
+    asyncio.run(_run(args.rows, args.dim))
+
+if __name__ == "__main__":
+    main()
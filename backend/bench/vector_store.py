@@ -0,0 +1,68 @@
+# bench/vector_store.py
+"""
+Prüft den mmap-Vector-Store (app.vector_store) ohne Datenbank:
+
+1. leerer Korpus: der Export schreibt einen gültigen, leeren Snapshot und
+   search() liefert [] statt eines Fehlers
+2. ohne Snapshot liefert search() []
+3. gefüllter Korpus: Top-k inkl. Standortfilter; Text und Metadaten kommen
+   (hier gestubbt) per Chunk-ID aus der Datenbank, nicht aus dem Export
+
+Aufruf (aus backend/):  python -m bench.vector_store
+"""
+import asyncio, os, tempfile
+from pathlib import Path
+
+def _env() -> None:
+    os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+    os.environ.setdefault("WATSONX_API_KEY", "stub")
+    os.environ.setdefault("WATSONX_BASE_URL", "http://localhost")
+    os.environ.setdefault("EMBEDDINGS_MODEL_ID", "stub-embeddings")
+    os.environ.setdefault("LLM_MODEL_ID", "stub-llm")
+
+async def run(root: Path) -> None:
+    from app import vector_store as vs
+
+    store = vs.MmapVectorStore(str(root))
+
+    async def no_refresh():
+        pass
+
+    store.refresh = no_refresh
+    assert await store.search([1.0, 0.0], k=3) == []
+    print("ohne Snapshot:   []")
+
+    vs.write_export(root / "empty", [], [], [], store.dtype)
+    store._snapshot = vs._Snapshot(root / "empty")
+    assert len(store._snapshot) == 0
+    assert await store.search([1.0, 0.0], k=3) == []
+    print("leerer Korpus:   []")
+
+    ids = ["a", "b", "c"]
+    vs.write_export(root / "full", ids, ["boeblingen", None, "ehningen"],
+                    [[1.0, 0.0], [0.8, 0.6], [0.9, 0.1]], store.dtype)
+    store._snapshot = vs._Snapshot(root / "full")
+    fetched = []
+
+    async def fetch_rows(chunk_ids):
+        fetched.append(list(chunk_ids))
+        return {i: {"id": i, "content": f"Text {i}"} for i in chunk_ids if i != "c"}
+
+    vs.fetch_rows = fetch_rows
+    hits = await store.search([1.0, 0.0], k=2, location="boeblingen", with_embeddings=True)
+    assert [h["id"] for h in hits] == ["a", "b"], hits
+    assert fetched == [["a", "b"]], fetched
+    assert hits[0]["embedding"].shape == (2,)
+    # seit dem Export gelöschte Chunks werden übersprungen
+    hits = await store.search([1.0, 0.0], k=3)
+    assert [h["id"] for h in hits] == ["a", "b"], hits
+    print("gefüllter Korpus: Top-k und Standortfilter ok")
+    print("ok")
+
+def main() -> None:
+    _env()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+if __name__ == "__main__":
+    main()
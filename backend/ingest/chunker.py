@@ -1,5 +1,17 @@
 # ingest/chunker.py
-from typing import List, Dict
+"""
+Chunking in einem linearen Durchlauf.
+
+Absätze → (bei Übergröße) Sätze → (bei Überschreiten des Hardcaps) harte
+Zeichen-Splits; Blöcke werden bis TARGET_TOKENS gesammelt, jeder neue Chunk
+beginnt mit den letzten OVERLAP_TOKENS Wörtern des vorigen.
+
+Jeder Chunk kennt seinen Zeichenbereich [start, end) im Eingabetext (nach der
+Whitespace-Normalisierung der Loader); to_records legt ihn als
+metadata.char_start/char_end ab – für das Hervorheben zitierter Stellen.
+"""
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 import re
 
 # grobe Token-Schätzung: 1 Token ~ 4 Zeichen (konservativ)
@@ -10,85 +22,142 @@ MAX_TOKENS = 500          # Hard-Cap für Embedding-Modelle mit Limit 512
 TARGET_TOKENS = 350       # Zielgröße
 OVERLAP_TOKENS = 60       # Kontext-Overlap
 
-def _split_sentences(text: str) -> List[str]:
-    # einfache Satztrennung
-    return re.split(r"(?<=[.!?])\s+", text)
+_PARA_SEP = re.compile(r"\n{2,}")
+_SENTENCE_SEP = re.compile(r"(?<=[.!?])\s+")
+
+class Chunk(NamedTuple):
+    text: str
+    start: int
+    end: int
+
+class _Unit(NamedTuple):
+    # Baustein im Puffer: Text, Quellbereich und Anker (Position im Text → Position in der Quelle)
+    text: str
+    start: int
+    end: int
+    anchors: Tuple[Tuple[int, int], ...]
+
+def _tokens(n_chars: int) -> int:
+    # wie approx_tokens_by_chars, aber ohne den Text erst auszuschneiden
+    return max(1, int(n_chars / 4))
 
-def _split_hard(s: str, max_tokens: int) -> List[str]:
-    # Falls ein einzelner Satz/Block zu lang ist: nach Zeichen hart splitten
+def _paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    spans, pos = [], 0
+    for m in [*_PARA_SEP.finditer(text), None]:
+        s, e = pos, (m.start() if m else len(text))
+        seg = text[s:e]
+        stripped = seg.strip()
+        if stripped:
+            lead = len(seg) - len(seg.lstrip())
+            spans.append((s + lead, s + lead + len(stripped)))
+        if m:
+            pos = m.end()
+    return spans
+
+def _sentence_spans(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    spans, pos = [], start
+    for m in _SENTENCE_SEP.finditer(text, start, end):
+        spans.append((pos, m.start()))
+        pos = m.end()
+    spans.append((pos, end))
+    return spans
+
+def _hard_spans(start: int, end: int, max_tokens: int) -> List[Tuple[int, int]]:
     max_chars = max_tokens * 4
-    out, i, n = [], 0, len(s)
-    while i < n:
-        out.append(s[i:i+max_chars])
-        i += max_chars
-    return out
+    return [(i, min(i + max_chars, end)) for i in range(start, end, max_chars)]
 
-def split_into_chunks(text: str, target_tokens: int = TARGET_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> List[str]:
-    # große Blöcke zuerst nach Absätzen, dann nach Sätzen, dann hart
-    paras = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
-    chunks: List[str] = []
-    buf: List[str] = []
-    buf_tokens = 0
-
-    for para in paras:
-        blocks = [para]
-        if approx_tokens_by_chars(para) > target_tokens:
-            # in Sätze splitten
-            blocks = _split_sentences(para)
-
-        for block in blocks:
-            # falls Block selbst über dem Hardcap liegt -> hart schneiden
-            if approx_tokens_by_chars(block) > MAX_TOKENS:
-                for piece in _split_hard(block, MAX_TOKENS - 10):
-                    # Stücke einzeln einspeisen
-                    if approx_tokens_by_chars(piece) > target_tokens:
-                        # falls immer noch groß: direkt als Chunk wegschreiben
-                        chunks.append(piece)
-                        continue
-                    # sonst normal in den Buffer
-                    tok = approx_tokens_by_chars(piece)
-                    if buf_tokens + tok > target_tokens and buf:
-                        chunks.append(" ".join(buf))
-                        # Overlap
-                        if overlap_tokens > 0:
-                            words = " ".join(buf).split()
-                            ov_words = " ".join(words[-overlap_tokens:]) if len(words) > overlap_tokens else " ".join(words)
-                            buf = [ov_words] if ov_words else []
-                            buf_tokens = approx_tokens_by_chars(" ".join(buf)) if buf else 0
+class _Chunker:
+    def __init__(self, text: str, target_tokens: int, overlap_tokens: int):
+        self.text = text
+        self.target = target_tokens
+        self.overlap = overlap_tokens
+        self.out: List[Chunk] = []
+        self.buf: List[_Unit] = []
+        self.buf_tokens = 0
+
+    def slice_unit(self, s: int, e: int) -> _Unit:
+        return _Unit(self.text[s:e], s, e, ((0, s),))
+
+    def emit(self, units: Sequence[_Unit]) -> Tuple[str, List[Tuple[int, int]]]:
+        anchors, pos = [], 0
+        for u in units:
+            anchors.extend((pos + cp, sp) for cp, sp in u.anchors)
+            pos += len(u.text) + 1
+        content = " ".join(u.text for u in units)
+        start, end = units[0].start, units[-1].end
+        # Endkontrolle: kein Chunk über MAX_TOKENS
+        if approx_tokens_by_chars(content) <= MAX_TOKENS:
+            self.out.append(Chunk(content, start, end))
+            return content, anchors
+        max_chars = (MAX_TOKENS - 10) * 4
+        for i in range(0, len(content), max_chars):
+            j = min(i + max_chars, len(content))
+            src_i = _to_source(anchors, i)
+            src_j = _to_source(anchors, j - 1) + 1
+            self.out.append(Chunk(content[i:j], max(start, src_i), min(end, max(src_j, src_i + 1))))
+        return content, anchors
+
+    def overlap_unit(self, content: str, anchors: List[Tuple[int, int]], end: int) -> Optional[_Unit]:
+        # letzte overlap_tokens Wörter des gerade geschriebenen Chunks (split in C statt Wort-Schleife)
+        parts = content.rsplit(None, self.overlap)
+        prefix_len = 0
+        if len(parts) > self.overlap:
+            prefix_len, parts = len(parts[0]), parts[1:]
+        if not parts:
+            return None
+        rest = content[prefix_len:]
+        pos = prefix_len + len(rest) - len(rest.lstrip())
+        tail = [(cp - pos, sp) for cp, sp in anchors if cp > pos]
+        ov_anchors = ((0, _to_source(anchors, pos)), *tail)
+        return _Unit(" ".join(parts), ov_anchors[0][1], end, ov_anchors)
+
+    def add(self, unit: _Unit) -> None:
+        tok = _tokens(len(unit.text))
+        if self.buf_tokens + tok > self.target and self.buf:
+            end = self.buf[-1].end
+            content, anchors = self.emit(self.buf)
+            ov = self.overlap_unit(content, anchors, end) if self.overlap > 0 else None
+            self.buf = [ov] if ov else []
+            self.buf_tokens = _tokens(len(ov.text)) if ov else 0
+        self.buf.append(unit)
+        self.buf_tokens += tok
+
+    def run(self) -> List[Chunk]:
+        # große Blöcke zuerst nach Absätzen, dann nach Sätzen, dann hart
+        for ps, pe in _paragraph_spans(self.text):
+            blocks = [(ps, pe)]
+            if _tokens(pe - ps) > self.target:
+                blocks = _sentence_spans(self.text, ps, pe)
+            for bs, be in blocks:
+                if _tokens(be - bs) > MAX_TOKENS:
+                    for s, e in _hard_spans(bs, be, MAX_TOKENS - 10):
+                        if _tokens(e - s) > self.target:
+                            # immer noch groß: direkt als Chunk (vor dem Pufferinhalt)
+                            self.emit([self.slice_unit(s, e)])
                         else:
-                            buf, buf_tokens = [], 0
-                    buf.append(piece)
-                    buf_tokens += tok
-                continue
-
-            tok = approx_tokens_by_chars(block)
-            if buf_tokens + tok > target_tokens and buf:
-                chunks.append(" ".join(buf))
-                # Overlap
-                if overlap_tokens > 0:
-                    words = " ".join(buf).split()
-                    ov_words = " ".join(words[-overlap_tokens:]) if len(words) > overlap_tokens else " ".join(words)
-                    buf = [ov_words] if ov_words else []
-                    buf_tokens = approx_tokens_by_chars(" ".join(buf)) if buf else 0
-                else:
-                    buf, buf_tokens = [], 0
-            buf.append(block)
-            buf_tokens += tok
-
-    if buf:
-        chunks.append(" ".join(buf))
-
-    # Endkontrolle: kein Chunk über MAX_TOKENS
-    fixed: List[str] = []
-    for c in chunks:
-        if approx_tokens_by_chars(c) <= MAX_TOKENS:
-            fixed.append(c)
+                            self.add(self.slice_unit(s, e))
+                    continue
+                self.add(self.slice_unit(bs, be))
+        if self.buf:
+            self.emit(self.buf)
+        return self.out
+
+def _to_source(anchors: Sequence[Tuple[int, int]], p: int) -> int:
+    cp, sp = anchors[max(bisect_right(anchors, (p, float("inf"))) - 1, 0)]
+    return sp + (p - cp)
+
+def split_into_spans(text: str, target_tokens: int = TARGET_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> List[Chunk]:
+    return _Chunker(text, target_tokens, overlap_tokens).run()
+
+def split_into_chunks(text: str, target_tokens: int = TARGET_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> List[str]:
+    return [c.text for c in split_into_spans(text, target_tokens, overlap_tokens)]
+
+def to_records(doc_id: str, chunks: Sequence[Union[str, Chunk]], base_meta: Dict) -> List[Dict]:
+    records = []
+    for i, c in enumerate(chunks):
+        if isinstance(c, Chunk):
+            meta = {**base_meta, "char_start": c.start, "char_end": c.end}
+            records.append({"doc_id": doc_id, "chunk_id": i + 1, "content": c.text, "metadata": meta})
         else:
-            fixed.extend(_split_hard(c, MAX_TOKENS - 10))
-    return fixed
-
-def to_records(doc_id: str, chunks: List[str], base_meta: Dict) -> List[Dict]:
-    return [
-        {"doc_id": doc_id, "chunk_id": i + 1, "content": c, "metadata": base_meta}
-        for i, c in enumerate(chunks)
-    ]
+            records.append({"doc_id": doc_id, "chunk_id": i + 1, "content": c, "metadata": base_meta})
+    return records
@@ -1,12 +1,14 @@
 # ingest/ingest.py
-import asyncio, uuid, json, os
+import asyncio
 from pathlib import Path
 from typing import List
-from pgvector import Vector                      # ← NEU
-from app.db import get_conn                      # ← statt direkte psycopg.connect
-from .loaders import load_documents
-from .chunker import split_into_chunks, to_records
-from app.embeddings import WatsonxAIEmbeddings
+from app.db import close_pool
+from .pipeline import IngestPipeline
+from .scheduler import EmbeddingScheduler
+from app.answer_cache import invalidate_docs
+from app.vector_store import bump_corpus_version
+from app.db_schema import ensure_schema
+from app import http_client
 MAX_TOKENS = 500
 
 def approx_tokens(s: str) -> int:
@@ -15,73 +17,61 @@ def approx_tokens(s: str) -> int:
 def hard_trim_to_tokens(s: str, max_tokens: int) -> str:
     max_chars = max_tokens * 4
     return s[:max_chars]
-async def embed_and_upsert(records: List[dict]):
-    if not records:
-        return
-    provider = WatsonxAIEmbeddings()
 
+def embedding_texts(records: List[dict]) -> List[str]:
     texts = []
     for r in records:
         txt = r["content"]
         if approx_tokens(txt) > MAX_TOKENS:
             txt = hard_trim_to_tokens(txt, MAX_TOKENS - 10)
         texts.append(txt)
+    return texts
 
-    vectors = await provider.embed(texts)
+async def embed_records(records: List[dict]) -> List[List[float]]:
+    scheduler = EmbeddingScheduler()
+    vectors = await scheduler.embed(embedding_texts(records))
+    print(scheduler.report())
+    return vectors
 
-    with get_conn() as conn, conn.cursor() as cur:   # ← nutzt register_vector()
-        for rec, emb in zip(records, vectors):
-            cur.execute(
-                """
-                INSERT INTO documents (id, doc_id, chunk_id, content, metadata, embedding)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET
-                  content=EXCLUDED.content,
-                  metadata=EXCLUDED.metadata,
-                  embedding=EXCLUDED.embedding
-                """,
-                (
-                    str(uuid.uuid4()),
-                    rec["doc_id"],
-                    rec["chunk_id"],
-                    rec["content"],
-                    json.dumps(rec["metadata"]),
-                    Vector(emb),                  # ← WICHTIG: als pgvector.Vector
-                ),
-            )
+async def corpus_changed(conn, doc_ids: List[str]) -> None:
+    """In derselben Transaktion wie der Schreibvorgang: Caches invalidieren, Corpus-Version erhöhen."""
+    await invalidate_docs(conn, doc_ids)
+    await bump_corpus_version(conn)
 
 async def main(input_dir: str):
-    print("CWD:", Path.cwd())
-    print("Input dir:", input_dir)
-    print("Resolved root:", Path(input_dir).resolve())
-    print("Files found:", len(list(Path(input_dir).resolve().rglob('*.*'))))
-
     root = Path(input_dir).resolve()
-    paths = list(root.rglob("*.*"))
-    docs = list(load_documents(paths))
     print(f"CWD: {Path.cwd()}")
     print(f"Scanning: {root}")
-    print(f"Loaded {len(docs)} docs")
-
-    batch: List[dict] = []
-    for d in docs:
-        chunks = split_into_chunks(d["text"])
-        batch.extend(to_records(d["doc_id"], chunks, d["metadata"]))
 
-    print(f"Prepared {len(batch)} chunks")
-    if not batch:                                  # ← NEU: Guard
-        print("No chunks to ingest. Abort.")
+    await ensure_schema()
+    # Parsen (Prozess-Pool), Embedding und Upsert laufen überlappend als Pipeline
+    pipeline = IngestPipeline()
+    written = await pipeline.run((p for p in root.rglob("*.*") if p.is_file()), root)
+    print(pipeline.report())
+    if not written:
+        print("No chunks to ingest.")
         return
-
-    # optional batching hier – bei wenigen Chunks nicht nötig
-    await embed_and_upsert(batch)
     print("Ingestion complete.")
 
 
 # ingest/ingest.py (ganz unten ergänzen)
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python -m ingest.ingest <input_dir>")
-        raise SystemExit(2)
-    asyncio.run(main(sys.argv[1]))
+    import argparse
+    ap = argparse.ArgumentParser(prog="python -m ingest.ingest")
+    ap.add_argument("input_dir")
+    ap.add_argument("--sync", action="store_true",
+                    help="inkrementell: nur geänderte Chunks einbetten, verwaiste Chunks löschen")
+    args = ap.parse_args()
+
+    async def _run():
+        from .sync import sync
+        try:
+            if args.sync:
+                await sync(Path(args.input_dir).resolve())
+            else:
+                await main(args.input_dir)
+        finally:
+            await close_pool()
+            await http_client.shutdown()
+
+    asyncio.run(_run())
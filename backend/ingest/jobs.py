@@ -0,0 +1,247 @@
+# ingest/jobs.py
+"""
+Jobqueue für /api/ingest-uploaded-file.
+
+Der Request legt nur einen Job an und bekommt sofort dessen ID zurück; eine
+begrenzte Zahl Worker pro Server-Prozess arbeitet die Jobs ab (gemeinsamer DB-
+und HTTP-Pool, kein Interpreter-Start pro Upload). Was beim Start eines Workers
+bereits wartet, wird zu einem Durchlauf zusammengefasst: ein Embedding-Lauf und
+ein Upsert für alle Dateien.
+
+Der Jobstatus liegt in der Tabelle `ingest_jobs` (app/db_schema.py), nicht im
+Speicher eines Prozesses: /api/jobs/{id} antwortet bei mehreren uvicorn-Workern
+von jedem Worker, und Worker holen sich Jobs per `FOR UPDATE SKIP LOCKED`.
+Nach einem Neustart werden wartende Jobs weiter abgearbeitet; Jobs, die bei
+einem Absturz „running“ blieben, werden nach INGEST_JOB_STALE_AFTER erneut
+übernommen.
+"""
+import asyncio, time, uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import settings
+from app.db import connection
+from .loaders import load_documents
+from .chunker import split_into_spans, to_records
+
+@dataclass
+class Job:
+    filename: str
+    path: Path
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"          # queued | running | done | failed
+    stage: Optional[str] = None     # parsing | embedding | upserting
+    chunks: int = 0
+    batch_size: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "chunks": self.chunks,
+            "batch_size": self.batch_size,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "Job":
+        return cls(
+            filename=row["filename"], path=Path(row["path"]), id=row["id"], status=row["status"],
+            stage=row["stage"], chunks=row["chunks"], batch_size=row["batch_size"], error=row["error"],
+            created_at=row["created_at"], started_at=row["started_at"], finished_at=row["finished_at"],
+        )
+
+def _parse(job: Job) -> List[dict]:
+    docs = list(load_documents([job.path]))
+    if not docs:
+        raise ValueError(f"Dateityp nicht unterstützt: {job.path.suffix}")
+    records = []
+    for d in docs:
+        # Uploads gehören zu keinem Standort-Ordner → audience NULL, für alle Standorte sichtbar
+        meta = {**d["metadata"], "audience": None, "source": "upload"}
+        # eigener Namensraum, damit ein Upload nie ein gleichnamiges Korpus-Dokument ersetzt
+        records.extend(to_records(f"upload/{d['doc_id']}", split_into_spans(d["text"]), meta))
+    return records
+
+class IngestQueue:
+    def __init__(self, workers: Optional[int] = None, max_batch: Optional[int] = None):
+        self.workers = workers or settings.ingest_job_workers
+        self.max_batch = max_batch or settings.ingest_job_max_batch
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.batches = 0
+        self.finished: Dict[str, int] = {}
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, filename: str, path: Path) -> Job:
+        job = Job(filename=filename, path=path)
+        async with connection() as conn:
+            await conn.execute(
+                """
+                INSERT INTO ingest_jobs (id, filename, path, status, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (job.id, job.filename, str(job.path), job.status, job.created_at, job.created_at),
+            )
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        async with connection() as conn:
+            cur = await conn.execute("SELECT * FROM ingest_jobs WHERE id = %s", (job_id,))
+            row = await cur.fetchone()
+        return Job.from_row(row) if row else None
+
+    async def _claim(self) -> List[Job]:
+        """Übernimmt bis zu max_batch wartende (oder verwaiste) Jobs, älteste zuerst."""
+        now = time.time()
+        async with connection() as conn:
+            cur = await conn.execute(
+                """
+                UPDATE ingest_jobs
+                SET status = 'running', stage = 'parsing', error = NULL, started_at = %s, updated_at = %s
+                WHERE id IN (
+                    SELECT id FROM ingest_jobs
+                    WHERE status = 'queued' OR (status = 'running' AND updated_at < %s)
+                    ORDER BY created_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+                """,
+                (now, now, now - settings.ingest_job_stale_after, self.max_batch),
+            )
+            rows = await cur.fetchall()
+        return sorted((Job.from_row(r) for r in rows), key=lambda j: j.created_at)
+
+    async def _save(self, jobs: List[Job]) -> None:
+        now = time.time()
+        async with connection() as conn, conn.cursor() as cur:
+            await cur.executemany(
+                """
+                UPDATE ingest_jobs
+                SET status = %s, stage = %s, chunks = %s, batch_size = %s, error = %s,
+                    finished_at = %s, updated_at = %s
+                WHERE id = %s
+                """,
+                [(j.status, j.stage, j.chunks, j.batch_size, j.error, j.finished_at, now, j.id) for j in jobs],
+            )
+
+    async def _forget_old(self) -> None:
+        # nur abgeschlossene Jobs verwerfen, älteste zuerst
+        async with connection() as conn:
+            await conn.execute(
+                """
+                DELETE FROM ingest_jobs WHERE id IN (
+                    SELECT id FROM ingest_jobs WHERE finished_at IS NOT NULL
+                    ORDER BY finished_at DESC OFFSET %s
+                )
+                """,
+                (settings.ingest_job_history,),
+            )
+
+    async def _worker(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                batch = await self._claim()
+            except Exception as e:
+                print(f"Warnung: Ingest-Jobs konnten nicht abgerufen werden: {e}")
+                batch = []
+            if not batch:
+                # neue Jobs dieses Prozesses wecken sofort, die anderer Prozesse beim nächsten Poll
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.ingest_job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(batch)
+            except Exception as e:
+                for job in batch:
+                    if job.status == "running":
+                        job.status, job.error = "failed", str(e)
+            finally:
+                now = time.time()
+                for job in batch:
+                    job.finished_at = job.finished_at or now
+                    self.finished[job.status] = self.finished.get(job.status, 0) + 1
+                try:
+                    await self._save(batch)
+                    await self._forget_old()
+                except Exception as e:
+                    print(f"Warnung: Status der Ingest-Jobs konnte nicht gespeichert werden: {e}")
+
+    async def _run(self, batch: List[Job]) -> None:
+        from .ingest import embed_records, corpus_changed
+        from .upsert import bulk_upsert, doc_ids_of
+
+        self.batches += 1
+        for job in batch:
+            job.batch_size = len(batch)
+        await self._save(batch)
+
+        # dieselbe Datei mehrfach in der Queue → nur die letzte Version einlesen
+        latest: Dict[str, Job] = {job.filename: job for job in batch}
+        records: List[dict] = []
+        for job in batch:
+            if latest[job.filename] is not job:
+                continue
+            try:
+                job_records = await asyncio.to_thread(_parse, job)
+            except Exception as e:
+                job.status, job.error, job.finished_at = "failed", str(e), time.time()
+                continue
+            job.chunks = len(job_records)
+            records.extend(job_records)
+
+        active = [j for j in batch if j.status == "running"]
+        if records:
+            for job in active:
+                job.stage = "embedding"
+            await self._save(batch)
+            vectors = await embed_records(records)
+            for job in active:
+                job.stage = "upserting"
+            await self._save(active)
+            async with connection() as conn:
+                await bulk_upsert(conn, records, vectors)
+                await corpus_changed(conn, doc_ids_of(records))
+
+        for job in active:
+            src = latest[job.filename]
+            job.stage = None
+            if src.status == "failed":
+                job.status, job.error = "failed", src.error
+            else:
+                job.status, job.chunks = "done", src.chunks
+
+    def stats(self) -> Dict:
+        # nur dieser Prozess; der Gesamtstand steht in ingest_jobs
+        return {"workers": len(self._tasks), "batches": self.batches, **self.finished}
+
+_queue: Optional[IngestQueue] = None
+
+def get_ingest_queue() -> IngestQueue:
+    global _queue
+    if _queue is None:
+        _queue = IngestQueue()
+    return _queue
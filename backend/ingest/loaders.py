@@ -1,6 +1,7 @@
 from pathlib import Path
-from typing import Iterable, Dict
+from typing import Iterable, Dict, Optional
 import re
+from app.locations import normalize_location
 
 def read_markdown(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
@@ -23,7 +24,20 @@ LOADERS = {
     ".docx": read_docx,
 }
 
-def load_documents(paths: Iterable[Path]) -> Iterable[Dict]:
+def doc_id_for(path: Path, root: Optional[Path] = None) -> str:
+    """
+    Pfad relativ zum Ingest-Root, z.B. 'boeblingen/parken.md' – gleichnamige
+    Dateien in verschiedenen Standort-Ordnern bleiben getrennte Dokumente.
+    Ohne root (oder außerhalb davon) nur der Dateiname.
+    """
+    if root is not None:
+        try:
+            return path.relative_to(root).as_posix()
+        except ValueError:
+            pass
+    return path.name
+
+def load_documents(paths: Iterable[Path], root: Optional[Path] = None) -> Iterable[Dict]:
     """
     Liest unterstützte Dateien ein und liefert Dicts mit doc_id, text, metadata.
     """
@@ -32,9 +46,9 @@ def load_documents(paths: Iterable[Path]) -> Iterable[Dict]:
         if ext in LOADERS:
             text = LOADERS[ext](p)
             text = re.sub(r"[ \t]+", " ", text).strip()
-            aud = p.parent.name.lower()
+            aud = normalize_location(p.parent.name) or ""
             yield {
-                "doc_id": p.name,
+                "doc_id": doc_id_for(p, root),
                 "text": text,
                 "metadata": {
                     "filename": p.name,
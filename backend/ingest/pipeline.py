@@ -0,0 +1,168 @@
+# ingest/pipeline.py
+"""
+Gestaffelte Ingest-Pipeline: Parsen → Chunking → Embedding → Upsert.
+
+  parse/chunk   ProcessPoolExecutor, max. 2×Worker Dateien gleichzeitig in Arbeit
+      │  Queue (begrenzt)
+  batch         ganze Dokumente zu Batches von ~INGEST_PIPELINE_BATCH_CHUNKS Chunks
+      │  Queue (begrenzt)
+  embed         EmbeddingScheduler (Batching, Parallelität, Rate-Limit)
+      │  Queue (begrenzt)
+  upsert        bulk_upsert + corpus_changed, eine Transaktion pro Batch
+
+Die begrenzten Queues halten den Speicher unabhängig von der Korpusgröße flach;
+das Embedding des einen Batches überlappt mit dem Parsen der nächsten Dateien.
+Ein Dokument wird nie auf zwei Batches verteilt – bulk_upsert löscht Chunks
+derselben doc_id, die im Batch fehlen. Die doc_id ist der Pfad relativ zum
+Ingest-Root, gleichnamige Dateien anderer Ordner in anderen Batches bleiben
+dadurch unberührt.
+"""
+import asyncio, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from .loaders import LOADERS, load_documents
+from .chunker import split_into_spans, to_records
+
+_DONE = object()
+
+class StageStats:
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.units = 0
+        self.busy = 0.0
+
+    def add(self, items: int, units: int, seconds: float) -> None:
+        self.items += items
+        self.units += units
+        self.busy += seconds
+
+    def report(self) -> str:
+        rate = self.units / self.busy if self.busy else 0.0
+        return f"{self.name:<7}{self.units:>8} {self.unit:<7}{self.busy:8.2f}s busy {rate:10.1f} {self.unit}/s"
+
+def load_and_chunk(path: str, root: Optional[str] = None) -> Tuple[List[dict], float, float]:
+    """Läuft im Worker-Prozess. Liefert (Records, Parse-Sekunden, Chunk-Sekunden)."""
+    t0 = time.perf_counter()
+    docs = list(load_documents([Path(path)], Path(root) if root else None))
+    t1 = time.perf_counter()
+    records: List[dict] = []
+    for d in docs:
+        records.extend(to_records(d["doc_id"], split_into_spans(d["text"]), d["metadata"]))
+    return records, t1 - t0, time.perf_counter() - t1
+
+class IngestPipeline:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        batch_chunks: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.workers = workers or settings.ingest_pipeline_workers
+        self.batch_chunks = batch_chunks or settings.ingest_pipeline_batch_chunks
+        self.queue_size = queue_size or settings.ingest_pipeline_queue_size
+        self.stats: Dict[str, StageStats] = {
+            "parse": StageStats("parse", "files"),
+            "chunk": StageStats("chunk", "chunks"),
+            "embed": StageStats("embed", "chunks"),
+            "upsert": StageStats("upsert", "chunks"),
+        }
+        self.written = 0
+
+    async def run(self, paths: Iterable[Path], root: Optional[Path] = None) -> int:
+        """
+        Verarbeitet alle Dateien, liefert die Zahl geschriebener Chunks.
+        root: Ingest-Verzeichnis, die doc_ids sind Pfade relativ dazu.
+        """
+        docs_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        batch_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        upsert_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            tasks = [
+                asyncio.create_task(self._parse(paths, root, pool, docs_q)),
+                asyncio.create_task(self._batch(docs_q, batch_q)),
+                asyncio.create_task(self._embed(batch_q, upsert_q)),
+                asyncio.create_task(self._upsert(upsert_q)),
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        self.elapsed = time.perf_counter() - t0
+        return self.written
+
+    async def _parse(self, paths: Iterable[Path], root: Optional[Path], pool: ProcessPoolExecutor, out: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        pending = set()
+
+        async def drain(wait_for) -> None:
+            done, rest = await asyncio.wait(pending, return_when=wait_for)
+            pending.intersection_update(rest)
+            for fut in done:
+                records, parse_s, chunk_s = fut.result()
+                self.stats["parse"].add(1, 1, parse_s)
+                self.stats["chunk"].add(1, len(records), chunk_s)
+                if records:
+                    await out.put(records)
+
+        for p in paths:
+            if p.suffix.lower() not in LOADERS:
+                continue
+            # nicht mehr Dateien vorab einlesen, als die Worker abarbeiten können
+            if len(pending) >= 2 * self.workers:
+                await drain(asyncio.FIRST_COMPLETED)
+            pending.add(loop.run_in_executor(pool, load_and_chunk, str(p), str(root) if root else None))
+        while pending:
+            await drain(asyncio.FIRST_COMPLETED)
+        await out.put(_DONE)
+
+    async def _batch(self, inp: asyncio.Queue, out: asyncio.Queue) -> None:
+        batch: List[dict] = []
+        while (records := await inp.get()) is not _DONE:
+            batch.extend(records)
+            if len(batch) >= self.batch_chunks:
+                await out.put(batch)
+                batch = []
+        if batch:
+            await out.put(batch)
+        await out.put(_DONE)
+
+    async def _embed(self, inp: asyncio.Queue, out: asyncio.Queue) -> None:
+        from .ingest import embedding_texts
+        from .scheduler import EmbeddingScheduler
+
+        scheduler = EmbeddingScheduler()
+        while (batch := await inp.get()) is not _DONE:
+            t0 = time.perf_counter()
+            vectors = await scheduler.embed(embedding_texts(batch))
+            self.stats["embed"].add(1, len(batch), time.perf_counter() - t0)
+            await out.put((batch, vectors))
+        print(scheduler.report())
+        await out.put(_DONE)
+
+    async def _upsert(self, inp: asyncio.Queue) -> None:
+        from .ingest import corpus_changed
+        from .upsert import bulk_upsert, doc_ids_of
+        from app.db import connection
+
+        while (item := await inp.get()) is not _DONE:
+            batch, vectors = item
+            t0 = time.perf_counter()
+            async with connection() as conn:
+                self.written += await bulk_upsert(conn, batch, vectors)
+                await corpus_changed(conn, doc_ids_of(batch))
+            self.stats["upsert"].add(1, len(batch), time.perf_counter() - t0)
+
+    def report(self) -> str:
+        lines = [s.report() for s in self.stats.values()]
+        elapsed = getattr(self, "elapsed", 0.0)
+        rate = self.written / elapsed if elapsed else 0.0
+        lines.append(f"total   {self.written} chunks in {elapsed:.2f}s ({rate:.1f} chunks/s)")
+        return "\n".join(lines)
@@ -0,0 +1,116 @@
+# ingest/scheduler.py
+"""
+Embedding-Scheduler für den Ingest.
+
+Teilt Texte in größenbegrenzte Batches (Anzahl & Zeichen), schickt sie mit
+begrenzter Parallelität und Requests-pro-Sekunde-Budget an watsonx und
+wiederholt 429/5xx/Netzwerkfehler mit exponentiellem Backoff.
+"""
+import asyncio, random, time
+from typing import Dict, List, Optional, Tuple
+import httpx
+from app.config import settings
+from app.embeddings import WatsonxAIEmbeddings
+from app.http_client import UpstreamError
+
+class RateLimiter:
+    """Verteilt Requests gleichmäßig auf max. `rps` pro Sekunde."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def make_batches(texts: List[str], max_inputs: int, max_chars: int) -> List[Tuple[int, int]]:
+    """Liefert (start, end)-Bereiche; jeder Batch hält beide Limits ein (min. 1 Text)."""
+    batches, start, chars = [], 0, 0
+    for i, t in enumerate(texts):
+        n = len(t)
+        if i > start and (i - start >= max_inputs or chars + n > max_chars):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += n
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+class EmbeddingScheduler:
+    def __init__(
+        self,
+        provider: Optional[WatsonxAIEmbeddings] = None,
+        batch_size: Optional[int] = None,
+        batch_chars: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rps: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.provider = provider or WatsonxAIEmbeddings()
+        self.batch_size = batch_size or settings.ingest_embed_batch_size
+        self.batch_chars = batch_chars or settings.ingest_embed_batch_chars
+        self.concurrency = concurrency or settings.ingest_embed_concurrency
+        self.max_retries = settings.ingest_embed_max_retries if max_retries is None else max_retries
+        self.limiter = RateLimiter(settings.ingest_embed_rps if rps is None else rps)
+        self.stats: Dict[str, float] = {"chunks": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+
+    async def _embed_batch(self, texts: List[str], sem: asyncio.Semaphore) -> List[List[float]]:
+        attempt = 0
+        while True:
+            # Semaphore nur um den eigentlichen Call: während des Backoffs
+            # können andere Batches weiterlaufen
+            async with sem:
+                await self.limiter.acquire()
+                try:
+                    return await self.provider.embed(texts)
+                except (UpstreamError, httpx.TransportError) as e:
+                    retryable = isinstance(e, httpx.TransportError) or e.retryable
+                    if not retryable or attempt >= self.max_retries:
+                        raise
+                    delay = min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+                    if isinstance(e, UpstreamError) and e.retry_after:
+                        delay = max(delay, e.retry_after)
+                    attempt += 1
+                    self.stats["retries"] += 1
+                    print(f"Embeddings-Batch fehlgeschlagen ({e}), Versuch {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        t0 = time.perf_counter()
+        sem = asyncio.Semaphore(self.concurrency)
+        ranges = make_batches(texts, self.batch_size, self.batch_chars)
+        tasks = [asyncio.create_task(self._embed_batch(texts[a:b], sem)) for a, b in ranges]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # ein Batch ist endgültig gescheitert (oder wir wurden abgebrochen):
+            # die übrigen Requests nicht weiterlaufen lassen
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        self.stats["chunks"] += len(texts)
+        self.stats["batches"] += len(ranges)
+        self.stats["seconds"] += time.perf_counter() - t0
+        return [vec for batch in results for vec in batch]
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.stats["chunks"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+    def report(self) -> str:
+        return (
+            f"Embedded {int(self.stats['chunks'])} chunks in {int(self.stats['batches'])} batches, "
+            f"{self.stats['seconds']:.2f}s ({self.chunks_per_second:.1f} chunks/s, "
+            f"{int(self.stats['retries'])} retries)"
+        )
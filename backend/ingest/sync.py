@@ -0,0 +1,189 @@
+# ingest/sync.py
+"""
+Inkrementeller Corpus-Sync auf Basis eines Content-Hash-Manifests in Postgres.
+
+- Dateien mit unverändertem Hash werden weder geparst noch eingebettet.
+- Bei geänderten Dateien werden nur Chunks eingebettet, deren Text neu ist: vorhandene
+  Vektoren werden per Content-Hash wiederverwendet, auch wenn sich die chunk_ids
+  verschoben haben (z.B. neuer Absatz am Anfang) oder der Text aus einer anderen Datei stammt.
+- Verwaiste Chunks (geänderte/gelöschte Dateien) werden in einer Transaktion gelöscht.
+
+Aufruf:  python -m ingest.ingest <input_dir> --sync
+"""
+import hashlib, json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+from app.db import connection, vector_to_list
+from app.db_schema import ensure_schema
+from .chunker import split_into_spans, to_records
+from .loaders import LOADERS, doc_id_for, load_documents
+from .upsert import bulk_upsert, content_hash, document_id, document_id_for_hash, legacy_keys
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def scan(root: Path) -> Dict[str, Tuple[Path, str]]:
+    """doc_id (Pfad relativ zu root) -> (Pfad, Datei-Hash) für alle unterstützten Dateien unter root."""
+    found: Dict[str, Tuple[Path, str]] = {}
+    for p in sorted(root.rglob("*.*")):
+        if p.suffix.lower() not in LOADERS or not p.is_file():
+            continue
+        found[doc_id_for(p, root)] = (p, file_hash(p))
+    return found
+
+def _under(path: str, root: Path) -> bool:
+    return Path(path).is_relative_to(root)
+
+async def _load_manifest(doc_ids: List[str]) -> Tuple[Dict[str, Tuple[str, str]], Dict[Tuple[str, int], str]]:
+    async with connection() as conn:
+        cur = await conn.execute("SELECT doc_id, file_hash, path FROM ingest_manifest_files")
+        files = {r["doc_id"]: (r["file_hash"], r["path"]) for r in await cur.fetchall()}
+        cur = await conn.execute(
+            "SELECT doc_id, chunk_id, content_hash FROM ingest_manifest_chunks WHERE doc_id = ANY(%s)",
+            (doc_ids,),
+        )
+        chunks = {(r["doc_id"], r["chunk_id"]): r["content_hash"] for r in await cur.fetchall()}
+    return files, chunks
+
+async def _vectors_by_hash(hashes: Sequence[str]) -> Dict[str, List[float]]:
+    """Vorhandene Embeddings je Content-Hash, über das Manifest (Position/Datei egal)."""
+    if not hashes:
+        return {}
+    async with connection() as conn:
+        cur = await conn.execute(
+            "SELECT doc_id, chunk_id, content_hash FROM ingest_manifest_chunks WHERE content_hash = ANY(%s)",
+            (sorted(set(hashes)),),
+        )
+        by_id = {
+            str(document_id_for_hash(r["doc_id"], r["chunk_id"], r["content_hash"])): r["content_hash"]
+            for r in await cur.fetchall()
+        }
+        if not by_id:
+            return {}
+        cur = await conn.execute(
+            "SELECT id::text AS id, embedding FROM documents WHERE id::text = ANY(%s)", (list(by_id),)
+        )
+        # fehlt die Zeile trotz Manifest-Eintrag, wird einfach neu eingebettet
+        return {by_id[r["id"]]: vector_to_list(r["embedding"]) for r in await cur.fetchall()}
+
+def plan_chunks(
+    records: List[Dict],
+    hashes: List[str],
+    manifest_chunks: Dict[Tuple[str, int], str],
+    known: Dict[str, List[float]],
+) -> Tuple[List[Dict], List[Tuple[Dict, List[float]]], List[Dict]]:
+    """
+    Teilt die Chunks geänderter Dateien auf:
+    - in_place: gleicher Text an gleicher Position – die Zeile existiert schon
+    - copied:   Text schon eingebettet (andere chunk_id/Datei) – Vektor übernehmen
+    - to_embed: neuer Text
+    """
+    in_place, copied, to_embed = [], [], []
+    for r, h in zip(records, hashes):
+        if manifest_chunks.get((r["doc_id"], r["chunk_id"])) == h:
+            in_place.append(r)
+        elif h in known:
+            copied.append((r, known[h]))
+        else:
+            to_embed.append(r)
+    return in_place, copied, to_embed
+
+async def sync(root: Path) -> Dict[str, int]:
+    from .ingest import embed_records, corpus_changed
+
+    await ensure_schema()
+    on_disk = scan(root)
+    manifest_files, _ = await _load_manifest([])
+
+    # gleicher Hash, aber andere Datei (anderes Sync-Root) → neu schreiben, damit metadata.path stimmt
+    changed = [d for d, (p, h) in on_disk.items() if manifest_files.get(d) != (h, str(p))]
+    added = [d for d in changed if d not in manifest_files]
+    # nur Einträge unter dem synchronisierten Verzeichnis – ein Sync auf einen
+    # Unterordner oder ein anderes Root löscht nichts, was von dort stammt
+    removed = sorted(
+        d for d, (_, path) in manifest_files.items()
+        if d not in on_disk and _under(path, root)
+    )
+    unchanged = len(on_disk) - len(changed)
+
+    _, manifest_chunks = await _load_manifest(changed)
+
+    # geänderte Dateien parsen & chunken
+    records: List[Dict] = []
+    for doc in load_documents([on_disk[d][0] for d in changed], root):
+        records.extend(to_records(doc["doc_id"], split_into_spans(doc["text"]), doc["metadata"]))
+    hashes = [content_hash(r["content"]) for r in records]
+
+    moved = [h for r, h in zip(records, hashes) if manifest_chunks.get((r["doc_id"], r["chunk_id"])) != h]
+    reused, copied, to_embed = plan_chunks(records, hashes, manifest_chunks, await _vectors_by_hash(moved))
+    vectors = await embed_records(to_embed) if to_embed else []
+    upserts = to_embed + [r for r, _ in copied]
+    vectors = vectors + [v for _, v in copied]
+
+    keep_ids = [str(document_id(r["doc_id"], r["chunk_id"], r["content"])) for r in records]
+    chunk_counts: Dict[str, int] = {}
+    for r in records:
+        chunk_counts[r["doc_id"]] = chunk_counts.get(r["doc_id"], 0) + 1
+
+    names, paths = legacy_keys(records)
+    async with connection() as conn:   # eine Transaktion für Upsert, GC und Manifest
+        await bulk_upsert(conn, upserts, vectors, replace_docs=False)
+        cur = await conn.execute(
+            """
+            DELETE FROM documents
+            WHERE ((doc_id = ANY(%s) OR (doc_id, metadata->>'path') IN (SELECT * FROM unnest(%s::text[], %s::text[])))
+                   AND id::text <> ALL(%s))
+               OR doc_id = ANY(%s)
+            """,
+            (changed, names, paths, keep_ids, removed),
+        )
+        deleted = cur.rowcount
+        if reused:
+            # unveränderter Text, aber ggf. verschobene Offsets → nur metadata nachziehen
+            await conn.execute(
+                """
+                UPDATE documents d SET metadata = u.metadata::jsonb
+                FROM unnest(%s::text[], %s::text[]) AS u(id, metadata)
+                WHERE d.id::text = u.id
+                """,
+                (
+                    [str(document_id(r["doc_id"], r["chunk_id"], r["content"])) for r in reused],
+                    [json.dumps(r["metadata"]) for r in reused],
+                ),
+            )
+
+        await conn.execute("DELETE FROM ingest_manifest_files WHERE doc_id = ANY(%s)", (removed + changed,))
+        async with conn.cursor() as c:
+            await c.executemany(
+                "INSERT INTO ingest_manifest_files (doc_id, path, file_hash, chunk_count) VALUES (%s, %s, %s, %s)",
+                [(d, str(on_disk[d][0]), on_disk[d][1], chunk_counts.get(d, 0)) for d in changed],
+            )
+            await c.executemany(
+                "INSERT INTO ingest_manifest_chunks (doc_id, chunk_id, content_hash) VALUES (%s, %s, %s)",
+                [(r["doc_id"], r["chunk_id"], h) for r, h in zip(records, hashes)],
+            )
+        if changed or removed:
+            await corpus_changed(conn, changed + removed)
+
+    summary = {
+        "files_added": len(added),
+        "files_changed": len(changed) - len(added),
+        "files_removed": len(removed),
+        "files_unchanged": unchanged,
+        "chunks_embedded": len(to_embed),
+        "chunks_reused": len(records) - len(to_embed),
+        "chunks_deleted": deleted,
+    }
+    print("Sync-Diff:")
+    for d in sorted(added):
+        print(f"  + {d}")
+    for d in sorted(set(changed) - set(added)):
+        print(f"  ~ {d}")
+    for d in removed:
+        print(f"  - {d}")
+    print("  " + ", ".join(f"{k}={v}" for k, v in summary.items()))
+    return summary
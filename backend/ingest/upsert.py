@@ -0,0 +1,126 @@
+# ingest/upsert.py
+"""
+Bulk-Schreibpfad für Chunks: binäres COPY in eine Staging-Tabelle, danach ein
+mengenbasiertes Merge in `documents`.
+
+Die IDs sind deterministisch (uuid5 aus doc_id, chunk_id und Content-Hash),
+damit ein erneuter Ingest desselben Inhalts idempotent ist.
+"""
+import hashlib, uuid
+from pathlib import PurePath
+from typing import Dict, Iterable, List, Sequence, Tuple
+from pgvector import Vector
+from psycopg import sql
+
+# fester Namespace – darf sich nie ändern, sonst ändern sich alle IDs
+ID_NAMESPACE = uuid.UUID("6f1c3f8e-2b9a-4c55-9d2e-8a7b0c1d4e5f")
+
+COLUMNS = ["id", "doc_id", "chunk_id", "content", "metadata", "embedding"]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def document_id(doc_id: str, chunk_id: int, content: str) -> uuid.UUID:
+    return document_id_for_hash(doc_id, chunk_id, content_hash(content))
+
+def document_id_for_hash(doc_id: str, chunk_id: int, chash: str) -> uuid.UUID:
+    """Wie document_id, wenn nur der Content-Hash bekannt ist (Manifest)."""
+    return uuid.uuid5(ID_NAMESPACE, f"{doc_id}:{chunk_id}:{chash}")
+
+async def _stage_types(conn, stage: str) -> Dict[str, Dict]:
+    cur = await conn.execute(
+        """
+        SELECT a.attname, a.atttypid, t.typname
+        FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = %s::regclass AND a.attname = ANY(%s)
+        """,
+        (stage, COLUMNS),
+    )
+    return {r["attname"]: r for r in await cur.fetchall()}
+
+async def bulk_upsert(
+    conn,
+    records: Sequence[Dict],
+    vectors: Sequence[Sequence[float]],
+    table: str = "documents",
+    replace_docs: bool = True,
+) -> int:
+    """
+    Schreibt alle Records in einem COPY + einem INSERT ... SELECT.
+
+    replace_docs: Zeilen derselben doc_ids, die nicht mehr im neuen Stand
+    vorkommen (alte Chunks, Altbestand mit Zufalls-IDs oder mit dem bloßen
+    Dateinamen als doc_id), werden entfernt.
+    Läuft in der Transaktion von `conn`.
+    """
+    if not records:
+        return 0
+    stage = f"{table}_stage"
+    await conn.execute(
+        sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(
+            sql.Identifier(stage), sql.Identifier(table)
+        )
+    )
+    types = await _stage_types(conn, stage)
+    id_is_uuid = types["id"]["typname"] == "uuid"
+
+    cols = sql.SQL(", ").join(map(sql.Identifier, COLUMNS))
+    async with conn.cursor() as cur:
+        async with cur.copy(
+            sql.SQL("COPY {} ({}) FROM STDIN (FORMAT BINARY)").format(sql.Identifier(stage), cols)
+        ) as copy:
+            copy.set_types([types[c]["atttypid"] for c in COLUMNS])
+            for rec, emb in zip(records, vectors):
+                rid = document_id(rec["doc_id"], rec["chunk_id"], rec["content"])
+                await copy.write_row((
+                    rid if id_is_uuid else str(rid),
+                    rec["doc_id"],
+                    rec["chunk_id"],
+                    rec["content"],
+                    rec["metadata"],
+                    Vector(emb),
+                ))
+
+        await cur.execute(
+            sql.SQL(
+                """
+                INSERT INTO {table} ({cols})
+                SELECT DISTINCT ON (id) {cols} FROM {stage}
+                ON CONFLICT (id) DO UPDATE SET
+                  content=EXCLUDED.content,
+                  metadata=EXCLUDED.metadata,
+                  embedding=EXCLUDED.embedding
+                """
+            ).format(table=sql.Identifier(table), stage=sql.Identifier(stage), cols=cols)
+        )
+        written = cur.rowcount
+
+        if replace_docs:
+            names, paths = legacy_keys(records)
+            await cur.execute(
+                sql.SQL(
+                    """
+                    DELETE FROM {table} d
+                    WHERE (d.doc_id = ANY(%s)
+                           OR (d.doc_id, d.metadata->>'path') IN (SELECT * FROM unnest(%s::text[], %s::text[])))
+                      AND NOT EXISTS (SELECT 1 FROM {stage} s WHERE s.id = d.id)
+                    """
+                ).format(table=sql.Identifier(table), stage=sql.Identifier(stage)),
+                (doc_ids_of(records), names, paths),
+            )
+    return written
+
+def legacy_keys(records: Iterable[Dict]) -> Tuple[List[str], List[str]]:
+    """
+    (Dateiname, Pfad) je Quelldatei: frühere Ingests nutzten den bloßen Dateinamen
+    als doc_id. Über den Pfad trifft das nur Zeilen genau dieser Datei, nie die
+    eines gleichnamigen Dokuments aus einem anderen Ordner.
+    """
+    pairs = sorted({
+        (PurePath(r["metadata"]["path"]).name, r["metadata"]["path"])
+        for r in records if r["metadata"].get("path")
+    })
+    return [n for n, _ in pairs], [p for _, p in pairs]
+
+def doc_ids_of(records: Iterable[Dict]) -> List[str]:
+    return sorted({r["doc_id"] for r in records})
@@ -1,21 +1,80 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager, aclosing
 from pathlib import Path
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import shutil
+import json
+import re
 
 # RAG-Module
-from app.schemas import AskRequest, AskResponse, SpeechToTextRequest, TextToSpeechRequest
-from app.rag import answer as rag_answer
-
-from app.speech_to_text import get_speech_to_text_service
-from app.text_to_speech import get_text_to_speech_service
+from app.schemas import AskRequest, AskResponse, AskBatchRequest, AskBatchResponse, SpeechToTextRequest, TextToSpeechRequest
+from app.rag import answer_shared as rag_answer, answer_stream as rag_answer_stream, answer_batch as rag_answer_batch, ask_singleflight
+from app.http_client import UpstreamError
+
+from app.speech_to_text import SpeechToTextService, get_speech_to_text_service, stream_sessions
+from app.text_to_speech import get_text_to_speech_service, get_stream_tickets
+from app import http_client, db, metrics
+from app.ibm_auth import get_credential_broker
+from app.db_schema import ensure_schema
+from app.embedding_cache import get_query_embedder
+from app.answer_cache import get_answer_cache
+from app.config import settings
+from app.vector_index import ensure_index
+from app.vector_store import get_vector_store
+from app.upload_cache import get_upload_cache, rank_chunks, UnsupportedFile
+from ingest.jobs import get_ingest_queue
+from app.tts_cache import EXTENSIONS, get_tts_cache, prewarm_phrases
+
+# ---- Lifespan: langlebige Ressourcen (HTTP-Pool, DB-Pool) ----
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.startup()
+    # IAM-Tokens ab jetzt im Hintergrund holen und vor Ablauf erneuern
+    await get_credential_broker().start()
+    # nicht blockierend öffnen: der Pool baut Verbindungen im Hintergrund auf
+    await db.open_pool(wait=False)
+    try:
+        await ensure_schema()
+        await get_answer_cache().purge_expired()
+    except Exception as e:
+        print(f"Warnung: Schema konnte nicht angelegt werden: {e}")
+    if settings.retrieval_backend == "mmap":
+        try:
+            await get_vector_store().refresh()
+        except Exception as e:
+            print(f"Warnung: Vector-Store konnte nicht geladen werden: {e}")
+    get_ingest_queue().start()
+    if settings.tts_cache_enabled and settings.tts_prewarm:
+        # Upstream-Calls nur für fehlende Phrasen, im Hintergrund
+        app.state.tts_prewarm_task = asyncio.create_task(
+            get_tts_cache().prewarm(prewarm_phrases(), settings.tts_prewarm_voice)
+        )
+    if settings.vector_index_on_startup:
+        # Index-Build kann dauern → im Hintergrund, der Server nimmt sofort Requests an
+        app.state.index_task = asyncio.create_task(_ensure_index_background())
+    try:
+        yield
+    finally:
+        await get_ingest_queue().stop()
+        get_upload_cache().shutdown()
+        await db.close_pool()
+        await get_credential_broker().stop()
+        await http_client.shutdown()
+
+async def _ensure_index_background():
+    try:
+        await ensure_index()
+    except Exception as e:
+        print(f"Warnung: Vektor-Index konnte nicht angelegt werden: {e}")
 
-app = FastAPI(title="Boardy Onboarding Assistant API")
+app = FastAPI(title="Boardy Onboarding Assistant API", lifespan=lifespan)
 
 UPLOAD_DIR = Path(__file__).parent.parent / "uploaded_files"
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -37,6 +96,10 @@ app.add_middleware(
     max_age=600,                   
 )
 
+# ---- Instrumentierung (Server-Timing, Request-Dauer pro Route) ----
+if metrics.ENABLED:
+    app.add_middleware(metrics.ServerTimingMiddleware)
+
 # ---- React Frontend ----
 frontend_path = Path("/app/frontend/build")
 if frontend_path.exists():
@@ -62,6 +125,46 @@ async def health_check():
 async def api_health():
     return {"status": "healthy", "api": "Boardy API"}
 
+@app.get("/api/stats")
+async def api_stats():
+    return {
+        "db_pool": db.pool_stats(),
+        "embedding_cache": get_query_embedder().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "vector_store": get_vector_store().stats() if settings.retrieval_backend == "mmap" else None,
+        "upload_cache": get_upload_cache().stats(),
+        "ingest_jobs": get_ingest_queue().stats(),
+        "tts_cache": get_tts_cache().stats() if settings.tts_cache_enabled else None,
+        "ask_singleflight": ask_singleflight().stats(),
+        "iam": get_credential_broker().stats(),
+        "stt_stream": {"sessions": stream_sessions(), "max_sessions": settings.stt_stream_max_sessions},
+    }
+
+def _metric_gauges() -> list:
+    pool = db.pool_stats()
+    lines = []
+    if pool["open"]:
+        for key in ("size", "available", "requests_waiting"):
+            lines += metrics.gauge_lines(f"boardy_db_pool_{key}", f"DB-Pool: {key}", [({}, pool[key])])
+    sources = get_credential_broker().stats()["sources"]
+    lines += metrics.gauge_lines(
+        "boardy_iam_token_expires_in_seconds", "Restlaufzeit des IAM-Tokens",
+        [({"services": ",".join(s["services"])}, s["expires_in_s"] or 0) for s in sources],
+    )
+    lines += metrics.gauge_lines(
+        "boardy_iam_refresh_failures", "Fehlgeschlagene IAM-Refreshes seit Start",
+        [({"services": ",".join(s["services"])}, s["failures"]) for s in sources],
+    )
+    return lines
+
+metrics.register_collector(_metric_gauges)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metriken deaktiviert (METRICS_ENABLED=false)")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ---- Locations ----
 @app.get("/api/locations", response_model=list[Location])
 async def list_locations():
@@ -73,11 +176,84 @@ async def list_locations():
 
 
 # ---- Chat über RAG (neuer Endpoint) ----
+def _location_of(req: AskRequest):
+    # expliziter Filter hat Vorrang, sonst Standort aus den Nutzerdaten
+    return req.location or (req.user or {}).get("location")
+
 @app.post("/v1/ask", response_model=AskResponse)
-async def ask_rag(req: AskRequest):
-    result = await rag_answer(req.query)
+async def ask_rag(req: AskRequest, request: Request):
+    result = await _unless_disconnected(request, rag_answer(req.query, location=_location_of(req)))
+    if result is None:
+        return Response(status_code=499)
     return AskResponse(**result)
 
+@app.post("/v1/ask/batch", response_model=AskBatchResponse)
+async def ask_rag_batch(req: AskBatchRequest, request: Request):
+    """
+    Viele Fragen in einem Request: ein Embedding-Call, ein Retrieval-Statement,
+    Generierung mit begrenzter Parallelität. Fehler einzelner Fragen stehen im
+    jeweiligen Ergebnis; nur wenn Embedding oder Retrieval scheitern, schlägt
+    der ganze Request fehl.
+    """
+    if len(req.questions) > settings.ask_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Zu viele Fragen ({len(req.questions)}), maximal {settings.ask_batch_max_items} pro Request",
+        )
+    questions = [q.query for q in req.questions]
+    locations = [_location_of(q) or req.location for q in req.questions]
+    try:
+        results = await _unless_disconnected(request, rag_answer_batch(questions, locations))
+    except UpstreamError as e:
+        raise HTTPException(status_code=502, detail=f"Upstream-Fehler im Batch: {e}")
+    if results is None:
+        return Response(status_code=499)
+    return AskBatchResponse(results=results)
+
+async def _unless_disconnected(request: Request, coro, poll: float = 0.5):
+    """
+    Wartet auf coro, bricht aber ab, sobald der Client die Verbindung trennt
+    (liefert dann None). Bei Single-Flight löst das nur diesen Wartenden –
+    die gemeinsame Ausführung läuft für die übrigen weiter.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# ---- Chat über RAG als Token-Stream (Server-Sent Events) ----
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/v1/ask/stream")
+async def ask_rag_stream(req: AskRequest, request: Request):
+    location = _location_of(req)
+
+    async def events():
+        # aclosing: bei Disconnect/Abbruch wird auch der Upstream-Stream geschlossen
+        async with aclosing(rag_answer_stream(req.query, location=location)) as stream:
+            try:
+                async for event, data in stream:
+                    if await request.is_disconnected():
+                        break
+                    yield _sse(event, data)
+            except Exception as e:
+                yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 # ---- Speech to Text Endpoint ----
 @app.options("/api/speech-to-text")
@@ -85,7 +261,7 @@ async def speech_to_text_options():
     return {"message": "OK"}
 
 @app.post("/api/speech-to-text")
-async def speech_to_text(req: SpeechToTextRequest):
+async def speech_to_text(req: SpeechToTextRequest, speech_service: SpeechToTextService = Depends(get_speech_to_text_service)):
     import base64
     
     try:
@@ -93,12 +269,11 @@ async def speech_to_text(req: SpeechToTextRequest):
         audio_data = base64.b64decode(req.audio_data)
         
         # Speech to Text Service
-        speech_service = get_speech_to_text_service()
-        transcript = await speech_service.transcribe_audio(audio_data, req.content_type)
+        result = await speech_service.transcribe(audio_data, req.content_type)
         
         return {
-            'transcript': transcript,
-            'confidence': 1.0,  # Confidence wird in speech_to_text.py nicht zurückgegeben
+            'transcript': result.transcript,
+            'confidence': result.confidence,
             'success': True
         }
     except HTTPException:
@@ -106,24 +281,171 @@ async def speech_to_text(req: SpeechToTextRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Speech to Text Fehler: {str(e)}")
 
+@app.post("/api/speech-to-text/binary")
+async def speech_to_text_binary(request: Request, speech_service: SpeechToTextService = Depends(get_speech_to_text_service)):
+    """Rohes Audio im Body (Content-Type = Audio-Format), ohne Base64/JSON."""
+    audio_data = await request.body()
+    if not audio_data:
+        raise HTTPException(status_code=400, detail="Keine Audiodaten empfangen")
+    content_type = request.headers.get("content-type", "audio/webm")
+    result = await speech_service.transcribe(audio_data, content_type)
+    return {
+        'transcript': result.transcript,
+        'confidence': result.confidence,
+        'success': True
+    }
+
+@app.websocket("/api/speech-to-text/stream")
+async def speech_to_text_stream(
+    ws: WebSocket,
+    content_type: str = "audio/webm",
+    speech_service: SpeechToTextService = Depends(get_speech_to_text_service),
+):
+    """
+    Binäre Frames = Audio, Textnachricht "stop" = Aufnahme beendet.
+    Antwortet mit JSON-Events {type: interim|final|error, transcript, confidence}
+    und zum Schluss {type: "end"}. Über STT_STREAM_MAX_SESSIONS hinaus: ein
+    error-Event und Close-Code 1013.
+    """
+    await ws.accept()
+
+    async def frames():
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("bytes"):
+                yield msg["bytes"]
+            elif (msg.get("text") or "").strip().lower() in ("stop", '{"action": "stop"}', '{"action":"stop"}'):
+                return
+
+    try:
+        async with aclosing(speech_service.recognize_stream(frames(), content_type)) as events:
+            async for event in events:
+                await ws.send_json(event)
+        await ws.send_json({"type": "end"})
+        await ws.close()
+    except HTTPException as e:
+        # z.B. 503 bei zu vielen Sitzungen: 1013 = "try again later"
+        await ws.send_json({"type": "error", "detail": e.detail})
+        await ws.close(code=1013 if e.status_code == 503 else 1011)
+    except WebSocketDisconnect:
+        pass
+
 # ---- Text to Speech Endpoint ----
 @app.post("/api/text-to-speech")
-async def text_to_speech(req: TextToSpeechRequest):
+async def text_to_speech(req: TextToSpeechRequest, request: Request):
     from fastapi.responses import Response
     
     try:
+        if settings.tts_cache_enabled:
+            # gleiche (Text, Stimme, Format) → Audio von der Platte, kein Upstream-Call
+            key, path = await get_tts_cache().get_or_synthesize(req.text, req.voice, req.accept)
+            response = await _audio_response(request, key, path, req.accept)
+            response.headers["Content-Location"] = f"/api/text-to-speech/audio/{path.name}"
+            return response
+
         # Text to Speech Service verwenden
         tts_service = get_text_to_speech_service()
-        audio_data = await tts_service.synthesize_text(req.text, req.voice)
+        audio_data = await tts_service.synthesize_text(req.text, req.voice, accept=req.accept)
         
         return Response(
             content=audio_data,
-            media_type="audio/wav",
+            media_type=req.accept,
             headers={"Content-Disposition": "inline; filename=speech.wav"}
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Text to Speech Fehler: {str(e)}")
 
+@app.post("/api/text-to-speech/stream")
+async def text_to_speech_stream(req: TextToSpeechRequest):
+    """WAV-Stream: Sätze werden parallel synthetisiert und in Reihenfolge ausgeliefert."""
+    return _tts_stream(req.text, req.voice)
+
+@app.post("/api/text-to-speech/stream/ticket")
+async def text_to_speech_stream_ticket(req: TextToSpeechRequest):
+    """Kurzlebige Stream-ID, damit <audio src="..."> progressiv abspielen kann, ohne den Text in der URL."""
+    _check_tts_text(req.text)
+    ticket = await asyncio.to_thread(get_stream_tickets().create, req.text, req.voice)
+    return {"id": ticket, "url": f"/api/text-to-speech/stream/{ticket}"}
+
+@app.get("/api/text-to-speech/stream/{ticket}")
+async def text_to_speech_stream_get(ticket: str):
+    found = await asyncio.to_thread(get_stream_tickets().get, ticket)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Stream-Ticket unbekannt oder abgelaufen")
+    return _tts_stream(*found)
+
+def _check_tts_text(text: str) -> None:
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="Text darf nicht leer sein")
+    if len(text) > 20000:
+        raise HTTPException(status_code=400, detail="Text ist zu lang. Maximum 20000 Zeichen erlaubt.")
+
+def _tts_stream(text: str, voice: str) -> StreamingResponse:
+    _check_tts_text(text)
+    tts_service = get_text_to_speech_service()
+
+    async def body():
+        async with aclosing(tts_service.synthesize_stream(text, voice)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/text-to-speech/audio/{name}")
+async def text_to_speech_audio(name: str, request: Request):
+    """Gecachtes Audio per Schlüssel (aus Content-Location), unveränderlich."""
+    key, _, ext = name.partition(".")
+    accept = {v: k for k, v in EXTENSIONS.items()}.get(ext)
+    if not accept or not re.fullmatch(r"[0-9a-f]{64}", key):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = await get_tts_cache().lookup(key, accept)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return await _audio_response(request, key, path, accept)
+
+async def _audio_response(request: Request, key: str, path: Path, media_type: str):
+    """Audio mit ETag, Cache-Control und Range-Unterstützung (ein Bereich)."""
+    from fastapi.responses import Response
+
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.tts_cache_max_age}, immutable",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename={path.name}",
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    data = await asyncio.to_thread(path.read_bytes)
+    size = len(data)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        m = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            else:
+                # Suffix-Range: die letzten n Bytes
+                start, end = max(size - int(m.group(2)), 0), size - 1
+            if start > end or start >= size:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+            return Response(
+                content=data[start:end + 1],
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            )
+    return Response(content=data, media_type=media_type, headers=headers)
+
 
 # ---- File Upload Endpoint ----
 @app.post("/api/upload-file")
@@ -137,129 +459,57 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Upload fehlgeschlagen: {str(e)}")
 
 @app.post("/api/ask-with-file")
-async def ask_with_file(query: str = Form(...), file: UploadFile = File(...)):
+async def ask_with_file(query: str = Form(...), file: UploadFile = File(...), location: Optional[str] = Form(None)):
     """
     Nutzt den Inhalt der hochgeladenen Datei als temporären Kontext für die aktuelle Frage,
     ohne sie ins RAG aufzunehmen.
     """
-    import tempfile
-    from ingest.loaders import load_documents
-    from ingest.chunker import split_into_chunks, to_records
-
-    # Datei temporär speichern
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = Path(tmp.name)  # Ensure tmp_path is a Path object
-
-    # Dokument laden und in Chunks splitten
-    print(f"[DEBUG] ask-with-file: tmp_path={tmp_path}, suffix={tmp_path.suffix}, exists={tmp_path.exists()}")
-    docs = list(load_documents([tmp_path]))
-    print(f"[DEBUG] ask-with-file: docs loaded: {len(docs)}")
-    if not docs:
-        raise HTTPException(status_code=400, detail=f"Datei konnte nicht verarbeitet werden. Unterstützte Dateitypen: .pdf, .docx, .md, .markdown. Übergeben: {tmp_path.name}")
-    chunks = split_into_chunks(docs[0]["text"])
-    records = to_records("temp_doc", chunks, docs[0]["metadata"])
-
-    # Kontext für diese Anfrage zusammenbauen
-    # 1. Hole relevante Chunks aus der Vektordatenbank (wie im normalen RAG)
-    from app.rag import retrieve
-    db_contexts = await retrieve(query, k=6)  # Liste von Dicts mit 'content', 'metadata', ...
-    db_chunks = [c['content'] for c in db_contexts]
-    db_sources = [
-        {
-            "title": c["metadata"].get("filename") or c["doc_id"],
-            "doc_id": c["doc_id"],
-            "chunk_id": c["chunk_id"],
-        }
-        for c in db_contexts
-    ]
+    filename = Path(file.filename).name
+    data = await file.read()
+    try:
+        parsed = await get_upload_cache().get(data, filename)
+    except UnsupportedFile:
+        raise HTTPException(status_code=400, detail=f"Datei konnte nicht verarbeitet werden. Unterstützte Dateitypen: .pdf, .docx, .md, .markdown. Übergeben: {filename}")
+
+    # Kandidaten aus der Vektordatenbank und aus der Datei gemeinsam nach
+    # Token-Budget packen (Dedupe, Overlap-Merge, MMR)
+    from app.rag import retrieve_by_vector, format_prompt, to_sources, SYSTEM_PROMPT
+    from app.context import pack_context
+    from app.llm import WatsonxAILLM
 
-    # 2. Chunks aus dem hochgeladenen Dokument
-    context_texts = [r["content"] for r in records]
-
-    # --- ECHTE TOKENZÄHLUNG (OpenAI-like) ---
-    def count_tokens(text):
-        return len(text.split())
-
-    max_tokens = 510  # IBM Granite: 512, etwas Reserve für Prompt
-    context = ""
-    token_count = 0
-    sources = []
-
-    # Füge abwechselnd DB-Kontext und Datei-Kontext hinzu, bis das Token-Limit erreicht ist
-    db_i, file_i = 0, 0
-    while token_count < max_tokens and (db_i < len(db_chunks) or file_i < len(context_texts)):
-        # Abwechselnd: erst DB, dann Datei, dann wieder DB, ...
-        if db_i < len(db_chunks):
-            chunk = db_chunks[db_i]
-            chunk_tokens = count_tokens(chunk)
-            if token_count + chunk_tokens > max_tokens:
-                allowed = max_tokens - token_count
-                words = chunk.split()
-                context += " " + " ".join(words[:allowed])
-                sources.append(db_sources[db_i])
-                break
-            else:
-                context += "\n\n" + chunk
-                token_count += chunk_tokens
-                sources.append(db_sources[db_i])
-            db_i += 1
-        if file_i < len(context_texts) and token_count < max_tokens:
-            chunk = context_texts[file_i]
-            chunk_tokens = count_tokens(chunk)
-            if token_count + chunk_tokens > max_tokens:
-                allowed = max_tokens - token_count
-                words = chunk.split()
-                context += " " + " ".join(words[:allowed])
-                sources.append({
-                    "title": Path(file.filename).name,
-                    "doc_id": "temp_doc",
-                    "chunk_id": file_i,
-                })
-                break
-            else:
-                context += "\n\n" + chunk
-                token_count += chunk_tokens
-                sources.append({
-                    "title": Path(file.filename).name,
-                    "doc_id": "temp_doc",
-                    "chunk_id": file_i,
-                })
-            file_i += 1
-
-    context = context.strip()
-    # Prompt bauen wie in rag.py
-    prompt = (
-        f"FRAGE:\n{query}\n\n"
-        f"KONTEXT (verwende NUR Folgendes):\n{context}\n\n"
-        "ANTWORTFORMAT:\n- knappe Antwort in Deutsch\n- bei Prozessen: nummerierte Schritte\n- Abschlusszeile: 'Quellen: <Datei>'\n"
+    q_vec = (await get_query_embedder().embed([query]))[0]
+    file_contexts = rank_chunks(parsed, q_vec, filename, settings.upload_top_k)
+    db_contexts = await retrieve_by_vector(
+        q_vec,
+        k=max(settings.retrieval_k, settings.context_candidates),
+        location=location,
+        query=query,
+        with_embeddings=True,
     )
-    # LLM aufrufen
-    from app.rag import SYSTEM_PROMPT
-    from app.llm import WatsonxAILLM
+    contexts = pack_context(query, db_contexts + file_contexts, q_vec)
+
+    prompt = format_prompt(query, contexts)
+    sources = to_sources(contexts)
     llm = WatsonxAILLM()
     output = await llm.generate(SYSTEM_PROMPT, prompt)
     return {"answer": output, "sources": sources}
 
 
-@app.post("/api/ingest-uploaded-file")
+@app.post("/api/ingest-uploaded-file", status_code=202)
 async def ingest_uploaded_file(filename: str = Form(...)):
-    import subprocess
-    file_path = UPLOAD_DIR / filename
+    """Legt einen Ingest-Job an; Status und Fortschritt unter /api/jobs/{id}."""
+    file_path = UPLOAD_DIR / Path(filename).name
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Datei nicht gefunden")
-    # Lege temporäres Verzeichnis für Ingest an
-    import tempfile, shutil as sh
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmp_file = Path(tmpdir) / filename
-        sh.copy(file_path, tmp_file)
-        # Starte Ingest-Prozess
-        proc = subprocess.run([
-            "python", "-m", "ingest.ingest", tmpdir
-        ], capture_output=True, text=True)
-        if proc.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"Ingest-Fehler: {proc.stderr}")
-    return {"ingested": True, "filename": filename}
+    job = await get_ingest_queue().submit(file_path.name, file_path)
+    return {"job_id": job.id, "status": job.status, "filename": job.filename}
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await get_ingest_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return job.to_dict()
 
 
 # ---- Frontend ausliefern ----
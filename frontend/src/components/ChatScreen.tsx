@@ -238,8 +238,14 @@ const ChatScreen: React.FC<ChatScreenProps> = ({
         method: 'POST',
         body: formData,
       });
-      const data = await res.json();
-      if (data.ingested) {
+      let data = await res.json();
+      // Ingest läuft als Hintergrund-Job → Status abfragen, bis er fertig ist
+      while (data.job_id && (data.status === 'queued' || data.status === 'running')) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const jobRes = await fetch(`${apiUrl}/api/jobs/${data.job_id}`);
+        data = { job_id: data.job_id, ...(await jobRes.json()) };
+      }
+      if (data.status === 'done') {
         alert('Datei wurde ins RAG aufgenommen.');
       } else {
         alert('Ingest fehlgeschlagen.');
@@ -3,11 +3,6 @@ interface SpeechToTextResponse {
   confidence: number;
 }
 
-interface SpeechToTextRequest {
-  audio_data: string; // Base64-encoded audio data
-  content_type: string;
-}
-
 class SpeechToTextService {
   private baseUrl: string;
 
@@ -17,20 +12,13 @@ class SpeechToTextService {
 
   async transcribeAudio(audioBlob: Blob): Promise<string> {
     try {
-      // Audio-Blob zu Base64 konvertieren
-      const base64Audio = await this.blobToBase64(audioBlob);
-      
-      const request: SpeechToTextRequest = {
-        audio_data: base64Audio,
-        content_type: audioBlob.type || 'audio/webm'
-      };
-
-      const response = await fetch(`${this.baseUrl}/api/speech-to-text`, {
+      // Audio roh hochladen (kein Base64/JSON-Overhead)
+      const response = await fetch(`${this.baseUrl}/api/speech-to-text/binary`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': audioBlob.type || 'audio/webm',
         },
-        body: JSON.stringify(request),
+        body: audioBlob,
       });
 
       if (!response.ok) {
@@ -52,20 +40,6 @@ class SpeechToTextService {
       throw new Error(`Spracherkennung fehlgeschlagen: ${error instanceof Error ? error.message : 'Unbekannter Fehler'}`);
     }
   }
-
-  private async blobToBase64(blob: Blob): Promise<string> {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onload = () => {
-        const result = reader.result as string;
-        // Entferne den Data-URL-Prefix (data:audio/wav;base64,)
-        const base64 = result.split(',')[1];
-        resolve(base64);
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(blob);
-    });
-  }
 }
 
 export const speechToTextService = new SpeechToTextService();
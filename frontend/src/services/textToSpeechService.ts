@@ -62,9 +62,23 @@ class TextToSpeechService {
       // Stoppe aktuell laufende Wiedergabe
       this.stopPlayback();
 
-      // Synthetisiere Text zu Audio
-      const audioUrl = await this.synthesizeText(text, voice);
-      
+      // Audio-Stream: Wiedergabe beginnt, sobald der erste Satz synthetisiert ist.
+      // Der Text geht per POST an den Server, in die URL kommt nur die Stream-ID.
+      const request: TextToSpeechRequest = { text, voice };
+      const response = await fetch(`${this.baseUrl}/api/text-to-speech/stream/ticket`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(request),
+      });
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+      }
+      const { url } = await response.json();
+      const audioUrl = `${this.baseUrl}${url}`;
+
+
       // Erstelle Audio-Element und spiele ab
       this.currentAudio = new Audio(audioUrl);
       
@@ -99,8 +113,10 @@ class TextToSpeechService {
 
   private cleanup(): void {
     if (this.currentAudio) {
-      // Cleanup der Blob URL
-      URL.revokeObjectURL(this.currentAudio.src);
+      // Cleanup der Blob URL (Stream-URLs brauchen keins)
+      if (this.currentAudio.src.startsWith('blob:')) {
+        URL.revokeObjectURL(this.currentAudio.src);
+      }
       this.currentAudio = null;
     }
   }